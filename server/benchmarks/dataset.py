@@ -0,0 +1,74 @@
+"""
+Deterministic datasets for the benchmarks.
+"""
+
+from datetime import datetime, timedelta
+from bson import ObjectId
+from db.seed import seed_database
+
+TOPICS = [
+    "Technology",
+    "Gardening",
+    "Finance",
+    "Baby Sitting",
+    "Pet Sitting",
+    "House Sitting",
+    "Cooking",
+    "Tutoring",
+    "Cleaning",
+    "Other",
+]
+
+BENCHMARK_USERNAME = "benchmark_user"
+BENCHMARK_TOKEN = "benchmark-auth-token"
+
+
+def seed_dataset(db, size: int, seed: int = 0) -> dict:
+    """
+    Seed size users and size quests, plus a logged-in benchmark user
+
+    The benchmark user has no quests of its own, so it can apply to any quest.
+
+    Args:
+            db (MongoDB connection): Empty database
+            size (int): Number of users and of quests
+            seed (int): Random seed
+
+    Returns:
+            dict: Ids used by the benchmarks (user_ids, quest_ids, topic names,
+            benchmark user id and auth token)
+    """
+    # A mongod backend already has the initial topics, mongomock has none
+    if db["topics"].count_documents({}) == 0:
+        db["topics"].insert_many([{"name": name} for name in TOPICS])
+    # Password checks are not benchmarked, skip hashing
+    data = seed_database(
+        db, users=size, quests=size, seed=seed, password_hashes=["not-a-real-hash"]
+    )
+
+    now = datetime.now()
+    benchmark_user_id = ObjectId()
+    db["users"].insert_one(
+        {
+            "_id": benchmark_user_id,
+            "username": BENCHMARK_USERNAME,
+            "password": "not-a-real-hash",
+            "email": "benchmark@example.com",
+        }
+    )
+    db["cookies"].insert_one(
+        {
+            "username": BENCHMARK_USERNAME,
+            "cookie": BENCHMARK_TOKEN,
+            "created_at": now,
+            "expiration_at": now + timedelta(days=7),
+        }
+    )
+
+    return {
+        "user_ids": data["user_ids"],
+        "quest_ids": data["quest_ids"],
+        "topics": data["topics"],
+        "benchmark_user_id": benchmark_user_id,
+        "auth_token": BENCHMARK_TOKEN,
+    }
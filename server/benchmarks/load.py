@@ -0,0 +1,409 @@
+"""
+Generate concurrent load against a running server.
+
+Simulated users log in (registering on first use), then loop until the duration
+is over: pick an operation from the request mix, send it and wait a random think
+time. All users share one connection pool. Throughput and latency percentiles
+are reported per endpoint.
+
+Usage (from the server directory, with the server running on a local MongoDB):
+
+    python -m benchmarks.load --users 50 --duration 60
+    python -m benchmarks.load --mix list=5,detail=3,apply=2 --think-time 0.1
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+import httpx
+from benchmarks.stats import percentile
+
+DEFAULT_MIX = "list=30,filter=20,detail=30,create=10,apply=7,close=3"
+LOAD_TEST_PASSWORD = "loadtest-password"
+# Quest locations are spread over West Flanders
+LATITUDE_RANGE = (50.7, 51.4)
+LONGITUDE_RANGE = (2.5, 3.0)
+# Quest ids remembered from responses, to pick detail and apply targets from
+KNOWN_QUESTS_MAX = 1000
+
+
+class LoadStats:
+    """
+    Latencies and status codes per endpoint
+    """
+
+    def __init__(self):
+        self.latencies: dict[str, list[float]] = defaultdict(list)
+        self.statuses: dict[str, dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    def record(self, endpoint: str, seconds: float, status: str):
+        self.latencies[endpoint].append(seconds)
+        self.statuses[endpoint][status] += 1
+
+    def report(self, elapsed: float) -> list[dict]:
+        """
+        Summarize the recorded requests
+
+        Args:
+                elapsed (float): Duration of the run in seconds
+
+        Returns:
+                list[dict]: Requests, throughput, latency percentiles in
+                milliseconds and status counts per endpoint
+        """
+        report = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies = sorted(latencies)
+            statuses = dict(self.statuses[endpoint])
+            report.append(
+                {
+                    "endpoint": endpoint,
+                    "requests": len(latencies),
+                    "requests_per_second": round(len(latencies) / elapsed, 2),
+                    "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+                    "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+                    "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+                    "errors": sum(
+                        count
+                        for status, count in statuses.items()
+                        if not status.isdigit() or int(status) >= 500
+                    ),
+                    "statuses": statuses,
+                }
+            )
+        return report
+
+
+class VirtualUser:
+    """
+    One simulated user with its own session cookie
+    """
+
+    def __init__(self, index: int, client: httpx.AsyncClient, shared: dict, rng):
+        self.username = f"loadtest_user_{index:05d}"
+        self.client = client
+        self.shared = shared
+        self.rng = rng
+        self.own_quests: list[str] = []
+
+    async def request(
+        self, stats: LoadStats, endpoint: str, method: str, url: str, **kwargs
+    ):
+        started = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response, status = None, type(e).__name__
+        stats.record(endpoint, time.perf_counter() - started, status)
+        return response
+
+    async def login(self, stats: LoadStats):
+        response = await self.request(
+            stats,
+            "POST /auth",
+            "POST",
+            "/auth",
+            json={
+                "username": self.username,
+                "password": LOAD_TEST_PASSWORD,
+                "email": f"{self.username}@example.com",
+            },
+        )
+        if response is None or response.status_code != 200:
+            raise RuntimeError(f"Login of {self.username} failed")
+        # The cookie is set for the "localhost" domain, send it to any host
+        token = response.cookies.get("auth_token") or parse_auth_cookie(response)
+        self.client.cookies.set("auth_token", token.strip('"'))
+
+    def remember_quests(self, quests: list[dict]):
+        known = self.shared["quest_ids"]
+        for quest in quests:
+            if len(known) < KNOWN_QUESTS_MAX:
+                known.append(quest["_id"])
+            else:
+                known[self.rng.randrange(KNOWN_QUESTS_MAX)] = quest["_id"]
+
+    async def list_quests(self, stats: LoadStats):
+        response = await self.request(stats, "GET /api/quests", "GET", "/api/quests")
+        if response is not None and response.status_code == 200:
+            quests = response.json()["quests"]
+            self.remember_quests(self.rng.sample(quests, k=min(len(quests), 50)))
+
+    async def filter_quests(self, stats: LoadStats):
+        topics = self.shared["topics"]
+        params = [("prices", 10.0), ("prices", self.rng.uniform(20, 100))]
+        if topics:
+            params += [
+                ("topics", topic)
+                for topic in self.rng.sample(topics, k=min(2, len(topics)))
+            ]
+        await self.request(
+            stats, "GET /api/quests/filter", "GET", "/api/quests/filter", params=params
+        )
+
+    async def get_quest(self, stats: LoadStats):
+        if not self.shared["quest_ids"]:
+            return await self.list_quests(stats)
+        quest_id = self.rng.choice(self.shared["quest_ids"])
+        await self.request(
+            stats, "GET /api/quests/{quest_id}", "GET", f"/api/quests/{quest_id}"
+        )
+
+    async def create_quest(self, stats: LoadStats):
+        topics = self.shared["topics"]
+        if not topics:
+            return
+        quest = {
+            "title": f"Load test quest {self.rng.randrange(10**6)}",
+            "description": "Quest created by the load generator.",
+            "topics": self.rng.sample(
+                topics, k=self.rng.randint(1, min(3, len(topics)))
+            ),
+            "price": round(self.rng.uniform(10, 100), 2),
+            "latitude": round(self.rng.uniform(*LATITUDE_RANGE), 6),
+            "longitude": round(self.rng.uniform(*LONGITUDE_RANGE), 6),
+            "deadline": (
+                datetime.now() + timedelta(days=self.rng.randint(1, 30))
+            ).isoformat(),
+        }
+        response = await self.request(
+            stats, "POST /api/quests", "POST", "/api/quests", json=quest
+        )
+        if response is not None and response.status_code == 201:
+            quest_id = response.json()["quest"]["_id"]
+            self.own_quests.append(quest_id)
+            self.remember_quests([{"_id": quest_id}])
+
+    async def apply_to_quest(self, stats: LoadStats):
+        candidates = [
+            quest_id
+            for quest_id in self.shared["quest_ids"]
+            if quest_id not in self.own_quests
+        ]
+        if not candidates:
+            return await self.list_quests(stats)
+        quest_id = self.rng.choice(candidates)
+        await self.request(
+            stats,
+            "POST /api/quests/{quest_id}/apply",
+            "POST",
+            f"/api/quests/{quest_id}/apply",
+        )
+
+    async def close_quest(self, stats: LoadStats):
+        if not self.own_quests:
+            return await self.create_quest(stats)
+        quest_id = self.own_quests.pop(self.rng.randrange(len(self.own_quests)))
+        await self.request(
+            stats,
+            "POST /api/quests/{quest_id}/close",
+            "POST",
+            f"/api/quests/{quest_id}/close",
+        )
+
+
+OPERATIONS = {
+    "list": VirtualUser.list_quests,
+    "filter": VirtualUser.filter_quests,
+    "detail": VirtualUser.get_quest,
+    "create": VirtualUser.create_quest,
+    "apply": VirtualUser.apply_to_quest,
+    "close": VirtualUser.close_quest,
+}
+
+
+def parse_auth_cookie(response: httpx.Response) -> str:
+    for header in response.headers.get_list("set-cookie"):
+        name, _, rest = header.partition("=")
+        if name.strip() == "auth_token":
+            return rest.split(";", 1)[0]
+    raise RuntimeError("No auth_token cookie in the login response")
+
+
+def parse_mix(mix: str) -> dict[str, float]:
+    """
+    Parse a request mix such as "list=30,detail=70" into operation weights
+
+    Raises:
+            ValueError: Unknown operation or no positive weight
+    """
+    weights = {}
+    for pair in mix.split(","):
+        name, _, weight = pair.partition("=")
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise ValueError(
+                f"Unknown operation '{name}', use one of {', '.join(OPERATIONS)}"
+            )
+        weights[name] = float(weight)
+    if sum(weights.values()) <= 0:
+        raise ValueError("The request mix needs a positive weight")
+    return weights
+
+
+async def run_user(
+    user: VirtualUser,
+    stats: LoadStats,
+    weights: dict[str, float],
+    think_time: float,
+    deadline: float,
+):
+    names, relative_weights = list(weights), list(weights.values())
+    while time.monotonic() < deadline:
+        [name] = user.rng.choices(names, weights=relative_weights)
+        await OPERATIONS[name](user, stats)
+        remaining = deadline - time.monotonic()
+        if think_time > 0 and remaining > 0:
+            # Exponential think times, as for independently arriving users
+            await asyncio.sleep(min(user.rng.expovariate(1 / think_time), remaining))
+
+
+async def run_load(
+    base_url: str,
+    users: int,
+    duration: float,
+    weights: dict[str, float],
+    think_time: float,
+    ramp_up: float = 0.0,
+    max_connections: int = 100,
+    timeout: float = 30.0,
+    seed: int = 0,
+    transport: httpx.AsyncBaseTransport | None = None,
+) -> dict:
+    """
+    Run simulated users against a server for a fixed duration
+
+    Args:
+            base_url (str): Server URL
+            users (int): Number of concurrent simulated users
+            duration (float): Seconds to generate load for, after logging in
+            weights (dict[str, float]): Relative frequency of every operation
+            think_time (float): Mean pause between a user's requests, in seconds
+            ramp_up (float): Seconds over which the users start
+            max_connections (int): Size of the shared connection pool
+            timeout (float): Request timeout in seconds
+            seed (int): Random seed
+            transport (httpx.AsyncBaseTransport): Transport to use instead of
+                    a connection pool, such as an ASGI transport in tests
+
+    Returns:
+            dict: Run settings, duration and the per-endpoint report
+    """
+    transport = transport or httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(
+            max_connections=max_connections, max_keepalive_connections=max_connections
+        )
+    )
+    stats = LoadStats()
+    shared = {"quest_ids": [], "topics": []}
+    rng = random.Random(seed)
+    # Every user keeps its own cookie, the connection pool is shared
+    virtual_users = [
+        VirtualUser(
+            index,
+            httpx.AsyncClient(base_url=base_url, transport=transport, timeout=timeout),
+            shared,
+            random.Random(rng.random()),
+        )
+        for index in range(users)
+    ]
+
+    try:
+        await asyncio.gather(*(user.login(stats) for user in virtual_users))
+        topics = await virtual_users[0].client.get("/api/topics")
+        shared["topics"] = (
+            topics.json().get("topics", []) if topics.status_code == 200 else []
+        )
+        if not shared["topics"]:
+            print(
+                "No topics in the database, quests cannot be created", file=sys.stderr
+            )
+
+        started = time.monotonic()
+        deadline = started + duration
+
+        async def start_user(index: int, user: VirtualUser):
+            await asyncio.sleep(ramp_up * index / users)
+            await run_user(user, stats, weights, think_time, deadline)
+
+        await asyncio.gather(
+            *(start_user(index, user) for index, user in enumerate(virtual_users))
+        )
+        elapsed = time.monotonic() - started
+    finally:
+        await transport.aclose()
+
+    return {
+        "base_url": base_url,
+        "users": users,
+        "duration_seconds": round(elapsed, 2),
+        "think_time_seconds": think_time,
+        "mix": weights,
+        "endpoints": stats.report(elapsed),
+    }
+
+
+def print_report(result: dict):
+    print(
+        f"{'endpoint':40} {'requests':>9} {'req/s':>8} {'p50 ms':>9} "
+        f"{'p95 ms':>9} {'p99 ms':>9} {'errors':>7}"
+    )
+    for row in result["endpoints"]:
+        print(
+            f"{row['endpoint']:40} {row['requests']:>9} "
+            f"{row['requests_per_second']:>8} {row['p50_ms']:>9} "
+            f"{row['p95_ms']:>9} {row['p99_ms']:>9} {row['errors']:>7}"
+        )
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds")
+    parser.add_argument(
+        "--mix",
+        default=DEFAULT_MIX,
+        help=f"Relative weight of every operation (default: {DEFAULT_MIX})",
+    )
+    parser.add_argument(
+        "--think-time",
+        type=float,
+        default=1.0,
+        help="Mean pause between a user's requests, in seconds",
+    )
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds")
+    parser.add_argument("--max-connections", type=int, default=100)
+    parser.add_argument("--timeout", type=float, default=30.0, help="Seconds")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args(argv)
+
+    result = asyncio.run(
+        run_load(
+            base_url=args.base_url,
+            users=args.users,
+            duration=args.duration,
+            weights=parse_mix(args.mix),
+            think_time=args.think_time,
+            ramp_up=args.ramp_up,
+            max_connections=args.max_connections,
+            timeout=args.timeout,
+            seed=args.seed,
+        )
+    )
+    print_report(result)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(result, file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,358 @@
+"""
+Benchmark the CRUD functions, the auth cookie lookup and serialization.
+
+Seeds a dataset of N users and N quests, times every benchmark and writes the
+latency percentiles and throughput to a JSON file. Encoding benchmarks also
+record the size of the payload they produce. Passing an earlier result
+file as --baseline fails the run when a benchmark got slower than the
+threshold allows.
+
+Usage (from the server directory):
+
+    python -m benchmarks.run --size 1k --size 100k
+    python -m benchmarks.run --size 1k --size 10k --benchmark encode_json_quests \
+        --benchmark encode_msgpack_quests
+    python -m benchmarks.run --backend mongod --mongo-uri mongodb://localhost:27017
+    python -m benchmarks.run --baseline benchmarks/results/<previous>.json
+"""
+
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Callable
+import mongomock
+from pymongo import MongoClient
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from benchmarks.dataset import seed_dataset
+from benchmarks.stats import percentile
+from server import authenticate_user
+from db.migrations import apply_migrations
+from db.crud import crud_quests, crud_users
+from db.crud.serialize import serialize_objectid
+from db.instrumentation import InstrumentedDatabase
+from db.topic_cache import topic_cache
+from endpoints.api.negotiation import packb
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+DATABASE_NAME = "local_quest_benchmark"
+
+
+def make_request(auth_token: str) -> Request:
+    """Minimal request carrying the auth cookie, for CRUD functions reading it."""
+    headers = [(b"cookie", f"auth_token={auth_token}".encode())]
+    return Request({"type": "http", "method": "GET", "path": "/", "headers": headers})
+
+
+def bench_get_quests(db, data) -> Callable:
+    return lambda: crud_quests.get_quests_db(db)
+
+
+def bench_filter_quests(db, data) -> Callable:
+    rng = random.Random(1)
+    return lambda: crud_quests.filter_quests_db(
+        db, topics=rng.sample(data["topics"], k=2), prices=[20.0, 60.0]
+    )
+
+
+def bench_get_user_by_id(db, data) -> Callable:
+    user_ids = itertools.cycle(data["user_ids"])
+    return lambda: crud_users.get_user_by_id_db(db, str(next(user_ids)))
+
+
+def bench_add_applicant(db, data) -> Callable:
+    # Every call applies to another quest, so none fails as already applied
+    quest_ids = itertools.cycle(data["quest_ids"])
+    request = make_request(data["auth_token"])
+    return lambda: crud_quests.add_applicant_to_quest_db(
+        db, str(next(quest_ids)), request
+    )
+
+
+def bench_auth_cookie_lookup(db, data) -> Callable:
+    # The lookup the auth middleware runs for every request, without the
+    # request handling around it
+    return lambda: authenticate_user(db, data["auth_token"])
+
+
+def bench_serialize(db, data) -> Callable:
+    quests = list(db["quests"].find().limit(100))
+    return lambda: serialize_objectid(quests)
+
+
+def bench_encode_json(db, data) -> Callable:
+    # The listing GET /api/quests returns, encoded as the JSON response body
+    content = {"quests": crud_quests.get_quests_db(db)}
+    response = JSONResponse(None)
+    return lambda: response.render(content)
+
+
+def bench_encode_msgpack(db, data) -> Callable:
+    content = {"quests": crud_quests.get_quests_db(db)}
+    return lambda: packb(content)
+
+
+BENCHMARKS: dict[str, Callable] = {
+    "get_quests_db": bench_get_quests,
+    "filter_quests_db": bench_filter_quests,
+    "get_user_by_id_db": bench_get_user_by_id,
+    "add_applicant_to_quest_db": bench_add_applicant,
+    "auth_cookie_lookup": bench_auth_cookie_lookup,
+    "serialize_objectid_100_quests": bench_serialize,
+    "encode_json_quests": bench_encode_json,
+    "encode_msgpack_quests": bench_encode_msgpack,
+}
+
+
+def parse_size(value: str) -> int:
+    return SIZES.get(value.lower()) or int(value)
+
+
+def measure(func: Callable, iterations: int, warmup: int, max_seconds: float) -> dict:
+    """
+    Time repeated calls of a function
+
+    Args:
+            func (Callable): Function to time
+            iterations (int): Number of timed calls
+            warmup (int): Number of untimed calls first
+            max_seconds (float): Stop early once this much time was spent timing
+
+    Returns:
+            dict: Iterations, throughput and latency statistics in milliseconds,
+            and payload_bytes when the function returns bytes
+    """
+    for _ in range(warmup):
+        func()
+
+    latencies = []
+    started = time.perf_counter()
+    while len(latencies) < iterations:
+        call_started = time.perf_counter()
+        output = func()
+        latencies.append(time.perf_counter() - call_started)
+        if time.perf_counter() - started >= max_seconds:
+            break
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    stats = {
+        "iterations": len(latencies),
+        "ops_per_second": round(len(latencies) / elapsed, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 4),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 4),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 4),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 4),
+        "max_ms": round(latencies[-1] * 1000, 4),
+    }
+    if isinstance(output, bytes):
+        stats["payload_bytes"] = len(output)
+    return stats
+
+
+def open_database(backend: str, mongo_uri: str):
+    """
+    Open an empty benchmark database
+
+    A local mongod is migrated like production, so it has the same
+    collections, validators and indexes. Mongomock supports neither, and
+    ignores indexes anyway.
+    """
+    if backend == "mongomock":
+        return mongomock.MongoClient()[DATABASE_NAME]
+
+    client = MongoClient(mongo_uri)
+    client.drop_database(DATABASE_NAME)
+    db = client[DATABASE_NAME]
+    apply_migrations(db)
+    return db
+
+
+def run_benchmarks(
+    backend: str,
+    sizes: list[int],
+    names: list[str],
+    iterations: int,
+    warmup: int,
+    max_seconds: float,
+    mongo_uri: str = "mongodb://localhost:27017",
+) -> list[dict]:
+    """
+    Seed a database per size and run the selected benchmarks against it
+
+    Returns:
+            list[dict]: One result per (size, benchmark)
+    """
+    results = []
+    for size in sizes:
+        db = open_database(backend, mongo_uri)
+        topic_cache.clear()
+        seeding_started = time.perf_counter()
+        data = seed_dataset(db, size)
+        seeding_seconds = time.perf_counter() - seeding_started
+        print(f"Seeded {size} users and quests in {seeding_seconds:.1f}s")
+        instrumented_db = InstrumentedDatabase(db)
+
+        for name in names:
+            stats = measure(
+                BENCHMARKS[name](instrumented_db, data), iterations, warmup, max_seconds
+            )
+            result = {"benchmark": name, "backend": backend, "size": size, **stats}
+            results.append(result)
+            payload = (
+                f" bytes={stats['payload_bytes']}" if "payload_bytes" in stats else ""
+            )
+            print(
+                f"{name:32} size={size:<8} p50={stats['p50_ms']:.3f}ms "
+                f"p95={stats['p95_ms']:.3f}ms ops/s={stats['ops_per_second']}"
+                f"{payload}"
+            )
+    return results
+
+
+def result_key(result: dict) -> tuple:
+    return (result["benchmark"], result["backend"], result["size"])
+
+
+def find_regressions(
+    results: list[dict], baseline: list[dict], metric: str, threshold: float
+) -> list[dict]:
+    """
+    Compare results with a baseline run
+
+    Args:
+            results (list[dict]): Results of this run
+            baseline (list[dict]): Results of the baseline run
+            metric (str): Latency statistic to compare, such as "p50_ms"
+            threshold (float): Allowed slowdown, 0.2 allows 20% slower
+
+    Returns:
+            list[dict]: Benchmarks slower than the threshold allows, with both values
+    """
+    baseline_by_key = {result_key(result): result for result in baseline}
+    regressions = []
+    for result in results:
+        previous = baseline_by_key.get(result_key(result))
+        if previous is None or previous[metric] <= 0:
+            continue
+        change = result[metric] / previous[metric] - 1
+        if change > threshold:
+            regressions.append(
+                {
+                    "benchmark": result["benchmark"],
+                    "backend": result["backend"],
+                    "size": result["size"],
+                    "metric": metric,
+                    "baseline": previous[metric],
+                    "current": result[metric],
+                    "change": round(change, 4),
+                }
+            )
+    return regressions
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--size",
+        action="append",
+        type=parse_size,
+        help="Number of users and quests: 1k, 10k, 100k, 1m or a number (repeatable)",
+    )
+    parser.add_argument(
+        "--backend", choices=["mongomock", "mongod"], default="mongomock"
+    )
+    parser.add_argument("--mongo-uri", default="mongodb://localhost:27017")
+    parser.add_argument(
+        "--benchmark",
+        action="append",
+        choices=list(BENCHMARKS),
+        help="Benchmark to run (repeatable), all by default",
+    )
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument(
+        "--max-seconds",
+        type=float,
+        default=30.0,
+        help="Stop timing a benchmark after this long, even with iterations left",
+    )
+    parser.add_argument(
+        "--output", help="Result file, in benchmarks/results by default"
+    )
+    parser.add_argument("--baseline", help="Earlier result file to compare with")
+    parser.add_argument(
+        "--metric", default="p50_ms", choices=["mean_ms", "p50_ms", "p95_ms", "p99_ms"]
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.2,
+        help="Allowed slowdown against the baseline, 0.2 allows 20%% slower",
+    )
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(
+        backend=args.backend,
+        sizes=args.size or [SIZES["1k"]],
+        names=args.benchmark or list(BENCHMARKS),
+        iterations=args.iterations,
+        warmup=args.warmup,
+        max_seconds=args.max_seconds,
+        mongo_uri=args.mongo_uri,
+    )
+
+    started_at = datetime.now(timezone.utc)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{started_at:%Y%m%dT%H%M%S}-{args.backend}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as file:
+        json.dump(
+            {
+                "meta": {
+                    "created_at": started_at.isoformat(),
+                    "commit": git_commit(),
+                    "python": platform.python_version(),
+                    "platform": platform.platform(),
+                },
+                "results": results,
+            },
+            file,
+            indent=2,
+        )
+    print(f"Results written to {output}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as file:
+        baseline = json.load(file)["results"]
+    regressions = find_regressions(results, baseline, args.metric, args.threshold)
+    for regression in regressions:
+        print(
+            f"REGRESSION {regression['benchmark']} size={regression['size']}: "
+            f"{regression['metric']} {regression['baseline']} -> "
+            f"{regression['current']} ({regression['change']:+.0%})"
+        )
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,132 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta, timezone
+from fastapi import Request
+from pymongo.errors import DuplicateKeyError
+from db.errors import DbError
+
+# Reservations of requests that crashed are taken over after this long
+IDEMPOTENCY_LOCK_SECONDS = float(os.getenv("IDEMPOTENCY_LOCK_SECONDS", 60))
+
+
+def idempotency_record_id(request: Request, idempotency_key: str) -> str:
+    """
+    Build the id of an idempotency record
+
+    Keys are scoped to the caller's auth token and the endpoint, so two users
+    (or two endpoints) can never replay each other's responses.
+
+    Args:
+            request (Request): Request object
+            idempotency_key (str): Value of the Idempotency-Key header
+
+    Returns:
+            str: Record id
+    """
+    scope = "\n".join(
+        [
+            request.cookies.get("auth_token", ""),
+            request.method,
+            request.url.path,
+            idempotency_key,
+        ]
+    )
+    return hashlib.sha256(scope.encode("utf-8")).hexdigest()
+
+
+def request_fingerprint(payload) -> str:
+    """Hash a request payload so key reuse with a different body is detected."""
+    encoded = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()
+
+
+def reserve_idempotency_key(db, request: Request, idempotency_key: str, payload):
+    """
+    Reserve an idempotency key, or fetch the response stored for it
+
+    Args:
+            request (Request): Request object
+            idempotency_key (str): Value of the Idempotency-Key header
+            payload: JSON-compatible request payload
+
+    Returns:
+            tuple: (stored record or None, error message). A (None, "") result
+            means the key was reserved and the request should be executed.
+    """
+    idempotency_collection = db["idempotency_keys"]
+    record_id = idempotency_record_id(request, idempotency_key)
+    fingerprint = request_fingerprint(payload)
+    now = datetime.now(timezone.utc)
+    locked_until = now + timedelta(seconds=IDEMPOTENCY_LOCK_SECONDS)
+
+    try:
+        idempotency_collection.insert_one(
+            {
+                "_id": record_id,
+                "fingerprint": fingerprint,
+                "completed": False,
+                "created_at": now,
+                "locked_until": locked_until,
+            }
+        )
+        return None, ""
+    except DuplicateKeyError:
+        record = idempotency_collection.find_one({"_id": record_id})
+
+    if not record:
+        # The record expired between the insert and the read, retry once.
+        return reserve_idempotency_key(db, request, idempotency_key, payload)
+    if record["fingerprint"] != fingerprint:
+        return None, DbError.IDEMPOTENCY_KEY_REUSED_ERROR.value
+    if not record["completed"]:
+        # The reserving request crashed if its lock expired, take the key over
+        taken_over = idempotency_collection.update_one(
+            {
+                "_id": record_id,
+                "completed": False,
+                "$or": [
+                    {"locked_until": {"$lt": now}},
+                    {"locked_until": {"$exists": False}},
+                ],
+            },
+            {"$set": {"locked_until": locked_until}},
+        )
+        if taken_over.modified_count:
+            return None, ""
+        return None, DbError.IDEMPOTENCY_KEY_IN_PROGRESS_ERROR.value
+    return record, ""
+
+
+def save_idempotent_response(
+    db, request: Request, idempotency_key: str, status_code: int, content: bytes
+):
+    """
+    Store the response of a request executed under an idempotency key
+
+    The content is stored encoded, so a replay renders it in the format the
+    retry negotiates, with the same bytes a fresh response would have.
+
+    Args:
+            request (Request): Request object
+            idempotency_key (str): Value of the Idempotency-Key header
+            status_code (int): Response status code
+            content (bytes): Response content, encoded with pack_stored
+    """
+    db["idempotency_keys"].update_one(
+        {"_id": idempotency_record_id(request, idempotency_key)},
+        {"$set": {"completed": True, "status_code": status_code, "content": content}},
+    )
+
+
+def release_idempotency_key(db, request: Request, idempotency_key: str):
+    """
+    Drop a reservation whose request failed, so it can be retried
+
+    Args:
+            request (Request): Request object
+            idempotency_key (str): Value of the Idempotency-Key header
+    """
+    db["idempotency_keys"].delete_one(
+        {"_id": idempotency_record_id(request, idempotency_key), "completed": False}
+    )
@@ -3,6 +3,14 @@ from typing import List
 from pydantic import BaseModel
 from fastapi import Request
 from bson import ObjectId
+from pymongo import ReturnDocument
+from db.errors import DbError
+from db.events import emit_quest_event
+from db.locks import utcnow
+from db.quest_cache import quest_cache
+from db.read_routing import staleness_tolerant
+from db.topic_cache import topic_cache
+from metrics import track_db_function
 from endpoints.api.user_cookie import get_user_from_cookie
 from .serialize import serialize_objectid
 import logging
@@ -44,6 +52,7 @@ def check_user_is_creator(quest: dict, user: dict):
     return ""  # User is not the creator, return an empty string
 
 
+@track_db_function
 def get_quests_db(db):
     """
     Get all quests
@@ -51,11 +60,12 @@ def get_quests_db(db):
     Returns:
                     List[Quest]: List of quests
     """
-    quests_collection = db["quests"]
+    quests_collection = staleness_tolerant(db["quests"])
     quests = quests_collection.find()
     return [serialize_objectid(quest) for quest in quests]
 
 
+@track_db_function
 def create_quest_db(db, user_quest: Quest, request: Request):
     """
     Create a new quest
@@ -72,14 +82,9 @@ def create_quest_db(db, user_quest: Quest, request: Request):
     quests_collection = db["quests"]
 
     # Convert topic names to ObjectIds
-    topics_collection = db["topics"]
-    topic_ids = []
-    for topic_name in user_quest.topics:
-        topic = topics_collection.find_one({"name": topic_name})
-        if topic:
-            topic_ids.append(topic["_id"])
-        else:
-            return []
+    topic_ids, missing_topic = resolve_topic_ids(db, user_quest.topics)
+    if missing_topic is not None:
+        return []
 
     quest = {
         "title": user_quest.title,
@@ -92,12 +97,17 @@ def create_quest_db(db, user_quest: Quest, request: Request):
         "price": user_quest.price,
         "applicants": [],
         "status": "open",
+        "version": 1,
     }
     quests_collection.insert_one(quest)
+    quest_cache.invalidate_quest(quest["_id"])
 
-    return serialize_objectid(quest)
+    serialized_quest = serialize_objectid(quest)
+    emit_quest_event("create", serialized_quest)
+    return serialized_quest
 
 
+@track_db_function
 def get_quest_by_id_db(db, quest_id: str):
     """
     Get a quest by id
@@ -114,10 +124,13 @@ def get_quest_by_id_db(db, quest_id: str):
     try:
         quest_id = ObjectId(quest_id)
     except Exception as e:
-        logger.error("Invalid quest ID format", e)
+        logger.debug("Invalid quest ID format: %s", e)
         return None
 
     quest = quests_collection.find_one({"_id": quest_id})
+    if not quest:
+        # Closed quests are moved to the archive after a while, read through.
+        quest = db["quests_archive"].find_one({"_id": quest_id})
 
     if not quest:
         return None
@@ -125,13 +138,105 @@ def get_quest_by_id_db(db, quest_id: str):
     return serialize_objectid(quest)
 
 
-def put_quest_by_id_db(db, quest_id: str, user_quest: Quest, request: Request):
+@track_db_function
+def get_quest_version_db(db, quest_id: str):
+    """
+    Get the version of a quest, without reading the rest of it
+
+    Args:
+                    quest_id (str): Quest id
+
+    Returns:
+                    int: Version, 0 for unversioned quests, or None if not found
+    """
+    try:
+        quest_id = ObjectId(quest_id)
+    except Exception as e:
+        logger.debug("Invalid quest ID format: %s", e)
+        return None
+
+    for collection_name in ("quests", "quests_archive"):
+        quest = db[collection_name].find_one({"_id": quest_id}, {"version": 1})
+        if quest:
+            return quest.get("version", 0)
+    return None
+
+
+def resolve_topic_ids(db, topic_names: List[str]):
+    """
+    Resolve topic names to their ObjectIds from the topic cache
+
+    Args:
+                    topic_names (List[str]): Topic names
+
+    Returns:
+                    tuple: (topic ids in order, first missing topic name or None)
+    """
+    found = topic_cache.ids_by_name(db, topic_names)
+    for topic_name in topic_names:
+        if topic_name not in found:
+            return [], topic_name
+    return [found[topic_name] for topic_name in topic_names], None
+
+
+def explain_quest_update_failure(db, quest_id: ObjectId, user: dict):
+    """
+    Find out why a conditional quest update did not match any document.
+
+    Only runs on the failure path, so successful updates need no pre-read.
+
+    Args:
+                    quest_id (ObjectId): Quest id
+                    user (dict): User performing the update
+
+    Returns:
+                    str: Error message, or an empty string if the quest exists
+                    and belongs to the user
+    """
+    quest = db["quests"].find_one({"_id": quest_id}, {"created_by": 1})
+    if not quest:
+        # Archived quests are closed, and no longer writable
+        if db["quests_archive"].find_one({"_id": quest_id}, {"_id": 1}):
+            return DbError.QUEST_ARCHIVED_ERROR.value
+        return DbError.QUEST_NOT_FOUND_ERROR.value
+    if not check_user_is_creator(quest, user):
+        return "User is not the creator of this quest"
+    return ""
+
+
+def version_filter(expected_versions: List[int]):
+    """
+    Build the query condition matching any of the expected quest versions.
+
+    Quests written before versioning was introduced have no version field and
+    are treated as version 0.
+    """
+    versions = list(expected_versions)
+    if 0 in versions:
+        versions.append(None)
+    return {"$in": versions}
+
+
+@track_db_function
+def put_quest_by_id_db(
+    db,
+    quest_id: str,
+    user_quest: Quest,
+    request: Request,
+    expected_versions: List[int] = None,
+):
     """
     Update a quest by id
 
+    The update is a single conditional write matching the quest id, its creator
+    and (when given) one of the expected versions, so concurrent edits cannot
+    silently overwrite each other.
+
     Args:
                     quest_id (str): Quest id
                     user_quest (Quest): Quest data
+                    expected_versions (List[int], optional): Versions the client
+                    expects the quest to be at (from If-Match). Defaults to None.
 
     Returns:
                     Quest: Updated quest
@@ -140,47 +245,41 @@ def put_quest_by_id_db(db, quest_id: str, user_quest: Quest, request: Request):
     try:
         quest_id = ObjectId(quest_id)
     except Exception as e:
-        logger.error("Invalid quest ID format", e)
+        logger.debug("Invalid quest ID format: %s", e)
         return None, "Invalid quest ID format"
 
     user = get_user_from_cookie(request, db)
-    quest = get_quest_by_id_db(db, quest_id)
 
-    if not quest:
-        return None, "Quest not found"
+    topic_ids, missing_topic = resolve_topic_ids(db, user_quest.topics)
+    if missing_topic is not None:
+        error_msg = explain_quest_update_failure(db, quest_id, user)
+        return None, error_msg or f"Topic '{missing_topic}' not found"
 
-    error_msg = check_user_is_creator(quest, user)
-    if error_msg != "User is the creator of this quest":
-        error_msg = "User is not the creator of this quest"
-        return None, error_msg
+    update_data = user_quest.model_dump()
+    update_data["topics"] = topic_ids
 
-    topics_collection = db["topics"]
-    topic_ids = []
-    for topic_name in user_quest.topics:
-        topic = topics_collection.find_one({"name": topic_name})
-        if topic:
-            topic_ids.append(topic["_id"])
-        else:
-            return None, f"Topic '{topic_name}' not found"
-
-    update_data = {}
-    for key, value in user_quest.model_dump().items():
-        if value != quest.get(key):
-            update_data[key] = value
-
-    if topic_ids:
-        update_data["topics"] = topic_ids
-
-    if not update_data:
-        return None, "No changes to update"
+    query = {"_id": quest_id, "created_by": user["_id"]}
+    if expected_versions is not None:
+        query["version"] = version_filter(expected_versions)
 
     quests_collection = db["quests"]
-    quests_collection.update_one({"_id": quest_id}, {"$set": update_data})
-    updated_quest = quests_collection.find_one({"_id": quest_id})
+    updated_quest = quests_collection.find_one_and_update(
+        query,
+        {"$set": update_data, "$inc": {"version": 1}},
+        return_document=ReturnDocument.AFTER,
+    )
+
+    if not updated_quest:
+        error_msg = explain_quest_update_failure(db, quest_id, user)
+        return None, error_msg or DbError.QUEST_VERSION_MISMATCH_ERROR.value
+    quest_cache.invalidate_quest(quest_id)
 
-    return serialize_objectid(updated_quest), ""
+    serialized_quest = serialize_objectid(updated_quest)
+    emit_quest_event("update", serialized_quest)
+    return serialized_quest, ""
 
 
+@track_db_function
 def delete_quest_by_id_db(db, quest_id: str) -> bool:
     """
     Delete a quest by id
@@ -194,18 +293,22 @@ def delete_quest_by_id_db(db, quest_id: str) -> bool:
     try:
         quest_id = ObjectId(quest_id)
     except Exception as e:
-        logger.error("Invalid quest ID format", e)
+        logger.debug("Invalid quest ID format: %s", e)
         return None, "Invalid quest ID format"
-    quests_collection = db["quests"]
-
-    if not quests_collection.find_one({"_id": quest_id}):
+    # A quest can be in both collections while it is being archived. The
+    # archived copy goes first: change streams report deletes from quests
+    # whose archived copy remains as archiving.
+    archived_quest = db["quests_archive"].find_one_and_delete({"_id": quest_id})
+    quest = db["quests"].find_one_and_delete({"_id": quest_id}) or archived_quest
+    if not quest:
         return False
+    quest_cache.invalidate_quest(quest_id)
 
-    quests_collection.delete_one({"_id": quest_id})
-
+    emit_quest_event("delete", serialize_objectid(quest))
     return True
 
 
+@track_db_function
 def filter_quests_db(db, topics: List[str] = None, prices: List[float] = None):
     """
     Get quests that match the given topics and/or price range.
@@ -224,15 +327,12 @@ def filter_quests_db(db, topics: List[str] = None, prices: List[float] = None):
     if not topics and not prices:
         raise ValueError("Either topics or prices must be provided")
 
-    quests_collection = db["quests"]
-    topics_collection = db["topics"]
+    quests_collection = staleness_tolerant(db["quests"])
 
     query = {}
 
     if topics:
-        query_topic_ids = [
-            topic["_id"] for topic in topics_collection.find({"name": {"$in": topics}})
-        ]
+        query_topic_ids = list(topic_cache.ids_by_name(db, topics).values())
         query["topics"] = {"$in": query_topic_ids}
 
     if prices:
@@ -254,6 +354,7 @@ def filter_quests_db(db, topics: List[str] = None, prices: List[float] = None):
     return [serialize_objectid(quest) for quest in quests]
 
 
+@track_db_function
 def add_applicant_to_quest_db(db, quest_id: str, request: Request):
     """
     Add an applicant to a quest
@@ -286,14 +387,19 @@ def add_applicant_to_quest_db(db, quest_id: str, request: Request):
     applicants.append(user["_id"])
 
     quests_collection.update_one(
-        {"_id": ObjectId(quest_id)}, {"$set": {"applicants": applicants}}
+        {"_id": ObjectId(quest_id)},
+        {"$set": {"applicants": applicants}, "$inc": {"version": 1}},
     )
+    quest_cache.invalidate_quest(quest_id)
 
     updated_quest = quests_collection.find_one({"_id": ObjectId(quest_id)})
 
-    return serialize_objectid(updated_quest), ""
+    serialized_quest = serialize_objectid(updated_quest)
+    emit_quest_event("apply", serialized_quest)
+    return serialized_quest, ""
 
 
+@track_db_function
 def close_quest_db(db, quest_id: str, request: Request):
     """
     Close a quest
@@ -319,9 +425,131 @@ def close_quest_db(db, quest_id: str, request: Request):
         return None, "User is not the creator of this quest"
 
     quests_collection.update_one(
-        {"_id": ObjectId(quest_id)}, {"$set": {"status": "closed"}}
+        {"_id": ObjectId(quest_id)},
+        {"$set": {"status": "closed", "closed_at": utcnow()}, "$inc": {"version": 1}},
     )
+    quest_cache.invalidate_quest(quest_id)
 
     updated_quest = quests_collection.find_one({"_id": ObjectId(quest_id)})
 
-    return serialize_objectid(updated_quest), ""
+    serialized_quest = serialize_objectid(updated_quest)
+    emit_quest_event("close", serialized_quest)
+    return serialized_quest, ""
+
+
+@track_db_function
+def close_expired_quests_db(db, now: datetime, batch_size: int):
+    """
+    Close open quests whose deadline has passed
+
+    Closes at most batch_size quests, oldest deadline first, with a single
+    update_many served by the (status, deadline) index.
+
+    Args:
+                    now (datetime): Quests with an earlier deadline are expired
+                    batch_size (int): Maximum number of quests to close
+
+    Returns:
+                    dict: Number of quests closed and the lag in seconds between
+                    the oldest closed deadline and now
+    """
+    quests_collection = db["quests"]
+    expired_query = {"status": "open", "deadline": {"$lt": now}}
+    expired_quests = list(
+        quests_collection.find(expired_query).sort("deadline", 1).limit(batch_size)
+    )
+    if not expired_quests:
+        return {"closed": 0, "lag_seconds": 0.0}
+
+    result = quests_collection.update_many(
+        {"_id": {"$in": [quest["_id"] for quest in expired_quests]}, **expired_query},
+        {"$set": {"status": "closed", "closed_at": now}, "$inc": {"version": 1}},
+    )
+
+    # Events carry the whole closed quest, as for closes through the API, built
+    # from the documents read above rather than read again
+    for quest in expired_quests:
+        quest_cache.invalidate_quest(quest["_id"])
+        quest["status"] = "closed"
+        quest["closed_at"] = now
+        quest["version"] = quest.get("version", 0) + 1
+        emit_quest_event("close", serialize_objectid(quest))
+
+    lag = now - expired_quests[0]["deadline"]
+    return {"closed": result.modified_count, "lag_seconds": lag.total_seconds()}
+
+
+@track_db_function
+def archive_closed_quests_db(db, closed_before: datetime, batch_size: int):
+    """
+    Move quests closed before a cutoff from quests to quests_archive
+
+    Keeps the hot quests collection (and its indexes) limited to open and
+    recently closed quests. Archived quests stay readable through
+    get_quest_by_id_db and user profiles.
+
+    Args:
+                    closed_before (datetime): Archive quests closed before this time.
+                    Quests closed before closed_at was recorded use their deadline.
+                    batch_size (int): Maximum number of quests to move
+
+    Returns:
+                    dict: Number of quests archived
+    """
+    quests_collection = db["quests"]
+    archive_collection = db["quests_archive"]
+    quests = list(
+        quests_collection.find(
+            {
+                "status": "closed",
+                "$or": [
+                    {"closed_at": {"$lt": closed_before}},
+                    {
+                        "closed_at": {"$exists": False},
+                        "deadline": {"$lt": closed_before},
+                    },
+                ],
+            }
+        ).limit(batch_size)
+    )
+    if not quests:
+        return {"archived": 0}
+
+    # Drop copies left by a previous run that died before deleting from quests.
+    quest_ids = [quest["_id"] for quest in quests]
+    archive_collection.delete_many({"_id": {"$in": quest_ids}})
+    archive_collection.insert_many(quests, ordered=False)
+    # Only remove quests that were not modified since they were copied.
+    result = quests_collection.delete_many(
+        {
+            "$or": [
+                {"_id": quest["_id"], "version": quest.get("version")}
+                for quest in quests
+            ]
+        }
+    )
+    edited_ids = []
+    if result.deleted_count < len(quests):
+        # Quests edited while being moved stay hot, drop their stale copies.
+        edited_ids = quests_collection.distinct("_id", {"_id": {"$in": quest_ids}})
+        archive_collection.delete_many({"_id": {"$in": edited_ids}})
+    # Archived quests read the same by id, but leave the quest lists
+    quest_cache.invalidate_lists()
+    for quest in quests:
+        if quest["_id"] not in edited_ids:
+            emit_quest_event("archive", serialize_objectid(quest))
+    return {"archived": result.deleted_count}
+
+
+@track_db_function
+def get_quest_storage_stats_db(db):
+    """
+    Get the size of the hot and archived quest sets
+
+    Returns:
+                    dict: Estimated number of quests in each collection
+    """
+    return {
+        "hot_quests": db["quests"].estimated_document_count(),
+        "archived_quests": db["quests_archive"].estimated_document_count(),
+    }
@@ -1,10 +1,18 @@
 import re
 from bson import ObjectId
 from fastapi import Request
+from db.quest_cache import quest_cache
+from db.read_routing import staleness_tolerant
+from db.topic_cache import topic_cache
 from .serialize import serialize_objectid
 from endpoints.api.user_cookie import get_user_from_cookie
+from metrics import track_db_function
 
+# Quest collections looked up with a user, hot first
+QUEST_LOOKUPS = (("quests", "quests"), ("archived_quests", "quests_archive"))
 
+
+@track_db_function
 def get_users_db(db):
     """
     Get all users
@@ -20,6 +28,7 @@ def get_users_db(db):
     return [serialize_objectid(user) for user in users]
 
 
+@track_db_function
 def get_user_by_id_db(db, user_id: str):
     """
     Get user by ID or username
@@ -31,33 +40,73 @@ def get_user_by_id_db(db, user_id: str):
         User: User containing the created/applied quests
     """
 
-    users_collection = db["users"]
-    quests_collection = db["quests"]
-    topics_collection = db["topics"]
+    # Profiles may lag the primary a little, see db.read_routing
+    users_collection = staleness_tolerant(db["users"])
 
-    # Check if the user_id is a valid ObjectId
+    # Look the user up by id if the string is a valid ObjectId, by username otherwise
     if validate_object_id(user_id):
-        user = users_collection.find_one({"_id": ObjectId(user_id)})
+        match = {"_id": ObjectId(user_id)}
     else:
-        # Check if the user_id is a valid username
-        if not check_if_valid_user_id_or_name(user_id, users_collection):
-            return None
-        user = users_collection.find_one({"username": user_id})
+        match = {"username": user_id}
+
+    # Fetch the user with its created and applied quests, hot and archived, in
+    # a single round trip
+    pipeline = [{"$match": match}, {"$limit": 1}]
+    for field, collection_name in QUEST_LOOKUPS:
+        for quest_field in ("created_by", "applicants"):
+            pipeline.append(
+                {
+                    "$lookup": {
+                        "from": collection_name,
+                        "localField": "_id",
+                        "foreignField": quest_field,
+                        "as": f"{field}_{quest_field}",
+                    }
+                }
+            )
+    user = next(iter(users_collection.aggregate(pipeline)), None)
 
     if not user:
         return None
 
-    # Fetch created quests
-    created_quests = list(quests_collection.find({"created_by": user["_id"]}))
-    for quest in created_quests:
-        quest["topics"] = [fetch_topic(topics_collection, topic_id) for topic_id in quest.get("topics", [])]
-        quest["applicants"] = [fetch_user(users_collection, applicant_id) for applicant_id in quest.get("applicants", [])]
-
-    # Fetch applied quests
-    applied_quests = list(quests_collection.find({"applicants": user["_id"]}))
-    for quest in applied_quests:
-        quest["topics"] = [fetch_topic(topics_collection, topic_id) for topic_id in quest.get("topics", [])]
-        quest["applicants"] = [fetch_user(users_collection, applicant_id) for applicant_id in quest.get("applicants", [])]
+    # Merge the lookups, hot quests first. A quest in both collections (an
+    # archive run interrupted mid-move) is kept once, as hot
+    quests_by_id = {}
+    for field, _ in QUEST_LOOKUPS:
+        for quest_field in ("created_by", "applicants"):
+            for quest in user.pop(f"{field}_{quest_field}"):
+                quests_by_id.setdefault(quest["_id"], quest)
+    quests = list(quests_by_id.values())
+
+    # Resolve the topics from the topic cache and the applicants with one
+    # query, whatever the number of quests
+    created_quests = [quest for quest in quests if quest["created_by"] == user["_id"]]
+    applied_quests = [
+        quest for quest in quests if user["_id"] in quest.get("applicants", [])
+    ]
+
+    topic_ids = {
+        ObjectId(topic_id) for quest in quests for topic_id in quest.get("topics", [])
+    }
+    applicant_ids = {
+        ObjectId(applicant_id)
+        for quest in quests
+        for applicant_id in quest.get("applicants", [])
+    }
+    topic_names = topic_cache.names_by_id(db, topic_ids)
+    applicants = fetch_users(users_collection, applicant_ids)
+    for quest in quests:
+        quest["topics"] = [
+            topic_names.get(ObjectId(topic_id), "Unknown Topic")
+            for topic_id in quest.get("topics", [])
+        ]
+        quest["applicants"] = [
+            applicants.get(
+                ObjectId(applicant_id),
+                {"_id": str(applicant_id), "username": "Unknown User"},
+            )
+            for applicant_id in quest.get("applicants", [])
+        ]
 
     user["created_quests"] = [serialize_objectid(quest) for quest in created_quests]
     user["applied_quests"] = [serialize_objectid(quest) for quest in applied_quests]
@@ -65,20 +114,6 @@ def get_user_by_id_db(db, user_id: str):
     return serialize_objectid(user)
 
 
-def check_if_valid_user_id_or_name(user_id: str, users_collection) -> bool:
-    """
-    Checks if the given string is a valid user ID or username.
-
-    Args:
-        user_id (str): The string to validate
-        users_collection (Collection): The users collection
-
-    Returns:
-        bool: True if the string is a valid user ID or username, False otherwise
-    """
-    return bool(users_collection.find_one({"username": user_id}))
-
-
 def validate_object_id(id_string: str) -> bool:
     """
     Validates if the given string is a valid ObjectId.
@@ -92,22 +127,21 @@ def validate_object_id(id_string: str) -> bool:
     return bool(re.match(r"^[a-fA-F0-9]{24}$", str(id_string)))
 
 
-def fetch_topic(topics_collection, topic_id):
-    """Fetches topic details by ID."""
-    topic = topics_collection.find_one({"_id": ObjectId(topic_id)})
-    return topic["name"] if topic else "Unknown Topic"
-
-
-def fetch_user(users_collection, user_id):
-    """Fetches user details by ID."""
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-    return (
-        {"_id": str(user["_id"]), "username": user.get("username", "Unknown User")}
-        if user
-        else {"_id": str(user_id), "username": "Unknown User"}
-    )
+def fetch_users(users_collection, user_ids) -> dict:
+    """Fetches the IDs and usernames of the given users, keyed by user ID."""
+    if not user_ids:
+        return {}
+    users = users_collection.find({"_id": {"$in": list(user_ids)}}, {"username": 1})
+    return {
+        user["_id"]: {
+            "_id": str(user["_id"]),
+            "username": user.get("username", "Unknown User"),
+        }
+        for user in users
+    }
 
 
+@track_db_function
 def delete_user_by_id_db(db, request: Request, user_id: str):
     """
     Delete user by ID
@@ -125,20 +159,18 @@ def delete_user_by_id_db(db, request: Request, user_id: str):
 
     user = get_user_from_cookie(db=db, request=request)
 
-    print(user["_id"] == ObjectId(user_id))
-
     if user["_id"] != ObjectId(user_id):
         return False
 
-    user = users_collection.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        return False
-
-    quests_collection.delete_many({"created_by": ObjectId(user_id)})
+    for collection in (quests_collection, db["quests_archive"]):
+        collection.delete_many({"created_by": ObjectId(user_id)})
 
-    quests_collection.update_many(
-        {"applicants": ObjectId(user_id)}, {"$pull": {"applicants": ObjectId(user_id)}}
-    )
+        collection.update_many(
+            {"applicants": ObjectId(user_id)},
+            {"$pull": {"applicants": ObjectId(user_id)}, "$inc": {"version": 1}},
+        )
 
     users_collection.delete_one({"_id": ObjectId(user_id)})
+    # The user's quests are gone and their applications withdrawn
+    quest_cache.clear()
     return True
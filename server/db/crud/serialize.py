@@ -1,20 +1,50 @@
+import time
 from bson.objectid import ObjectId
 from datetime import datetime
+from db.instrumentation import request_stats
+
+
+class SerializedObjectId(str):
+    """
+    Hex string of an ObjectId
+
+    A str everywhere, so JSON encodes it as before; MessagePack responses
+    recognise it and send the 12 bytes of the ObjectId instead.
+    """
+
+    __slots__ = ()
+
+
+class SerializedDatetime(str):
+    """ISO 8601 string of a datetime, sent as a timestamp by MessagePack."""
+
+    __slots__ = ()
 
 
 def serialize_objectid(obj):
     """
-    Recursively converts ObjectId to string in a dict or list.
+    Recursively converts ObjectId and datetime to strings in a dict or list.
+
+    The time spent is added to the current request's serialization time.
     """
+    started = time.perf_counter()
+    serialized = _serialize(obj)
+    stats = request_stats.get()
+    if stats is not None:
+        stats.serialize_seconds += time.perf_counter() - started
+    return serialized
+
+
+def _serialize(obj):
     if isinstance(obj, ObjectId):
-        return str(obj)
+        return SerializedObjectId(str(obj))
     elif isinstance(obj, dict):
-        return {key: serialize_objectid(value) for key, value in obj.items()}
+        return {key: _serialize(value) for key, value in obj.items()}
     elif isinstance(obj, tuple):
-        return tuple(serialize_objectid(item) for item in obj)
+        return tuple(_serialize(item) for item in obj)
     elif isinstance(obj, list):
-        return [serialize_objectid(item) for item in obj]
+        return [_serialize(item) for item in obj]
     elif isinstance(obj, datetime):
-        return obj.isoformat()
+        return SerializedDatetime(obj.isoformat())
     else:
         return obj
@@ -2,17 +2,56 @@ from typing import Callable
 from db.connect_db import uri
 from pymongo.mongo_client import MongoClient
 from pymongo.server_api import ServerApi
+from db.instrumentation import InstrumentedDatabase
+from db.monitoring import PoolMetricsListener, query_monitor
+import os
+import threading
+
+IDEMPOTENCY_KEY_TTL_SECONDS = int(
+    os.getenv("IDEMPOTENCY_KEY_TTL_SECONDS", 60 * 60 * 24)
+)
+# Connections the driver keeps open even when idle, so bursts after a quiet
+# period do not pay for new connections
+MONGODB_MIN_POOL_SIZE = int(os.getenv("MONGODB_MIN_POOL_SIZE", 0))
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> MongoClient:
+    """
+    Get the MongoClient shared by the whole process
+
+    The client owns the connection pool, so it is created once rather than
+    per request.
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = MongoClient(
+                    uri,
+                    server_api=ServerApi("1"),
+                    minPoolSize=MONGODB_MIN_POOL_SIZE,
+                    event_listeners=[PoolMetricsListener(), query_monitor],
+                )
+                query_monitor.client = _client
+    return _client
+
+
+def close_client():
+    """Close the shared MongoClient; the next get_client() opens a new one."""
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
 
 
 def get_db_connection():
-    client = MongoClient(uri, server_api=ServerApi("1"))
-    db = client["local_quest"]
-    return db
-
-
-def collection_exists(db, collection_name: str) -> bool:
-    """Check if a collection already exists in the database."""
-    return collection_name in db.list_collection_names()
+    db = get_client()["local_quest"]
+    return InstrumentedDatabase(db)
 
 
 def create_users_table(db):
@@ -88,52 +127,80 @@ def create_topics_table(db):
     topics.insert_many(initial_topics)
 
 
+QUEST_VALIDATOR = {
+    "$jsonSchema": {
+        "bsonType": "object",
+        "required": [
+            "title",
+            "description",
+            "topics",
+            "created_by",
+            "longitude",
+            "price",
+            "latitude",
+            "deadline",
+            "applicants",
+            "status",
+            "version",
+        ],
+        "properties": {
+            "title": {"bsonType": "string", "minLength": 5},
+            "description": {"bsonType": "string", "minLength": 10},
+            "topics": {"bsonType": "array", "items": {"bsonType": "objectId"}},
+            "price": {"bsonType": "double", "minimum": 0},
+            "created_by": {"bsonType": "objectId"},
+            "longitude": {"bsonType": "double"},
+            "latitude": {"bsonType": "double"},
+            "deadline": {"bsonType": "date"},
+            "applicants": {
+                "bsonType": "array",
+                "items": {"bsonType": "objectId"},
+            },
+            "status": {"enum": ["open", "processing", "closed"]},
+            "version": {"bsonType": ["int", "long"], "minimum": 0},
+        },
+    }
+}
+
+
 def create_quest_table(db):
     db.create_collection(
         "quests",
-        validator={
-            "$jsonSchema": {
-                "bsonType": "object",
-                "required": [
-                    "title",
-                    "description",
-                    "topics",
-                    "created_by",
-                    "longitude",
-                    "price",
-                    "latitude",
-                    "deadline",
-                    "applicants",
-                    "status",
-                ],
-                "properties": {
-                    "title": {"bsonType": "string", "minLength": 5},
-                    "description": {"bsonType": "string", "minLength": 10},
-                    "topics": {"bsonType": "array", "items": {"bsonType": "objectId"}},
-                    "price": {"bsonType": "double", "minimum": 0},
-                    "created_by": {"bsonType": "objectId"},
-                    "longitude": {"bsonType": "double"},
-                    "latitude": {"bsonType": "double"},
-                    "deadline": {"bsonType": "date"},
-                    "applicants": {
-                        "bsonType": "array",
-                        "items": {"bsonType": "objectId"},
-                    },
-                    "status": {"enum": ["open", "processing", "closed"]},
-                },
-            }
-        },
+        validator=QUEST_VALIDATOR,
     )
     quests = db["quests"]
     quests.create_index("title")
     quests.create_index("created_by")
     quests.create_index("status")
+    quests.create_index([("status", 1), ("deadline", 1)])
     quests.create_index("topics")
     quests.create_index([("longitude", 1), ("latitude", 1)])
 
 
-def create_tables():
-    db = get_db_connection()
+def create_quest_archive_table(db):
+    db.create_collection("quests_archive")
+    quests_archive = db["quests_archive"]
+    quests_archive.create_index("created_by")
+    quests_archive.create_index("applicants")
+
+
+def create_idempotency_keys_table(db):
+    db.create_collection("idempotency_keys")
+    idempotency_keys = db["idempotency_keys"]
+    idempotency_keys.create_index(
+        "created_at", expireAfterSeconds=IDEMPOTENCY_KEY_TTL_SECONDS
+    )
+
+
+def create_tables(db=None):
+    """
+    Create the missing collections with their validators and indexes
+
+    Args:
+            db (MongoDB connection): Database, the server's by default
+    """
+    if db is None:
+        db = get_db_connection()
 
     # Dictionary of collections and their corresponding creation functions
     tables: dict[str, Callable] = {
@@ -141,8 +208,11 @@ def create_tables():
         "cookies": create_cookies_table,
         "topics": create_topics_table,
         "quests": create_quest_table,
+        "quests_archive": create_quest_archive_table,
+        "idempotency_keys": create_idempotency_keys_table,
     }
 
+    existing_collections = set(db.list_collection_names())
     for collection_name, create_function in tables.items():
-        if not collection_exists(db, collection_name):
+        if collection_name not in existing_collections:
             create_function(db)
@@ -8,5 +8,9 @@ class DbError(Enum):
     INVALID_QUEST_STATUS_ERROR = "Invalid quest status"
     USER_ALREADY_APPLIED_ERROR = "User already applied to this quest"
     QUEST_NOT_FOUND_ERROR = "Quest not found"
+    QUEST_ARCHIVED_ERROR = "Quest is closed and archived"
     USER_ALREADY_EXISTS_ERROR = "User already exists"
     USER_IS_CREATOR_ERROR = "User is the creator of this quest"
+    QUEST_VERSION_MISMATCH_ERROR = "Quest has been modified since it was read"
+    IDEMPOTENCY_KEY_REUSED_ERROR = "Idempotency key used for another request"
+    IDEMPOTENCY_KEY_IN_PROGRESS_ERROR = "Idempotency key request in progress"
@@ -0,0 +1,286 @@
+import asyncio
+import logging
+import os
+import threading
+import uuid
+from collections import deque
+from typing import Callable
+from pymongo.errors import PyMongoError
+from db.crud.serialize import serialize_objectid
+
+logger = logging.getLogger(__name__)
+
+QUEST_EVENT_HISTORY_SIZE = int(os.getenv("QUEST_EVENT_HISTORY_SIZE", 1000))
+QUEST_EVENT_QUEUE_SIZE = int(os.getenv("QUEST_EVENT_QUEUE_SIZE", 256))
+
+QUEST_EVENT_TYPES = ("create", "update", "apply", "close", "delete", "archive")
+
+
+class BoundedEventQueue:
+    """
+    A bounded queue of events owned by one event loop.
+
+    Events can be pushed from any thread. When the consumer falls behind, the
+    oldest queued events are dropped rather than blocking the publisher.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, maxsize: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    def push(self, event: dict):
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The consumer's loop is closed, it will be unsubscribed shortly.
+            pass
+
+    def _put(self, event: dict):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(event)
+
+
+class QuestEventSubscription(BoundedEventQueue):
+    """The queue of quest events of one subscriber to the event bus."""
+
+
+class QuestEventBus:
+    """
+    In-process pub/sub of quest changes.
+
+    Events are published by the CRUD functions in crud_quests, or by a MongoDB
+    change stream watcher when the deployment supports change streams. A short
+    history is kept so clients can resume after a reconnect.
+    """
+
+    def __init__(self, history_size: int = QUEST_EVENT_HISTORY_SIZE):
+        self._lock = threading.Lock()
+        self._subscriptions: set[QuestEventSubscription] = set()
+        self._listeners: list[Callable[[dict], None]] = []
+        self._history: deque = deque(maxlen=history_size)
+        self._boot_id = uuid.uuid4().hex[:8]
+        self._sequence = 0
+        self.change_stream_active = False
+
+    def publish(self, event_type: str, quest: dict, event_id: str = None) -> dict:
+        """
+        Publish a quest event to every subscriber and listener
+
+        Args:
+                event_type (str): One of QUEST_EVENT_TYPES
+                quest (dict): Serialized quest
+                event_id (str, optional): Resume token, generated if omitted
+
+        Returns:
+                dict: Published event
+        """
+        with self._lock:
+            if event_id is None:
+                self._sequence += 1
+                event_id = f"{self._boot_id}-{self._sequence}"
+            event = {"id": event_id, "type": event_type, "quest": quest}
+            self._history.append(event)
+            subscriptions = list(self._subscriptions)
+            listeners = list(self._listeners)
+
+        for subscription in subscriptions:
+            subscription.push(event)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception:
+                logger.exception("Quest event listener failed")
+        return event
+
+    def subscribe(
+        self, loop: asyncio.AbstractEventLoop, last_event_id: str = None
+    ) -> tuple[QuestEventSubscription, list[dict]]:
+        """
+        Subscribe to quest events
+
+        Args:
+                loop (AbstractEventLoop): Loop the subscriber consumes events on
+                last_event_id (str, optional): Resume token of the last event seen
+
+        Returns:
+                tuple: (subscription, events published after last_event_id that
+                are still in the history)
+        """
+        subscription = QuestEventSubscription(loop, QUEST_EVENT_QUEUE_SIZE)
+        with self._lock:
+            self._subscriptions.add(subscription)
+            history = list(self._history)
+
+        missed = []
+        if last_event_id:
+            ids = [event["id"] for event in history]
+            if last_event_id in ids:
+                start = ids.index(last_event_id) + 1
+                missed = history[start:]
+        return subscription, missed
+
+    def subscription_count(self) -> int:
+        with self._lock:
+            return len(self._subscriptions)
+
+    def unsubscribe(self, subscription: QuestEventSubscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        """Register a callback run synchronously for every published event."""
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+
+quest_events = QuestEventBus()
+
+
+def emit_quest_event(event_type: str, quest: dict):
+    """
+    Publish a quest change made by this process
+
+    Skipped when a change stream watcher is running, since it will see the
+    same write (from every worker) and publish it itself.
+
+    Args:
+            event_type (str): One of QUEST_EVENT_TYPES
+            quest (dict): Serialized quest
+    """
+    if not quest_events.change_stream_active:
+        quest_events.publish(event_type, quest)
+
+
+def change_event_type(change: dict) -> str | None:
+    """Map a MongoDB change stream event to a quest event type."""
+    operation = change["operationType"]
+    if operation == "insert":
+        return "create"
+    if operation == "delete":
+        return "delete"
+    if operation == "replace":
+        return "update"
+    if operation == "update":
+        updated_fields = change.get("updateDescription", {}).get("updatedFields", {})
+        if updated_fields.get("status") == "closed":
+            return "close"
+        if any(field.startswith("applicants") for field in updated_fields):
+            return "apply"
+        return "update"
+    return None
+
+
+def quest_change_event(db, change: dict) -> tuple[str | None, dict]:
+    """
+    Quest event type and quest of a change stream event
+
+    Archiving deletes the quests it copied to quests_archive. Those deletes are
+    "archive" events carrying the archived quest, not "delete" events.
+
+    Returns:
+            tuple: (event type or None to skip the change, quest document)
+    """
+    event_type = change_event_type(change)
+    quest = change.get("fullDocument") or change["documentKey"]
+    if event_type == "delete":
+        archived_quest = db["quests_archive"].find_one(change["documentKey"])
+        if archived_quest:
+            return "archive", archived_quest
+    return event_type, quest
+
+
+def watch_quest_changes(db, bus: QuestEventBus, stop: threading.Event):
+    """
+    Feed the event bus from a change stream on the quests collection
+
+    Runs until stop is set. Meant to be run in a background thread.
+    """
+    resume_token = None
+    while not stop.is_set():
+        try:
+            with db["quests"].watch(
+                full_document="updateLookup",
+                resume_after=resume_token,
+                max_await_time_ms=1000,
+            ) as stream:
+                while not stop.is_set():
+                    change = stream.try_next()
+                    if change is None:
+                        continue
+                    resume_token = stream.resume_token
+                    event_type, quest = quest_change_event(db, change)
+                    if event_type is None:
+                        continue
+                    bus.publish(
+                        event_type,
+                        serialize_objectid(quest),
+                        event_id=resume_token["_data"],
+                    )
+        except PyMongoError:
+            logger.exception("Quest change stream failed, reconnecting")
+            stop.wait(1)
+
+
+def start_change_stream(db, bus: QuestEventBus = quest_events):
+    """
+    Start feeding the bus from a change stream, if the deployment supports it
+
+    Standalone servers (and mongomock in tests) do not support change streams,
+    in which case events keep coming from the CRUD functions.
+
+    Returns:
+            threading.Event | None: Set it to stop the watcher, None if change
+            streams are not available
+    """
+    try:
+        with db["quests"].watch(max_await_time_ms=1):
+            pass
+    except Exception as e:
+        logger.info("Change streams unavailable, using in-process events: %s", e)
+        return None
+
+    stop = threading.Event()
+    thread = threading.Thread(
+        target=watch_quest_changes,
+        args=(db, bus, stop),
+        name="quest-change-stream",
+        daemon=True,
+    )
+    bus.change_stream_active = True
+    thread.start()
+    return stop
+
+
+def quest_matches_filter(
+    quest: dict, topic_ids: set[str] | None = None, bbox: list[float] | None = None
+) -> bool:
+    """
+    Check whether a serialized quest passes a stream's topic and area filters
+
+    Args:
+            quest (dict): Serialized quest
+            topic_ids (set[str], optional): Quest must have at least one of these
+            bbox (list[float], optional): [min_lon, min_lat, max_lon, max_lat]
+
+    Returns:
+            bool: True if the quest matches. Quests without the filtered fields
+            (such as deletes seen through a change stream) always match.
+    """
+    if topic_ids is not None and "topics" in quest:
+        if not topic_ids.intersection(quest["topics"]):
+            return False
+    if bbox is not None and "longitude" in quest and "latitude" in quest:
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if not min_lon <= quest["longitude"] <= max_lon:
+            return False
+        if not min_lat <= quest["latitude"] <= max_lat:
+            return False
+    return True
@@ -0,0 +1,184 @@
+import time
+from contextvars import ContextVar
+
+# Collection methods that talk to the database
+DB_OPERATIONS = frozenset(
+    {
+        "find",
+        "find_one",
+        "find_one_and_update",
+        "find_one_and_delete",
+        "find_one_and_replace",
+        "insert_one",
+        "insert_many",
+        "update_one",
+        "update_many",
+        "replace_one",
+        "delete_one",
+        "delete_many",
+        "count_documents",
+        "estimated_document_count",
+        "distinct",
+        "aggregate",
+        "bulk_write",
+        "create_index",
+    }
+)
+
+
+class RequestStats:
+    """
+    Timings collected while handling one request
+    """
+
+    __slots__ = ("db_operations", "db_seconds", "auth_seconds", "serialize_seconds")
+
+    def __init__(self):
+        self.db_operations = 0
+        self.db_seconds = 0.0
+        self.auth_seconds = 0.0
+        self.serialize_seconds = 0.0
+
+    def server_timing(self, total_seconds: float) -> str:
+        """
+        Format the stats as a Server-Timing header value
+
+        Args:
+                total_seconds (float): Total time spent handling the request
+
+        Returns:
+                str: Header value, durations in milliseconds
+        """
+        measured = self.db_seconds + self.auth_seconds + self.serialize_seconds
+        app_seconds = max(total_seconds - measured, 0.0)
+        return ", ".join(
+            [
+                f"total;dur={total_seconds * 1000:.2f}",
+                f"auth;dur={self.auth_seconds * 1000:.2f}",
+                f'db;dur={self.db_seconds * 1000:.2f};desc="{self.db_operations} ops"',
+                f"serialize;dur={self.serialize_seconds * 1000:.2f}",
+                f"app;dur={app_seconds * 1000:.2f}",
+            ]
+        )
+
+
+request_stats: ContextVar[RequestStats | None] = ContextVar(
+    "request_stats", default=None
+)
+# Causally consistent session the current request's operations run in, if any
+db_session: ContextVar[object | None] = ContextVar("db_session", default=None)
+
+
+def record_db_operation(seconds: float, count: int = 1):
+    """Add a database operation to the current request's stats, if any."""
+    stats = request_stats.get()
+    if stats is not None:
+        stats.db_operations += count
+        stats.db_seconds += seconds
+
+
+def record_db_time(seconds: float):
+    """Add time spent fetching results of an operation already counted."""
+    record_db_operation(seconds, count=0)
+
+
+class InstrumentedCursor:
+    """
+    Cursor proxy that accounts the time spent fetching results
+    """
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, name):
+        attribute = getattr(self._cursor, name)
+        if not callable(attribute):
+            return attribute
+
+        def chained(*args, **kwargs):
+            result = attribute(*args, **kwargs)
+            # Keep the proxy for chained calls such as find().sort().limit()
+            return self if result is self._cursor else result
+
+        return chained
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        started = time.perf_counter()
+        try:
+            return next(self._cursor)
+        finally:
+            record_db_time(time.perf_counter() - started)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._cursor.close()
+
+
+class InstrumentedCollection:
+    """
+    Collection proxy that counts and times database operations
+
+    Operations run in the request's db_session when one was started.
+    """
+
+    def __init__(self, collection):
+        self._collection = collection
+
+    def __getattr__(self, name):
+        attribute = getattr(self._collection, name)
+        if name not in DB_OPERATIONS:
+            return attribute
+
+        def timed(*args, **kwargs):
+            session = db_session.get()
+            if session is not None and "session" not in kwargs:
+                kwargs["session"] = session
+            started = time.perf_counter()
+            try:
+                result = attribute(*args, **kwargs)
+            finally:
+                record_db_operation(time.perf_counter() - started)
+            if name in ("find", "aggregate"):
+                return InstrumentedCursor(result)
+            return result
+
+        return timed
+
+    def with_options(self, **kwargs):
+        return InstrumentedCollection(self._collection.with_options(**kwargs))
+
+    def __eq__(self, other):
+        if isinstance(other, InstrumentedCollection):
+            other = other._collection
+        return self._collection == other
+
+    def __hash__(self):
+        return hash(self._collection)
+
+
+class InstrumentedDatabase:
+    """
+    Database proxy whose collections account their operations in request_stats
+
+    Collections must be accessed as db["name"] to be instrumented.
+    """
+
+    def __init__(self, db):
+        self._db = db
+
+    def __getitem__(self, name):
+        return InstrumentedCollection(self._db[name])
+
+    def __getattr__(self, name):
+        # Only item access (db["quests"]) returns instrumented collections.
+        return getattr(self._db, name)
+
+    @property
+    def unwrapped(self):
+        """The wrapped database, for code that needs the driver object."""
+        return self._db
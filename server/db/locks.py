@@ -0,0 +1,55 @@
+import os
+import socket
+from datetime import datetime, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
+
+LOCK_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+def utcnow() -> datetime:
+    """Current UTC time as a naive datetime, the way pymongo returns dates."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def acquire_lock(db, name: str, ttl_seconds: float, owner: str = LOCK_OWNER) -> bool:
+    """
+    Acquire or renew a named lock document shared by all workers
+
+    The lock is granted when it does not exist, has expired, or is already held
+    by the same owner, in which case its expiry is extended.
+
+    Args:
+            name (str): Lock name
+            ttl_seconds (float): Seconds until the lock expires unless renewed
+            owner (str, optional): Lock owner. Defaults to this host and process.
+
+    Returns:
+            bool: True if the lock is held by owner
+    """
+    now = utcnow()
+    try:
+        db["locks"].find_one_and_update(
+            {"_id": name, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {
+                "$set": {
+                    "owner": owner,
+                    "expires_at": now + timedelta(seconds=ttl_seconds),
+                }
+            },
+            upsert=True,
+        )
+        return True
+    except DuplicateKeyError:
+        # The lock exists and is held by someone else, so the upsert collided.
+        return False
+
+
+def release_lock(db, name: str, owner: str = LOCK_OWNER):
+    """
+    Release a lock if it is held by owner
+
+    Args:
+            name (str): Lock name
+            owner (str, optional): Lock owner. Defaults to this host and process.
+    """
+    db["locks"].delete_one({"_id": name, "owner": owner})
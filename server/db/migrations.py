@@ -0,0 +1,353 @@
+"""
+Versioned schema migrations.
+
+The database stores its schema version in the schema_migrations collection.
+Startup reads it once and only migrates when it is behind MIGRATIONS. Pending
+migrations run in order under a lock, so a single process applies them.
+
+Usage (from the server directory):
+
+    python -m db.migrations
+    python -m db.migrations --status
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from typing import Callable
+from db import database
+from db.locks import acquire_lock, release_lock, utcnow
+
+logger = logging.getLogger(__name__)
+
+SCHEMA_COLLECTION = "schema_migrations"
+SCHEMA_DOCUMENT_ID = "schema"
+MIGRATION_LOCK = "schema_migrations"
+# Renewed before every migration, so it only has to outlive the slowest one
+MIGRATION_LOCK_TTL_SECONDS = float(os.getenv("MIGRATION_LOCK_TTL_SECONDS", 60 * 30))
+MIGRATION_WAIT_SECONDS = float(os.getenv("MIGRATION_WAIT_SECONDS", 60))
+
+
+EMAIL_PATTERN = r"^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$"
+
+# Collections as migration 1 creates them: name -> (validator, indexes as
+# (keys, options)). Later schema changes are migrations of their own, so these
+# definitions never change, whatever database.create_tables becomes.
+INITIAL_COLLECTIONS: dict[str, tuple[dict | None, list[tuple]]] = {
+    "users": (
+        {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["username", "password", "email"],
+                "properties": {
+                    "username": {"bsonType": "string", "minLength": 5},
+                    "password": {"bsonType": "string", "minLength": 8},
+                    "email": {"bsonType": "string", "pattern": EMAIL_PATTERN},
+                },
+            }
+        },
+        [("username", {"unique": True}), ("email", {"unique": True})],
+    ),
+    "cookies": (
+        {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["username", "cookie", "created_at", "expiration_at"],
+                "properties": {
+                    "username": {"bsonType": "string"},
+                    "cookie": {"bsonType": "string"},
+                    "created_at": {"bsonType": "date"},
+                    "expiration_at": {"bsonType": "date"},
+                },
+            }
+        },
+        [
+            ("created_at", {}),
+            ("expiration_at", {"expireAfterSeconds": 60 * 60 * 24 * 7}),
+        ],
+    ),
+    "topics": (
+        {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": ["name"],
+                "properties": {"name": {"bsonType": "string", "minLength": 2}},
+            }
+        },
+        [("name", {"unique": True})],
+    ),
+    "quests": (
+        {
+            "$jsonSchema": {
+                "bsonType": "object",
+                "required": [
+                    "title",
+                    "description",
+                    "topics",
+                    "created_by",
+                    "longitude",
+                    "price",
+                    "latitude",
+                    "deadline",
+                    "applicants",
+                    "status",
+                    "version",
+                ],
+                "properties": {
+                    "title": {"bsonType": "string", "minLength": 5},
+                    "description": {"bsonType": "string", "minLength": 10},
+                    "topics": {
+                        "bsonType": "array",
+                        "items": {"bsonType": "objectId"},
+                    },
+                    "price": {"bsonType": "double", "minimum": 0},
+                    "created_by": {"bsonType": "objectId"},
+                    "longitude": {"bsonType": "double"},
+                    "latitude": {"bsonType": "double"},
+                    "deadline": {"bsonType": "date"},
+                    "applicants": {
+                        "bsonType": "array",
+                        "items": {"bsonType": "objectId"},
+                    },
+                    "status": {"enum": ["open", "processing", "closed"]},
+                    "version": {"bsonType": ["int", "long"], "minimum": 0},
+                },
+            }
+        },
+        [
+            ("title", {}),
+            ("created_by", {}),
+            ("status", {}),
+            ([("status", 1), ("deadline", 1)], {}),
+            ("topics", {}),
+            ([("longitude", 1), ("latitude", 1)], {}),
+        ],
+    ),
+    "quests_archive": (None, [("created_by", {}), ("applicants", {})]),
+    "idempotency_keys": (
+        None,
+        [
+            (
+                "created_at",
+                {"expireAfterSeconds": database.IDEMPOTENCY_KEY_TTL_SECONDS},
+            )
+        ],
+    ),
+}
+INITIAL_TOPICS = [
+    "Technology",
+    "Gardening",
+    "Finance",
+    "Baby Sitting",
+    "Pet Sitting",
+    "House Sitting",
+    "Cooking",
+    "Tutoring",
+    "Cleaning",
+    "Other",
+]
+
+
+def create_collections(db):
+    existing_collections = set(db.list_collection_names())
+    for name, (validator, indexes) in INITIAL_COLLECTIONS.items():
+        if name in existing_collections:
+            continue
+        if validator:
+            db.create_collection(name, validator=validator)
+        else:
+            db.create_collection(name)
+        for keys, options in indexes:
+            db[name].create_index(keys, **options)
+        if name == "topics":
+            db[name].insert_many([{"name": topic} for topic in INITIAL_TOPICS])
+
+
+def index_cookie_lookups(db):
+    # authenticate_user looks the session up by cookie on every request
+    db["cookies"].create_index("cookie")
+
+
+def index_quest_applicants(db):
+    # Profiles find the quests a user applied to
+    db["quests"].create_index("applicants")
+
+
+def require_quest_version(db):
+    # Quests created before optimistic locking have no version. Their ETag is
+    # "0", backfilling 0 keeps the ETags clients hold valid for If-Match.
+    for collection_name in ("quests", "quests_archive"):
+        db[collection_name].update_many(
+            {"version": {"$exists": False}}, {"$set": {"version": 0}}
+        )
+    db.command("collMod", "quests", validator=database.QUEST_VALIDATOR)
+
+
+def index_quest_expiry(db):
+    # close_expired_quests_db scans open quests by deadline. Databases created
+    # before the expiry job only got the index through create_tables.
+    db["quests"].create_index([("status", 1), ("deadline", 1)])
+
+
+# (version, name, function, background), in the order they are applied.
+# Background migrations, such as index builds on large collections, run after
+# startup so they do not delay readiness; every later migration runs with them.
+MIGRATIONS: list[tuple[int, str, Callable, bool]] = [
+    (1, "create_collections", create_collections, False),
+    (2, "index_cookie_lookups", index_cookie_lookups, True),
+    (3, "index_quest_applicants", index_quest_applicants, True),
+    (4, "require_quest_version", require_quest_version, True),
+    (5, "index_quest_expiry", index_quest_expiry, True),
+]
+
+
+def get_schema_version(db) -> int:
+    """Version of the last applied migration, 0 for a new database."""
+    schema = db[SCHEMA_COLLECTION].find_one({"_id": SCHEMA_DOCUMENT_ID})
+    return schema["version"] if schema else 0
+
+
+def record_migration(db, version: int, name: str, duration: float):
+    db[SCHEMA_COLLECTION].update_one(
+        {"_id": SCHEMA_DOCUMENT_ID},
+        {
+            "$max": {"version": version},
+            "$push": {
+                "applied": {
+                    "version": version,
+                    "name": name,
+                    "applied_at": utcnow(),
+                    "duration_seconds": round(duration, 3),
+                }
+            },
+        },
+        upsert=True,
+    )
+
+
+def apply_migrations(
+    db, migrations: list = MIGRATIONS, include_background: bool = True
+) -> list[int] | None:
+    """
+    Apply the pending migrations in order, if no other process is migrating
+
+    Args:
+            db (MongoDB connection): Database
+            migrations (list): Migrations to apply, MIGRATIONS by default
+            include_background (bool): Also apply the background migrations,
+                    otherwise stop at the first one
+
+    Returns:
+            list[int] | None: Applied versions, None if another process holds
+            the migration lock
+    """
+    if not acquire_lock(db, MIGRATION_LOCK, MIGRATION_LOCK_TTL_SECONDS):
+        return None
+    applied = []
+    try:
+        # Read under the lock, another process may have migrated meanwhile
+        current_version = get_schema_version(db)
+        for version, name, migrate, background in migrations:
+            if version <= current_version:
+                continue
+            if background and not include_background:
+                break
+            acquire_lock(db, MIGRATION_LOCK, MIGRATION_LOCK_TTL_SECONDS)
+            logger.info("Applying migration %d %s", version, name)
+            started = time.perf_counter()
+            migrate(db)
+            duration = time.perf_counter() - started
+            record_migration(db, version, name, duration)
+            logger.info("Applied migration %d %s in %.1fs", version, name, duration)
+            applied.append(version)
+    finally:
+        release_lock(db, MIGRATION_LOCK)
+    return applied
+
+
+def wait_for_version(db, version: int, timeout: float) -> bool:
+    """Wait until another process migrated the database up to version."""
+    deadline = time.monotonic() + timeout
+    while get_schema_version(db) < version:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.5)
+    return True
+
+
+async def run_background_migrations(db, migrations: list):
+    try:
+        await asyncio.to_thread(apply_migrations, db, migrations)
+    except Exception:
+        logger.exception("Background migration failed")
+
+
+def start_migrations(db, migrations: list = MIGRATIONS) -> asyncio.Task | None:
+    """
+    Bring the schema up to date at startup
+
+    Up to date is the common case and costs one read. Otherwise the pending
+    migrations before the first background one are applied (or awaited while
+    another process applies them), and the rest are started as a task.
+
+    Args:
+            db (MongoDB connection): Database
+            migrations (list): Migrations to apply, MIGRATIONS by default
+
+    Returns:
+            asyncio.Task | None: Task applying the background migrations, None
+            when there are none pending
+    """
+    current_version = get_schema_version(db)
+    pending = [migration for migration in migrations if migration[0] > current_version]
+    if not pending:
+        return None
+
+    blocking = list(itertools.takewhile(lambda migration: not migration[3], pending))
+    if blocking and apply_migrations(db, migrations, include_background=False) is None:
+        target = blocking[-1][0]
+        if not wait_for_version(db, target, MIGRATION_WAIT_SECONDS):
+            logger.warning("Timed out waiting for migration %d", target)
+
+    if len(blocking) == len(pending):
+        return None
+    return asyncio.create_task(run_background_migrations(db, migrations))
+
+
+def schema_status(db, migrations: list = MIGRATIONS) -> dict:
+    """Current and latest schema version, with the pending migration names."""
+    current_version = get_schema_version(db)
+    return {
+        "version": current_version,
+        "latest": max(version for version, *_ in migrations),
+        "pending": [
+            name for version, name, *_ in migrations if version > current_version
+        ],
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument(
+        "--status", action="store_true", help="Print the schema version only"
+    )
+    args = parser.parse_args(argv)
+
+    db = database.get_db_connection()
+    if not args.status:
+        applied = apply_migrations(db)
+        if applied is None:
+            print("Another process is applying the migrations")
+            return 1
+        print(f"Applied migrations {applied}")
+    print(json.dumps(schema_status(db), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,251 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pymongo import monitoring
+from metrics import (
+    mongodb_command_duration_seconds,
+    mongodb_pool_checked_out,
+    mongodb_pool_connections,
+    mongodb_pool_events_total,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """
+    Connection pool listener exporting pool usage as metrics
+    """
+
+    def _count(self, event_name: str):
+        mongodb_pool_events_total.labels(event=event_name).inc()
+
+    def pool_created(self, event):
+        self._count("pool_created")
+
+    def pool_ready(self, event):
+        self._count("pool_ready")
+
+    def pool_cleared(self, event):
+        self._count("pool_cleared")
+
+    def pool_closed(self, event):
+        self._count("pool_closed")
+
+    def connection_created(self, event):
+        self._count("connection_created")
+        mongodb_pool_connections.inc()
+
+    def connection_ready(self, event):
+        self._count("connection_ready")
+
+    def connection_closed(self, event):
+        self._count("connection_closed")
+        mongodb_pool_connections.dec()
+
+    def connection_check_out_started(self, event):
+        pass
+
+    def connection_check_out_failed(self, event):
+        self._count("check_out_failed")
+
+    def connection_checked_out(self, event):
+        self._count("checked_out")
+        mongodb_pool_checked_out.inc()
+
+    def connection_checked_in(self, event):
+        mongodb_pool_checked_out.dec()
+
+
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 100))
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+QUERY_SHAPES_MAX = int(os.getenv("QUERY_SHAPES_MAX", 500))
+
+# Commands that are driver housekeeping rather than application queries
+IGNORED_COMMANDS = frozenset(
+    {
+        "hello",
+        "ismaster",
+        "isMaster",
+        "ping",
+        "saslStart",
+        "saslContinue",
+        "buildInfo",
+        "endSessions",
+        "explain",
+    }
+)
+
+# Where each command keeps the filter that determines its shape
+FILTER_FIELDS = {
+    "find": lambda command: command.get("filter", {}),
+    "count": lambda command: command.get("query", {}),
+    "distinct": lambda command: command.get("query", {}),
+    "findAndModify": lambda command: command.get("query", {}),
+    "update": lambda command: (command.get("updates") or [{}])[0].get("q", {}),
+    "delete": lambda command: (command.get("deletes") or [{}])[0].get("q", {}),
+    "aggregate": lambda command: command.get("pipeline", []),
+}
+
+
+def query_shape(value):
+    """
+    Replace the values of a query with placeholders, keeping its structure
+
+    Two queries that only differ by their values have the same shape, e.g.
+    {"cookie": "abc"} and {"cookie": "def"} are both {"cookie": "?"}.
+    """
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in sorted(value.items())}
+    if isinstance(value, list) and value and all(isinstance(i, dict) for i in value):
+        return [query_shape(item) for item in value]
+    return "?"
+
+
+def explainable_command(command: dict) -> dict:
+    """Strip driver-added fields from a command so it can be explained."""
+    return {
+        key: value
+        for key, value in command.items()
+        if not key.startswith("$") and key not in ("lsid", "txnNumber")
+    }
+
+
+class QueryMonitor(monitoring.CommandListener):
+    """
+    Command listener recording latency per query shape
+
+    Logs commands slower than SLOW_QUERY_MS and, with SLOW_QUERY_EXPLAIN,
+    captures the query plan of the first slow command of every shape.
+    """
+
+    def __init__(
+        self,
+        slow_query_ms: float = SLOW_QUERY_MS,
+        explain: bool = SLOW_QUERY_EXPLAIN,
+        max_shapes: int = QUERY_SHAPES_MAX,
+    ):
+        self.slow_query_ms = slow_query_ms
+        self.explain = explain
+        self.max_shapes = max_shapes
+        self.client = None
+        self._lock = threading.Lock()
+        self._pending: dict[tuple, tuple] = {}
+        self._shapes: dict[str, dict] = {}
+        self._explain_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="explain"
+        )
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        command = event.command
+        collection = command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = command.get("collection", "")
+        get_filter = FILTER_FIELDS.get(event.command_name)
+        shape = query_shape(get_filter(command)) if get_filter else None
+        key = (
+            f"{event.database_name}.{collection} {event.command_name} "
+            f"{json.dumps(shape, sort_keys=True)}"
+        )
+        with self._lock:
+            self._pending[(event.connection_id, event.request_id)] = (
+                key,
+                event.command_name,
+                collection,
+                command if get_filter else None,
+                event.database_name,
+            )
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool):
+        with self._lock:
+            pending = self._pending.pop((event.connection_id, event.request_id), None)
+        if pending is None:
+            return
+        key, command_name, collection, command, database_name = pending
+        duration_ms = event.duration_micros / 1000
+        mongodb_command_duration_seconds.labels(
+            command=command_name, collection=collection
+        ).observe(duration_ms / 1000)
+
+        slow = duration_ms >= self.slow_query_ms
+        if slow:
+            logger.warning("Slow MongoDB command (%.1f ms): %s", duration_ms, key)
+
+        can_explain = self.explain and command is not None and self.client is not None
+        with self._lock:
+            stats = self._shapes.get(key)
+            if stats is None:
+                if len(self._shapes) >= self.max_shapes:
+                    return
+                stats = self._shapes[key] = {
+                    "shape": key,
+                    "count": 0,
+                    "failures": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "slow_count": 0,
+                    "explain": None,
+                }
+            stats["count"] += 1
+            stats["failures"] += int(failed)
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+            stats["slow_count"] += int(slow)
+            capture_explain = slow and can_explain and stats["explain"] is None
+            if capture_explain:
+                stats["explain"] = "pending"
+
+        if capture_explain:
+            # Never issue commands from the listener callback itself.
+            self._explain_executor.submit(
+                self._capture_explain, key, database_name, command
+            )
+
+    def _capture_explain(self, key: str, database_name: str, command: dict):
+        try:
+            explain = self.client[database_name].command(
+                {"explain": explainable_command(command), "verbosity": "queryPlanner"}
+            )
+            result = {
+                "winning_plan": explain.get("queryPlanner", {}).get("winningPlan"),
+            }
+        except Exception as e:
+            result = {"error": str(e)}
+        with self._lock:
+            if key in self._shapes:
+                self._shapes[key]["explain"] = result
+
+    def top_shapes(self, limit: int = 20) -> list[dict]:
+        """
+        Get the query shapes with the highest total time
+
+        Args:
+                limit (int): Number of shapes to return
+
+        Returns:
+                list[dict]: Shape stats, including the average time and any
+                captured query plan
+        """
+        with self._lock:
+            shapes = [dict(stats) for stats in self._shapes.values()]
+        for stats in shapes:
+            stats["avg_ms"] = stats["total_ms"] / stats["count"]
+        shapes.sort(key=lambda stats: stats["total_ms"], reverse=True)
+        return shapes[:limit]
+
+    def reset(self):
+        with self._lock:
+            self._shapes.clear()
+
+
+query_monitor = QueryMonitor()
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, List
+from db.read_routing import reads_own_writes
+from db.single_flight import SingleFlight
+from metrics import record_cache_lookup
+
+# Bounds how stale other workers' entries get without a change stream
+QUEST_CACHE_TTL_SECONDS = float(os.getenv("QUEST_CACHE_TTL_SECONDS", 5))
+QUEST_CACHE_MAX_ENTRIES = int(os.getenv("QUEST_CACHE_MAX_ENTRIES", 1024))
+# Memory bound: quests held by all entries together, a list counts all of its
+QUEST_CACHE_MAX_QUESTS = int(os.getenv("QUEST_CACHE_MAX_QUESTS", 50_000))
+
+LIST = "list"
+DETAIL = "detail"
+
+
+def filter_key(topics: List[str] = None, prices: List[float] = None) -> tuple:
+    """
+    Normalised filter parameters
+
+    The order and repetition of topics do not change the result, the order of
+    the price bounds does.
+    """
+    return (
+        tuple(sorted(set(topics or ()))),
+        tuple(float(price) for price in prices or ()),
+    )
+
+
+class QuestCache:
+    """
+    Results of the quest read functions, shared by the requests of the process
+
+    Entries expire after ttl_seconds, and the least recently used ones are
+    evicted past max_entries or max_quests. Writes invalidate precisely: the
+    quest's own entry is dropped, and every list entry (all quests, filters)
+    becomes unreachable because list keys hold the list generation, which the
+    write bumps. Cached results are shared, callers must not modify them.
+
+    Misses run the read in a thread, and concurrent misses of the same key
+    share a single read.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int, max_quests: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_quests = max_quests
+        self._lock = threading.Lock()
+        # key -> (expires at, result, number of quests), list results hold
+        # (quests, ETag)
+        self._entries: OrderedDict[tuple, tuple[float, object, int]] = OrderedDict()
+        self._quests = 0
+        self._list_generation = 0
+        # Bumped by every invalidation, results loaded meanwhile are not stored
+        self._epoch = 0
+        self._flights = SingleFlight("quest_reads")
+
+    async def get_list(
+        self,
+        name: str,
+        params: tuple,
+        load: Callable[[], list],
+        etag: Callable[[list], str],
+    ) -> tuple[list, str]:
+        """
+        Cached quest list and its ETag, loaded on a miss
+
+        The ETag is computed once per load and cached with the list, so polls
+        answered from the cache do not hash the list again.
+
+        Args:
+                name (str): Read function, such as "all" or "filter"
+                params (tuple): Normalised parameters of the read
+                load (Callable): Runs the read
+                etag (Callable): Builds the ETag of the loaded list
+
+        Returns:
+                tuple: (serialized quests, ETag)
+        """
+        with self._lock:
+            key = (LIST, self._list_generation, name, params)
+
+        def load_with_etag():
+            quests = load()
+            return quests, etag(quests)
+
+        return await self._get_or_load(key, load_with_etag)
+
+    async def get_quest(
+        self, quest_id: str, load: Callable[[], dict | None]
+    ) -> dict | None:
+        """Cached quest, loaded on a miss. Unknown quests are not cached."""
+        return await self._get_or_load((DETAIL, quest_id.lower()), load)
+
+    async def _get_or_load(self, key: tuple, load: Callable):
+        # Users who just wrote must see their write, cached results and reads
+        # of other requests may predate it
+        if reads_own_writes():
+            return await asyncio.to_thread(load)
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] <= now:
+                self._drop(key)
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+            epoch = self._epoch
+        record_cache_lookup(f"quest_{key[0]}", hit=entry is not None)
+        if entry is not None:
+            return entry[1]
+
+        # Only reads started since the last invalidation are shared
+        result = await self._flights.run((key, epoch), load)
+        if result is not None:
+            self._store(key, result, epoch)
+        return result
+
+    def _store(self, key: tuple, result, epoch: int):
+        size = len(result[0]) if key[0] == LIST else 1
+        if self.max_entries <= 0 or size > self.max_quests:
+            return
+        expires_at = time.monotonic() + self.ttl_seconds
+        with self._lock:
+            if epoch != self._epoch:
+                return
+            self._drop(key)
+            self._entries[key] = (expires_at, result, size)
+            self._quests += size
+            while len(self._entries) > self.max_entries:
+                self._evict_oldest()
+            while self._quests > self.max_quests:
+                self._evict_oldest()
+
+    def _evict_oldest(self):
+        _, (_, _, size) = self._entries.popitem(last=False)
+        self._quests -= size
+
+    def _drop(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._quests -= entry[2]
+
+    def invalidate_quest(self, quest_id):
+        """Drop a written quest and every list, which may include it."""
+        with self._lock:
+            self._drop((DETAIL, str(quest_id).lower()))
+            self._list_generation += 1
+            self._epoch += 1
+
+    def invalidate_lists(self):
+        """Drop every list, for writes moving quests without changing them."""
+        with self._lock:
+            self._list_generation += 1
+            self._epoch += 1
+
+    def on_quest_event(self, event: dict):
+        """Quest event listener, invalidating the writes of other workers."""
+        if event["type"] == "archive":
+            self.invalidate_lists()
+        else:
+            self.invalidate_quest(event["quest"]["_id"])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._quests = 0
+            self._list_generation += 1
+            self._epoch += 1
+
+
+quest_cache = QuestCache(
+    QUEST_CACHE_TTL_SECONDS, QUEST_CACHE_MAX_ENTRIES, QUEST_CACHE_MAX_QUESTS
+)
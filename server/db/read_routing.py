@@ -0,0 +1,118 @@
+import logging
+import os
+from contextvars import ContextVar
+from bson.timestamp import Timestamp
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+from db.instrumentation import db_session
+
+logger = logging.getLogger(__name__)
+
+# Read preference of the reads that tolerate slightly stale data: quest lists,
+# filters and profiles
+SECONDARY_READ_PREFERENCE = os.getenv("SECONDARY_READ_PREFERENCE", "secondaryPreferred")
+# Secondaries lagging further behind the primary are not read from, at least 90
+READ_MAX_STALENESS_SECONDS = int(os.getenv("READ_MAX_STALENESS_SECONDS", 90))
+# How long a user's reads go to the primary after one of their writes
+READ_YOUR_WRITES_SECONDS = int(
+    os.getenv("READ_YOUR_WRITES_SECONDS", READ_MAX_STALENESS_SECONDS)
+)
+READ_AFTER_COOKIE = "read_after"
+
+READ_PREFERENCES = {
+    "primary": lambda max_staleness: Primary(),
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Operation time of the user's last write, while their reads must see it
+read_after: ContextVar[Timestamp | None] = ContextVar("read_after", default=None)
+
+
+def stale_read_preference():
+    return READ_PREFERENCES[SECONDARY_READ_PREFERENCE](
+        max_staleness=READ_MAX_STALENESS_SECONDS
+    )
+
+
+def reads_own_writes() -> bool:
+    """Whether the request must see the user's recent writes."""
+    return read_after.get() is not None or db_session.get() is not None
+
+
+def staleness_tolerant(collection):
+    """
+    Collection reading from secondaries, unless the user just wrote
+
+    For reads that may be up to READ_MAX_STALENESS_SECONDS behind the primary.
+    Writes and the requests following the user's own write keep reading from
+    the primary.
+
+    Args:
+            collection (Collection): Collection, instrumented or not
+
+    Returns:
+            Collection: Same collection with the stale read preference
+    """
+    if SECONDARY_READ_PREFERENCE == "primary":
+        return collection
+    if reads_own_writes():
+        return collection
+    return collection.with_options(read_preference=stale_read_preference())
+
+
+def parse_read_after(value: str | None) -> Timestamp | None:
+    """Operation time stored in the read_after cookie, as "seconds.increment"."""
+    try:
+        seconds, increment = (value or "").split(".")
+        return Timestamp(int(seconds), int(increment))
+    except (TypeError, ValueError):
+        return None
+
+
+def format_read_after(operation_time: Timestamp) -> str:
+    return f"{operation_time.time}.{operation_time.inc}"
+
+
+def start_causal_session(client, operation_time: Timestamp | None = None):
+    """
+    Start a causally consistent session and make it the request's session
+
+    Args:
+            client (MongoClient): Client owning the session
+            operation_time (Timestamp, optional): Operation time the session's
+                    reads must follow, from an earlier request
+
+    Returns:
+            ClientSession | None: Session to end with end_causal_session, None
+            when the client has no sessions (mongomock)
+    """
+    try:
+        session = client.start_session(causal_consistency=True)
+    except NotImplementedError:
+        return None
+    if operation_time is not None:
+        session.advance_operation_time(operation_time)
+    db_session.set(session)
+    return session
+
+
+def end_causal_session(session) -> Timestamp | None:
+    """
+    End the request's session
+
+    Returns:
+            Timestamp | None: Operation time of the session's last operation,
+            None without a replica set
+    """
+    db_session.set(None)
+    operation_time = session.operation_time
+    session.end_session()
+    return operation_time
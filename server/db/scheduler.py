@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Callable
+from db.crud import crud_quests
+from db.locks import acquire_lock, utcnow
+from metrics import (
+    scheduler_job_duration_seconds,
+    scheduler_job_result,
+    scheduler_job_runs_total,
+)
+
+logger = logging.getLogger(__name__)
+
+QUEST_EXPIRY_INTERVAL_SECONDS = float(os.getenv("QUEST_EXPIRY_INTERVAL_SECONDS", 60))
+QUEST_EXPIRY_BATCH_SIZE = int(os.getenv("QUEST_EXPIRY_BATCH_SIZE", 1000))
+QUEST_ARCHIVE_INTERVAL_SECONDS = float(
+    os.getenv("QUEST_ARCHIVE_INTERVAL_SECONDS", 60 * 60)
+)
+QUEST_ARCHIVE_AFTER_DAYS = float(os.getenv("QUEST_ARCHIVE_AFTER_DAYS", 30))
+QUEST_ARCHIVE_BATCH_SIZE = int(os.getenv("QUEST_ARCHIVE_BATCH_SIZE", 1000))
+
+# Latest statistics of every periodic job, keyed by job name
+job_stats: dict[str, dict] = {}
+
+
+def close_expired_quests(db) -> dict:
+    """Close one batch of quests whose deadline has passed."""
+    return crud_quests.close_expired_quests_db(
+        db, now=utcnow(), batch_size=QUEST_EXPIRY_BATCH_SIZE
+    )
+
+
+def archive_closed_quests(db) -> dict:
+    """
+    Archive one batch of quests closed for longer than QUEST_ARCHIVE_AFTER_DAYS
+
+    The result includes the size of the hot and archived quest sets after the
+    batch was moved.
+    """
+    result = crud_quests.archive_closed_quests_db(
+        db,
+        closed_before=utcnow() - timedelta(days=QUEST_ARCHIVE_AFTER_DAYS),
+        batch_size=QUEST_ARCHIVE_BATCH_SIZE,
+    )
+    result.update(crud_quests.get_quest_storage_stats_db(db))
+    return result
+
+
+def run_job_once(db, name: str, job: Callable[[object], dict], lock_ttl: float):
+    """
+    Run a job if this worker holds (or can take) the job's leader lock
+
+    Args:
+            name (str): Job name, also used as the lock name
+            job (Callable): Function taking the database and returning stats
+            lock_ttl (float): Seconds the leader keeps the lock without renewing
+
+    Returns:
+            dict | None: Job stats, None if another worker is the leader
+    """
+    if not acquire_lock(db, f"job:{name}", lock_ttl):
+        return None
+
+    started = time.perf_counter()
+    result = job(db)
+    duration = time.perf_counter() - started
+    stats = job_stats.setdefault(name, {"runs": 0})
+    stats["runs"] += 1
+    stats["last_run_at"] = utcnow().isoformat()
+    stats["last_duration_seconds"] = duration
+    stats["last_result"] = result
+
+    scheduler_job_runs_total.labels(job=name).inc()
+    scheduler_job_duration_seconds.labels(job=name).observe(duration)
+    for field, value in result.items():
+        scheduler_job_result.labels(job=name, field=field).set(value)
+    logger.info("Job %s finished: %s", name, result)
+    return result
+
+
+async def run_periodically(db, name: str, interval: float, job: Callable):
+    """
+    Run a job every interval seconds on the elected leader until cancelled
+
+    The lock outlives a few intervals so the leader keeps renewing it, while
+    another worker takes over shortly after the leader stops.
+    """
+    while True:
+        try:
+            await asyncio.to_thread(run_job_once, db, name, job, interval * 3)
+        except Exception:
+            logger.exception("Job %s failed", name)
+        await asyncio.sleep(interval)
+
+
+def start_scheduler(db) -> list[asyncio.Task]:
+    """
+    Start the background jobs
+
+    Returns:
+            list[asyncio.Task]: Tasks to cancel on shutdown
+    """
+    jobs = [
+        ("close_expired_quests", QUEST_EXPIRY_INTERVAL_SECONDS, close_expired_quests),
+        (
+            "archive_closed_quests",
+            QUEST_ARCHIVE_INTERVAL_SECONDS,
+            archive_closed_quests,
+        ),
+    ]
+    return [
+        asyncio.create_task(run_periodically(db, name, interval, job))
+        for name, interval, job in jobs
+        if interval > 0
+    ]
@@ -0,0 +1,336 @@
+"""
+Seed a MongoDB database with a large generated dataset.
+
+Users, quests, applications and sessions are written straight to the
+collections with unordered insert_many batches, bypassing the API. The same
+seed and reference date always generate the same documents.
+
+Usage (from the server directory):
+
+    python -m db.seed --users 100000 --quests 1000000 --seed 42
+    python -m db.seed --uri mongodb://localhost:27017 --drop --bypass-validation
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, Iterator
+import bcrypt
+from bson import ObjectId
+from pymongo import MongoClient
+from db.database import create_tables, get_client
+
+DEFAULT_BATCH_SIZE = 10_000
+SEEDED_COLLECTIONS = ["users", "cookies", "topics", "quests", "quests_archive"]
+# Users share a small pool of passwords so hashing stays cheap:
+# user0000042 logs in with password0000002 when the pool holds 8 passwords
+PASSWORD_POOL_SIZE = 8
+
+# Quests cluster around the larger towns of West Flanders, the rest are spread
+# uniformly over the province
+LATITUDE_RANGE = (50.7, 51.4)
+LONGITUDE_RANGE = (2.5, 3.5)
+TOWNS = [
+    # (latitude, longitude, weight)
+    (51.2093, 3.2247, 0.30),  # Bruges
+    (50.8279, 3.2649, 0.25),  # Kortrijk
+    (51.2154, 2.9286, 0.20),  # Ostend
+    (50.9469, 3.1236, 0.15),  # Roeselare
+    (50.8503, 2.8851, 0.10),  # Ypres
+]
+TOWN_SHARE = 0.8
+TOWN_SPREAD_DEGREES = 0.04
+
+
+def seeded_object_id(rng: random.Random, created_at: datetime) -> ObjectId:
+    """ObjectId with the given creation time and seeded random bytes."""
+    return ObjectId(int(created_at.timestamp()).to_bytes(4, "big") + rng.randbytes(8))
+
+
+def password_for(index: int) -> str:
+    return f"password{index % PASSWORD_POOL_SIZE:07d}"
+
+
+def hash_password_pool() -> list[str]:
+    """Hash every password of the pool once, instead of once per user."""
+    return [
+        bcrypt.hashpw(password_for(index).encode(), bcrypt.gensalt()).decode()
+        for index in range(PASSWORD_POOL_SIZE)
+    ]
+
+
+def random_location(rng: random.Random) -> tuple[float, float]:
+    """Latitude and longitude in West Flanders, clustered around its towns."""
+    if rng.random() < TOWN_SHARE:
+        latitude, longitude, _ = rng.choices(TOWNS, weights=[t[2] for t in TOWNS])[0]
+        latitude = rng.gauss(latitude, TOWN_SPREAD_DEGREES)
+        longitude = rng.gauss(longitude, TOWN_SPREAD_DEGREES)
+    else:
+        latitude = rng.uniform(*LATITUDE_RANGE)
+        longitude = rng.uniform(*LONGITUDE_RANGE)
+    latitude = min(max(latitude, LATITUDE_RANGE[0]), LATITUDE_RANGE[1])
+    longitude = min(max(longitude, LONGITUDE_RANGE[0]), LONGITUDE_RANGE[1])
+    return round(latitude, 6), round(longitude, 6)
+
+
+def generate_users(
+    user_ids: list[ObjectId], password_hashes: list[str]
+) -> Iterator[dict]:
+    for index, user_id in enumerate(user_ids):
+        yield {
+            "_id": user_id,
+            "username": f"user{index:07d}",
+            "password": password_hashes[index % len(password_hashes)],
+            "email": f"user{index:07d}@example.com",
+            "created_quests": [],
+            "applied_quests": [],
+        }
+
+
+def generate_quests(
+    rng: random.Random,
+    quest_ids: list[ObjectId],
+    user_ids: list[ObjectId],
+    topic_ids: list[ObjectId],
+    reference: datetime,
+) -> Iterator[dict]:
+    """
+    Generate quests with 1-3 topics and 0-3 applicants
+
+    A fifth of the quests are closed, their deadline having passed; the others
+    are open with a deadline in the coming month.
+    """
+    for index, quest_id in enumerate(quest_ids):
+        latitude, longitude = random_location(rng)
+        creator_id = rng.choice(user_ids)
+        applicants = [
+            applicant_id
+            for applicant_id in rng.sample(
+                user_ids, k=min(rng.randint(0, 3), len(user_ids))
+            )
+            if applicant_id != creator_id
+        ]
+        quest = {
+            "_id": quest_id,
+            "title": f"Seeded quest {index}",
+            "description": "Quest generated by the database seeder.",
+            "topics": rng.sample(topic_ids, k=rng.randint(1, min(3, len(topic_ids)))),
+            "created_by": creator_id,
+            "longitude": longitude,
+            "latitude": latitude,
+            "price": float(round(rng.uniform(5, 150), 2)),
+            "applicants": applicants,
+            "version": 1,
+        }
+        if rng.random() < 0.2:
+            deadline = reference - timedelta(days=rng.randint(1, 60))
+            quest.update(status="closed", deadline=deadline, closed_at=deadline)
+        else:
+            quest.update(
+                status="open",
+                deadline=reference + timedelta(minutes=rng.randint(60, 30 * 24 * 60)),
+            )
+        yield quest
+
+
+def generate_sessions(usernames: list[str], reference: datetime) -> list[dict]:
+    """Generate valid session cookies, as POST /auth would store them."""
+    from endpoints.auth import generate_encrypted_cookie
+
+    return [
+        {
+            "username": username,
+            "cookie": generate_encrypted_cookie(username),
+            "created_at": reference,
+            "expiration_at": reference + timedelta(days=7),
+        }
+        for username in usernames
+    ]
+
+
+def insert_in_batches(
+    collection,
+    documents: Iterable[dict],
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    bypass_validation: bool = False,
+) -> int:
+    """
+    Insert documents with unordered insert_many batches
+
+    Args:
+            collection (Collection): Target collection
+            documents (Iterable[dict]): Documents, generated lazily
+            batch_size (int): Documents per insert_many
+            bypass_validation (bool): Skip the collection's schema validation,
+                    only for trusted documents
+
+    Returns:
+            int: Number of inserted documents
+    """
+    inserted = 0
+    batch = []
+    for document in documents:
+        batch.append(document)
+        if len(batch) == batch_size:
+            collection.insert_many(
+                batch, ordered=False, bypass_document_validation=bypass_validation
+            )
+            inserted += len(batch)
+            batch = []
+    if batch:
+        collection.insert_many(
+            batch, ordered=False, bypass_document_validation=bypass_validation
+        )
+        inserted += len(batch)
+    return inserted
+
+
+def load_topic_ids(db) -> dict[str, ObjectId]:
+    """Ids of the existing topics, keyed by name in alphabetical order."""
+    topics = db["topics"].find().sort("name", 1)
+    return {topic["name"]: topic["_id"] for topic in topics}
+
+
+def seed_database(
+    db,
+    users: int,
+    quests: int,
+    sessions: int = 0,
+    seed: int = 0,
+    reference: datetime | None = None,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    bypass_validation: bool = False,
+    password_hashes: list[str] | None = None,
+) -> dict:
+    """
+    Generate and insert users, quests with their applications, and sessions
+
+    Topics are the ones the database already holds.
+
+    Args:
+            db (MongoDB connection): Database with the topics collection filled
+            users (int): Number of users
+            quests (int): Number of quests
+            sessions (int): Number of users getting a valid session cookie
+            seed (int): Random seed
+            reference (datetime): Date deadlines are generated around, today
+                    (UTC midnight) by default
+            batch_size (int): Documents per insert_many
+            bypass_validation (bool): Skip schema validation
+            password_hashes (list[str]): Hashes to give the users, a freshly
+                    hashed password pool by default
+
+    Returns:
+            dict: user_ids, quest_ids, topics (names), sessions and the number of
+            documents inserted per collection
+    """
+    rng = random.Random(seed)
+    if reference is None:
+        reference = datetime.now(timezone.utc).replace(
+            hour=0, minute=0, second=0, microsecond=0, tzinfo=None
+        )
+    topics = load_topic_ids(db)
+    if not topics:
+        raise ValueError("The topics collection is empty")
+    if password_hashes is None:
+        password_hashes = hash_password_pool()
+
+    created_at = reference - timedelta(days=90)
+    user_ids = [seeded_object_id(rng, created_at) for _ in range(users)]
+    quest_ids = [seeded_object_id(rng, created_at) for _ in range(quests)]
+
+    counts = {
+        "users": insert_in_batches(
+            db["users"],
+            generate_users(user_ids, password_hashes),
+            batch_size,
+            bypass_validation,
+        ),
+        "quests": insert_in_batches(
+            db["quests"],
+            generate_quests(rng, quest_ids, user_ids, list(topics.values()), reference),
+            batch_size,
+            bypass_validation,
+        ),
+    }
+    session_documents = generate_sessions(
+        [f"user{index:07d}" for index in range(min(sessions, users))], reference
+    )
+    counts["cookies"] = insert_in_batches(
+        db["cookies"], session_documents, batch_size, bypass_validation
+    )
+
+    return {
+        "user_ids": user_ids,
+        "quest_ids": quest_ids,
+        "topics": list(topics),
+        "sessions": [
+            {"username": session["username"], "cookie": session["cookie"]}
+            for session in session_documents
+        ],
+        "counts": counts,
+    }
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--uri", help="MongoDB URI, the server's by default")
+    parser.add_argument("--database", default="local_quest")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--quests", type=int, default=100_000)
+    parser.add_argument(
+        "--sessions", type=int, default=0, help="Users getting a session cookie"
+    )
+    parser.add_argument(
+        "--sessions-output", help="Write the session cookies as JSON to this file"
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--reference-date",
+        type=datetime.fromisoformat,
+        help="Date deadlines are generated around (default: today)",
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--bypass-validation",
+        action="store_true",
+        help="Skip schema validation, for trusted bulk loads",
+    )
+    parser.add_argument(
+        "--drop", action="store_true", help="Drop the seeded collections first"
+    )
+    args = parser.parse_args(argv)
+
+    client = MongoClient(args.uri) if args.uri else get_client()
+    db = client[args.database]
+    if args.drop:
+        for collection_name in SEEDED_COLLECTIONS:
+            db.drop_collection(collection_name)
+    create_tables(db)
+
+    started = time.perf_counter()
+    result = seed_database(
+        db,
+        users=args.users,
+        quests=args.quests,
+        sessions=args.sessions,
+        seed=args.seed,
+        reference=args.reference_date,
+        batch_size=args.batch_size,
+        bypass_validation=args.bypass_validation,
+    )
+    print(
+        f"Inserted {result['counts']} in {time.perf_counter() - started:.1f}s "
+        f"(seed {args.seed})"
+    )
+    if args.sessions_output:
+        with open(args.sessions_output, "w") as file:
+            json.dump(result["sessions"], file, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+import asyncio
+import os
+from typing import Callable, Hashable
+from metrics import single_flight_requests_total
+
+# Followers waiting longer than this run the read themselves
+SINGLE_FLIGHT_WAIT_SECONDS = float(os.getenv("SINGLE_FLIGHT_WAIT_SECONDS", 5))
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent reads into one
+
+    The first request for a key (the leader) runs the read in a thread, so the
+    event loop keeps serving requests meanwhile. Requests for the same key
+    arriving before it finished (followers) await the same result, or the same
+    exception. The read runs as its own task: a leader disconnecting does not
+    cancel it for the followers.
+    """
+
+    def __init__(self, name: str, wait_seconds: float = SINGLE_FLIGHT_WAIT_SECONDS):
+        self.name = name
+        self.wait_seconds = wait_seconds
+        self._flights: dict[tuple, asyncio.Future] = {}
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    async def run(self, key: Hashable, load: Callable):
+        """
+        Run a blocking read, or share the one running for the same key
+
+        Args:
+                key (Hashable): Identifies the read, with all its parameters
+                load (Callable): Runs the read
+
+        Returns:
+                Result of the read
+        """
+        # Futures belong to a loop, every worker loop has its own flights
+        flight_key = (asyncio.get_running_loop(), key)
+        flight = self._flights.get(flight_key)
+        if flight is None:
+            single_flight_requests_total.labels(flight=self.name, role="leader").inc()
+            flight = asyncio.ensure_future(asyncio.to_thread(load))
+            self._flights[flight_key] = flight
+            flight.add_done_callback(lambda done: self._land(flight_key, done))
+            return await asyncio.shield(flight)
+
+        single_flight_requests_total.labels(flight=self.name, role="follower").inc()
+        try:
+            return await asyncio.wait_for(asyncio.shield(flight), self.wait_seconds)
+        except TimeoutError:
+            single_flight_requests_total.labels(flight=self.name, role="timeout").inc()
+            return await asyncio.to_thread(load)
+
+    def _land(self, flight_key: tuple, flight: asyncio.Future):
+        if self._flights.get(flight_key) is flight:
+            del self._flights[flight_key]
+        # Retrieved, so an error nobody awaited anymore is not logged as lost
+        if not flight.cancelled():
+            flight.exception()
@@ -0,0 +1,94 @@
+import os
+import threading
+import time
+from typing import Iterable
+from bson import ObjectId
+
+TOPIC_CACHE_TTL_SECONDS = float(os.getenv("TOPIC_CACHE_TTL_SECONDS", 300))
+
+
+class TopicCache:
+    """
+    Topic names and ids of the process, loaded with a single query
+
+    Topics only change through migrations, so the cache is reloaded every
+    ttl_seconds and whenever a name or id is not found in it.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._ids_by_name: dict[str, ObjectId] | None = None
+        self._names_by_id: dict[ObjectId, str] = {}
+        self._loaded_at = 0.0
+
+    def load(self, db):
+        """Replace the cached topics with the ones in the database."""
+        topics = list(db["topics"].find({}, {"name": 1}))
+        with self._lock:
+            self._ids_by_name = {topic["name"]: topic["_id"] for topic in topics}
+            self._names_by_id = {topic["_id"]: topic["name"] for topic in topics}
+            self._loaded_at = time.monotonic()
+
+    def clear(self):
+        with self._lock:
+            self._ids_by_name = None
+            self._names_by_id = {}
+
+    def _snapshot(self, db, keys=(), index: int = 0) -> dict:
+        """
+        Cached ids by name (index 0) or names by id (index 1)
+
+        Loads the topics when the cache is empty or expired, or when one of the
+        keys is missing from an earlier load.
+        """
+        with self._lock:
+            loaded = self._ids_by_name is not None
+            expired = time.monotonic() - self._loaded_at >= self.ttl_seconds
+            mapping = (self._ids_by_name, self._names_by_id)[index]
+        if not loaded or expired or not set(keys).issubset(mapping):
+            self.load(db)
+            with self._lock:
+                mapping = (self._ids_by_name, self._names_by_id)[index]
+        return mapping
+
+    def names(self, db) -> list[str]:
+        """Names of all topics."""
+        return list(self._snapshot(db))
+
+    def ids_by_name(self, db, names: Iterable[str]) -> dict[str, ObjectId]:
+        """
+        Ids of the given topic names
+
+        Args:
+                db (MongoDB connection): Database, queried on a cache miss
+                names (Iterable[str]): Topic names
+
+        Returns:
+                dict[str, ObjectId]: Ids keyed by name, unknown names left out
+        """
+        names = set(names)
+        ids_by_name = self._snapshot(db, names, 0)
+        return {name: ids_by_name[name] for name in names if name in ids_by_name}
+
+    def names_by_id(self, db, ids: Iterable[ObjectId]) -> dict[ObjectId, str]:
+        """
+        Names of the given topic ids
+
+        Args:
+                db (MongoDB connection): Database, queried on a cache miss
+                ids (Iterable[ObjectId]): Topic ids
+
+        Returns:
+                dict[ObjectId, str]: Names keyed by id, unknown ids left out
+        """
+        ids = set(ids)
+        names_by_id = self._snapshot(db, ids, 1)
+        return {
+            topic_id: names_by_id[topic_id]
+            for topic_id in ids
+            if topic_id in names_by_id
+        }
+
+
+topic_cache = TopicCache(TOPIC_CACHE_TTL_SECONDS)
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import secrets
+from typing import Literal
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import JSONResponse
+from db.monitoring import query_monitor
+from profiling import memory_profiler, resident_memory_bytes
+
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def is_admin_token(token: str | None) -> bool:
+    """
+    Check a token against ADMIN_TOKEN
+
+    Returns:
+            bool: False when no admin token is configured
+    """
+    if not ADMIN_TOKEN or not token:
+        return False
+    return secrets.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def require_admin(x_admin_token: str | None = Header(None)):
+    """
+    Dependency restricting a route to callers sending the X-Admin-Token header
+
+    Admin routes do not exist (404) unless ADMIN_TOKEN is configured.
+    """
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not is_admin_token(x_admin_token):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+router = APIRouter(dependencies=[Depends(require_admin)])
+
+
+@router.get("/query-shapes")
+async def get_query_shapes(limit: int = Query(20, ge=1, le=500)):
+    """
+    List the MongoDB query shapes with the highest total time
+
+    Args:
+            limit (int): Number of shapes to return
+
+    Returns:
+            JSONResponse: Shapes with their count, total, average and max time,
+            number of slow executions and captured query plan
+    """
+    return JSONResponse(content={"shapes": query_monitor.top_shapes(limit)})
+
+
+@router.delete("/query-shapes")
+async def reset_query_shapes():
+    """
+    Reset the recorded query shapes
+    """
+    query_monitor.reset()
+    return JSONResponse(content={"message": "Query shapes reset"})
+
+
+@router.get("/memory")
+async def get_memory_status():
+    """
+    Get the worker's resident memory and the tracemalloc status
+
+    Returns:
+            JSONResponse: RSS, whether tracemalloc is tracing, traced memory and
+            the snapshots taken
+    """
+    return JSONResponse(
+        content={
+            "resident_bytes": resident_memory_bytes(),
+            **memory_profiler.status(),
+        }
+    )
+
+
+@router.post("/memory/start")
+async def start_memory_tracing(frames: int = Query(1, ge=1, le=100)):
+    """
+    Start tracing allocations with tracemalloc
+
+    Args:
+            frames (int): Number of frames kept per allocation traceback
+    """
+    memory_profiler.start(frames)
+    return JSONResponse(content=memory_profiler.status())
+
+
+@router.post("/memory/stop")
+async def stop_memory_tracing():
+    """
+    Stop tracing allocations and drop the snapshots
+    """
+    memory_profiler.stop()
+    return JSONResponse(content=memory_profiler.status())
+
+
+@router.post("/memory/snapshots")
+async def take_memory_snapshot(
+    limit: int = Query(20, ge=1, le=500),
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+):
+    """
+    Take a tracemalloc snapshot
+
+    Args:
+            limit (int): Number of allocation sites to return
+            group_by (str): Group allocations by line, file or traceback
+
+    Returns:
+            JSONResponse: Snapshot id and its largest allocation sites
+    """
+    try:
+        snapshot_id = await asyncio.to_thread(memory_profiler.take_snapshot)
+    except RuntimeError:
+        raise HTTPException(status_code=409, detail="Memory tracing is not started")
+    top = await asyncio.to_thread(memory_profiler.top, snapshot_id, limit, group_by)
+    return JSONResponse(content={"id": snapshot_id, "top": top})
+
+
+@router.get("/memory/snapshots/{snapshot_id}")
+async def get_memory_snapshot(
+    snapshot_id: int,
+    base: int | None = None,
+    limit: int = Query(20, ge=1, le=500),
+    group_by: Literal["lineno", "filename", "traceback"] = "lineno",
+):
+    """
+    Get the largest allocation sites of a snapshot
+
+    Args:
+            snapshot_id (int): Snapshot id
+            base (int | None): Older snapshot id to diff against
+            limit (int): Number of allocation sites to return
+            group_by (str): Group allocations by line, file or traceback
+
+    Returns:
+            JSONResponse: Largest allocation sites, or the ones that grew the
+            most since the base snapshot
+    """
+    try:
+        if base is None:
+            top = await asyncio.to_thread(
+                memory_profiler.top, snapshot_id, limit, group_by
+            )
+        else:
+            top = await asyncio.to_thread(
+                memory_profiler.diff, snapshot_id, base, limit, group_by
+            )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Snapshot not found")
+    return JSONResponse(content={"id": snapshot_id, "base": base, "top": top})
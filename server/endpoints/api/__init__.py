@@ -1,13 +1,20 @@
 from .users import router as users_router
 from .me import router as me_router
 from .quests import router as quests_router
+from .quest_stream import router as quest_stream_router
 from .topics import router as topics_router
-from fastapi import APIRouter
+from .notifications import router as notifications_router
+from .negotiation import negotiate_media_type
+from fastapi import APIRouter, Depends
 
 router = APIRouter()
+# Endpoints answering in MessagePack to clients accepting it
+negotiated = [Depends(negotiate_media_type)]
 
 
-router.include_router(topics_router, prefix="/topics")
-router.include_router(quests_router, prefix="/quests")
-router.include_router(me_router, prefix="/me")
-router.include_router(users_router, prefix="/users")
+router.include_router(topics_router, prefix="/topics", dependencies=negotiated)
+router.include_router(quest_stream_router, prefix="/quests")
+router.include_router(quests_router, prefix="/quests", dependencies=negotiated)
+router.include_router(me_router, prefix="/me", dependencies=negotiated)
+router.include_router(users_router, prefix="/users", dependencies=negotiated)
+router.include_router(notifications_router, prefix="/notifications")
@@ -0,0 +1,157 @@
+import gzip
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from metrics import cache_requests_total, compressed_response_bytes_total
+
+try:
+    import brotli
+except ImportError:
+    # Optional, clients accepting only br then get gzip or plain responses
+    brotli = None
+
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", 1024))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+# Quality 11 compresses best but is far too slow for dynamic responses
+COMPRESSION_BROTLI_QUALITY = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 5))
+COMPRESSION_CACHE_SIZE = int(os.getenv("COMPRESSION_CACHE_SIZE", 256))
+# Only these routes are compressed: large, repetitive JSON
+COMPRESSED_PATH_PREFIXES = ("/api/quests", "/api/users", "/api/me")
+# Streams are flushed event by event, compressing them would buffer them
+UNCOMPRESSED_MEDIA_TYPES = ("text/event-stream",)
+
+COMPRESSORS = {
+    "gzip": lambda body: gzip.compress(
+        body, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0
+    ),
+}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda body: brotli.compress(
+        body, quality=COMPRESSION_BROTLI_QUALITY
+    )
+# Preferred first when the client accepts several
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """
+    Pick the response encoding from an Accept-Encoding header
+
+    Args:
+            accept_encoding (str | None): Raw header value
+
+    Returns:
+            str | None: Preferred supported encoding the client accepts, None
+            to send the body uncompressed
+    """
+    if not accept_encoding:
+        return None
+    qualities = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[coding.strip().lower()] = quality
+
+    default_quality = qualities.get("*", 0.0)
+    for encoding in ENCODING_PREFERENCE:
+        if encoding not in COMPRESSORS:
+            continue
+        if qualities.get(encoding, default_quality) > 0:
+            return encoding
+    return None
+
+
+class CompressedBodyCache:
+    """
+    LRU of compressed bodies, keyed by the digest of the uncompressed body
+
+    Quest lists and profiles change far less often than they are requested,
+    so most responses are byte-identical to an earlier one and are served
+    without compressing them again. Hashing costs a fraction of compressing.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[tuple[bytes, str], bytes] = OrderedDict()
+
+    def compress(self, body: bytes, encoding: str) -> bytes:
+        """
+        Compress a body, or return the cached result for the same body
+
+        Args:
+                body (bytes): Uncompressed body
+                encoding (str): Key of COMPRESSORS
+
+        Returns:
+                bytes: Compressed body
+        """
+        key = (hashlib.blake2b(body, digest_size=16).digest(), encoding)
+        with self._lock:
+            compressed = self._entries.get(key)
+            if compressed is not None:
+                self._entries.move_to_end(key)
+        cache_requests_total.labels(
+            cache="compression", result="miss" if compressed is None else "hit"
+        ).inc()
+        if compressed is not None:
+            return compressed
+
+        compressed = COMPRESSORS[encoding](body)
+        if self.max_entries > 0:
+            with self._lock:
+                self._entries[key] = compressed
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return compressed
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+compressed_body_cache = CompressedBodyCache(COMPRESSION_CACHE_SIZE)
+
+
+def is_compressible(path: str, content_type: str | None) -> bool:
+    """Whether responses of a path and content type may be compressed."""
+    if not path.startswith(COMPRESSED_PATH_PREFIXES):
+        return False
+    return not (content_type or "").startswith(UNCOMPRESSED_MEDIA_TYPES)
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """
+    ETag of a compressed body: the identity ETag suffixed with the encoding
+
+    Compressed bodies differ byte for byte from the identity one, so they need
+    their own strong validator.
+    """
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def strip_encoding_suffix(etag: str) -> str:
+    """ETag of the identity body, from the ETag of any encoding of it."""
+    for encoding in ENCODING_PREFERENCE:
+        suffix = f'-{encoding}"'
+        if etag.endswith(suffix):
+            return etag.removesuffix(suffix) + '"'
+    return etag
+
+
+def compress_body(body: bytes, encoding: str) -> bytes:
+    """Compress a response body through the cache and count the bytes saved."""
+    compressed = compressed_body_cache.compress(body, encoding)
+    compressed_response_bytes_total.labels(encoding=encoding, body="original").inc(
+        len(body)
+    )
+    compressed_response_bytes_total.labels(encoding=encoding, body="compressed").inc(
+        len(compressed)
+    )
+    return compressed
@@ -0,0 +1,142 @@
+import hashlib
+import json
+from starlette.responses import Response
+from .compression import strip_encoding_suffix
+from .negotiation import MSGPACK_MEDIA_TYPE, ApiResponse, response_media_type
+
+# Suffix of the ETags of MessagePack bodies, JSON bodies keep the plain ETag
+MSGPACK_ETAG_SUFFIX = "-msgpack"
+
+
+def quest_etag(quest: dict) -> str:
+    """
+    Build the strong ETag of a quest from its version
+
+    Args:
+            quest (dict): Quest data
+
+    Returns:
+            str: Quoted ETag value
+    """
+    return f'"{quest.get("version", 0)}"'
+
+
+def representation_suffix() -> str:
+    if response_media_type.get() == MSGPACK_MEDIA_TYPE:
+        return MSGPACK_ETAG_SUFFIX
+    return ""
+
+
+def representation_etag(etag: str) -> str:
+    """
+    ETag of the representation negotiated for the request
+
+    JSON and MessagePack bodies differ byte for byte, so each needs its own
+    strong validator.
+
+    Args:
+            etag (str): Quoted ETag of the content
+
+    Returns:
+            str: Quoted ETag of the negotiated representation
+    """
+    return f'{etag[:-1]}{representation_suffix()}"'
+
+
+def parse_if_match(if_match: str | None) -> list[int] | None:
+    """
+    Parse an If-Match header into the list of quest versions it accepts
+
+    Args:
+            if_match (str | None): Raw If-Match header value
+
+    Returns:
+            list[int] | None: Accepted versions, or None when any version is
+            accepted (header missing or "*"). Weak or malformed tags accept no
+            version, since If-Match requires a strong comparison, and neither
+            do tags of another representation than the negotiated one.
+    """
+    if if_match is None or if_match.strip() == "*":
+        return None
+
+    suffix = representation_suffix()
+    versions = []
+    for tag in if_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/") or len(tag) < 2 or tag[0] != '"' or tag[-1] != '"':
+            continue
+        value = strip_encoding_suffix(tag)[1:-1]
+        if suffix:
+            if not value.endswith(suffix):
+                continue
+            value = value.removesuffix(suffix)
+        try:
+            versions.append(int(value))
+        except ValueError:
+            continue
+    return versions
+
+
+def quests_etag(quests: list[dict]) -> str:
+    """
+    Build the strong ETag of a quest list from the ids and versions of its quests
+
+    Every quest write bumps the version, so this changes with the list without
+    encoding it.
+
+    Args:
+            quests (list[dict]): Serialized quests, in response order
+
+    Returns:
+            str: Quoted ETag value
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    for quest in quests:
+        digest.update(f"{quest['_id']}:{quest.get('version', 0)},".encode())
+    return f'"{digest.hexdigest()}"'
+
+
+def content_etag(content) -> str:
+    """Strong ETag hashing JSON-compatible content, for unversioned data."""
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":"))
+    return f'"{hashlib.blake2b(body.encode(), digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag
+
+    If-None-Match uses the weak comparison, so W/ prefixes are ignored. The
+    header is compared with the ETag of the negotiated representation, the
+    suffix the compression middleware adds to the ETag is ignored as well.
+    """
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    etag = representation_etag(etag)
+    tags = (tag.strip().removeprefix("W/") for tag in if_none_match.split(","))
+    return any(strip_encoding_suffix(tag) == etag for tag in tags)
+
+
+def conditional_response(
+    content: dict, etag: str, if_none_match: str | None, status_code: int = 200
+) -> Response:
+    """
+    Respond with the content and its ETag, or an empty 304 when the client
+    already has it
+
+    Args:
+            content (dict): Response content
+            etag (str): ETag of the content, sent as representation_etag
+            if_none_match (str | None): Raw If-None-Match header value
+            status_code (int): Status code of the full response
+
+    Returns:
+            Response: ApiResponse, or 304 Not Modified
+    """
+    matches = etag_matches(if_none_match, etag)
+    etag = representation_etag(etag)
+    if matches:
+        return Response(status_code=304, headers={"ETag": etag, "Vary": "Accept"})
+    return ApiResponse(content=content, status_code=status_code, headers={"ETag": etag})
@@ -0,0 +1,66 @@
+from typing import Callable
+from fastapi import HTTPException, Request
+from db.crud import crud_idempotency
+from db.errors import DbError
+from metrics import record_cache_lookup
+from .negotiation import ApiResponse, pack_stored, unpack_stored
+
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+def run_idempotent(
+    request: Request,
+    db,
+    idempotency_key: str | None,
+    payload,
+    handler: Callable[[], tuple[int, dict]],
+) -> ApiResponse:
+    """
+    Run a request handler at most once per Idempotency-Key
+
+    The first response for a key is stored and returned as-is for retries,
+    without running the handler again. Handlers that raise are not stored, so
+    the request can be retried.
+
+    Args:
+            request (Request): Request object
+            db (MongoDB connection): Database connection
+            idempotency_key (str | None): Value of the Idempotency-Key header
+            payload: JSON-compatible request payload
+            handler (Callable): Returns the (status code, content) of the response
+
+    Returns:
+            ApiResponse: Fresh or replayed response, in the negotiated format
+    """
+    if idempotency_key is None:
+        status_code, content = handler()
+        return ApiResponse(status_code=status_code, content=content)
+
+    if not idempotency_key or len(idempotency_key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid idempotency key")
+
+    record, err = crud_idempotency.reserve_idempotency_key(
+        db, request, idempotency_key, payload
+    )
+    if err == DbError.IDEMPOTENCY_KEY_REUSED_ERROR.value:
+        raise HTTPException(status_code=422, detail=err)
+    if err == DbError.IDEMPOTENCY_KEY_IN_PROGRESS_ERROR.value:
+        raise HTTPException(status_code=409, detail=err)
+    record_cache_lookup("idempotency", hit=record is not None)
+    if record:
+        return ApiResponse(
+            status_code=record["status_code"],
+            content=unpack_stored(record["content"]),
+            headers={"Idempotent-Replayed": "true"},
+        )
+
+    try:
+        status_code, content = handler()
+    except BaseException:
+        crud_idempotency.release_idempotency_key(db, request, idempotency_key)
+        raise
+
+    crud_idempotency.save_idempotent_response(
+        db, request, idempotency_key, status_code, pack_stored(content)
+    )
+    return ApiResponse(status_code=status_code, content=content)
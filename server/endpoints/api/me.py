@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from db.database import get_db_connection
 from pymongo import MongoClient
+from .etags import conditional_response, content_etag
 from .user_cookie import get_user_from_cookie
 from db.crud.serialize import serialize_objectid
 
@@ -10,16 +10,21 @@ router = APIRouter()
 
 
 @router.get("")
-async def get_me(request: Request, db: MongoClient = Depends(get_db_connection)):
+async def get_me(
+    request: Request,
+    if_none_match: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
+):
     """
     Get me
 
     Returns:
-            JSONResponse: User
+            ApiResponse: User
     """
 
     user = get_user_from_cookie(request, db)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    return JSONResponse(content={"user": serialize_objectid(user)})
+    content = {"user": serialize_objectid(user)}
+    return conditional_response(content, content_etag(content), if_none_match)
@@ -0,0 +1,160 @@
+from contextvars import ContextVar
+from datetime import datetime, timezone
+import msgpack
+from bson import ObjectId
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from db.crud.serialize import SerializedDatetime, SerializedObjectId
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+# Older clients still send the unregistered name
+MSGPACK_MEDIA_TYPES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack")
+# Extension type code of ObjectIds, packed as their 12 bytes
+OBJECT_ID_EXT_TYPE = 1
+
+# Media type of the request's ApiResponses, set by negotiate_media_type
+response_media_type: ContextVar[str] = ContextVar(
+    "response_media_type", default=JSON_MEDIA_TYPE
+)
+
+
+def accepts_msgpack(accept: str | None) -> bool:
+    """
+    Whether an Accept header prefers MessagePack to JSON
+
+    Args:
+            accept (str | None): Raw header value
+
+    Returns:
+            bool: True when a MessagePack media type is accepted with at least
+            the quality of JSON
+    """
+    if not accept:
+        return False
+    qualities = {}
+    for item in accept.split(","):
+        media_type, _, params = item.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        qualities[media_type.strip().lower()] = quality
+
+    msgpack_quality = max(qualities.get(name, 0.0) for name in MSGPACK_MEDIA_TYPES)
+    json_quality = qualities.get(
+        JSON_MEDIA_TYPE,
+        qualities.get("application/*", qualities.get("*/*", 0.0)),
+    )
+    return msgpack_quality > 0 and msgpack_quality >= json_quality
+
+
+async def negotiate_media_type(request: Request):
+    """Router dependency answering with MessagePack when the client asks for it."""
+    if accepts_msgpack(request.headers.get("accept")):
+        response_media_type.set(MSGPACK_MEDIA_TYPE)
+
+
+def encode_object_id(value) -> msgpack.ExtType:
+    return msgpack.ExtType(OBJECT_ID_EXT_TYPE, bytes.fromhex(value))
+
+
+def encode_datetime(value) -> datetime:
+    # Naive datetimes are stored in UTC, the packer needs them aware
+    value = datetime.fromisoformat(value) if isinstance(value, str) else value
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+# Exact types, looked up before the slower isinstance checks
+COMPACT_ENCODERS = {
+    SerializedObjectId: encode_object_id,
+    SerializedDatetime: encode_datetime,
+    ObjectId: lambda value: msgpack.ExtType(OBJECT_ID_EXT_TYPE, value.binary),
+    datetime: encode_datetime,
+    tuple: list,
+}
+
+
+def encode_compact(obj):
+    """
+    msgpack default hook for the values serialize_objectid produces
+
+    ObjectIds become an extension of their 12 bytes and datetimes a
+    MessagePack timestamp, instead of 24 and 26 character strings.
+    """
+    encoder = COMPACT_ENCODERS.get(type(obj))
+    if encoder is not None:
+        return encoder(obj)
+    # Other subclasses, such as bson's Int64
+    for base in (str, int, float, list, dict):
+        if isinstance(obj, base):
+            return base(obj)
+    raise TypeError(f"Cannot serialize {type(obj).__name__} to MessagePack")
+
+
+def packb(content) -> bytes:
+    """Encode JSON-compatible content, with compact ObjectIds and datetimes."""
+    return msgpack.packb(
+        content, default=encode_compact, strict_types=True, datetime=True
+    )
+
+
+# Extension type code of SerializedDatetimes in stored content, as their string
+STORED_DATETIME_EXT_TYPE = 2
+
+
+def encode_stored(obj):
+    if type(obj) is SerializedDatetime:
+        return msgpack.ExtType(STORED_DATETIME_EXT_TYPE, obj.encode())
+    return encode_compact(obj)
+
+
+def decode_stored(code: int, data: bytes):
+    if code == OBJECT_ID_EXT_TYPE:
+        return SerializedObjectId(data.hex())
+    if code == STORED_DATETIME_EXT_TYPE:
+        return SerializedDatetime(data.decode())
+    return msgpack.ExtType(code, data)
+
+
+def pack_stored(content) -> bytes:
+    """
+    Encode content for storage, keeping the types serialize_objectid produces
+
+    unpack_stored returns content an ApiResponse renders to the same bytes as
+    the original, in either format. Datetimes keep their exact string.
+    """
+    return msgpack.packb(content, default=encode_stored, strict_types=True)
+
+
+def unpack_stored(data: bytes):
+    """Decode content encoded by pack_stored."""
+    return msgpack.unpackb(data, ext_hook=decode_stored)
+
+
+def decode_ext(code: int, data: bytes):
+    """msgpack ext_hook turning the ObjectId extension back into an ObjectId."""
+    if code == OBJECT_ID_EXT_TYPE:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+class ApiResponse(JSONResponse):
+    """
+    JSON response, or MessagePack for clients negotiate_media_type chose it for
+
+    The content is what a JSONResponse takes, so endpoints return either
+    format from the same serialize_objectid output.
+    """
+
+    def __init__(self, content, status_code: int = 200, headers=None, **kwargs):
+        kwargs.setdefault("media_type", response_media_type.get())
+        super().__init__(content, status_code, headers, **kwargs)
+        self.headers.append("Vary", "Accept")
+
+    def render(self, content) -> bytes:
+        if self.media_type == MSGPACK_MEDIA_TYPE:
+            return packb(content)
+        return super().render(content)
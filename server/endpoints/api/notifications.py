@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import os
+import threading
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from db.database import get_db_connection
+from db.events import BoundedEventQueue, quest_events
+from pymongo import MongoClient
+from .user_cookie import get_user_from_cookie
+
+logger = logging.getLogger(__name__)
+
+NOTIFICATION_QUEUE_SIZE = int(os.getenv("NOTIFICATION_QUEUE_SIZE", 100))
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.getenv("NOTIFICATION_HEARTBEAT_SECONDS", 30))
+
+router = APIRouter()
+
+
+class NotificationConnection(BoundedEventQueue):
+    """
+    The queue of outgoing notifications of one WebSocket connection.
+
+    When the client falls behind, the oldest notifications are dropped.
+    """
+
+
+class NotificationHub:
+    """
+    Registry of open notification connections per user id
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._connections: dict[str, set[NotificationConnection]] = {}
+
+    def register(self, user_id: str, connection: NotificationConnection):
+        with self._lock:
+            self._connections.setdefault(user_id, set()).add(connection)
+
+    def unregister(self, user_id: str, connection: NotificationConnection):
+        with self._lock:
+            connections = self._connections.get(user_id)
+            if connections is None:
+                return
+            connections.discard(connection)
+            if not connections:
+                del self._connections[user_id]
+
+    def connection_count(self) -> int:
+        with self._lock:
+            return sum(len(connections) for connections in self._connections.values())
+
+    def notify(self, user_ids, message: dict):
+        """
+        Queue a notification for every connection of the given users
+
+        Args:
+                user_ids (Iterable[str]): Recipient user ids
+                message (dict): JSON notification
+        """
+        with self._lock:
+            connections = [
+                connection
+                for user_id in set(user_ids)
+                for connection in self._connections.get(user_id, ())
+            ]
+        for connection in connections:
+            connection.push(message)
+
+    def handle_quest_event(self, event: dict):
+        """
+        Turn quest events into notifications for the users they concern
+
+        Applications notify the quest creator, closing a quest notifies its
+        applicants.
+        """
+        quest = event["quest"]
+        if event["type"] == "apply" and quest.get("created_by"):
+            applicants = quest.get("applicants") or [None]
+            self.notify(
+                [quest["created_by"]],
+                {
+                    "type": "application",
+                    "quest_id": quest["_id"],
+                    "title": quest.get("title"),
+                    "applicant_id": applicants[-1],
+                },
+            )
+        elif event["type"] == "close":
+            self.notify(
+                quest.get("applicants", []),
+                {
+                    "type": "quest_closed",
+                    "quest_id": quest["_id"],
+                    "title": quest.get("title"),
+                },
+            )
+
+
+notification_hub = NotificationHub()
+quest_events.add_listener(notification_hub.handle_quest_event)
+
+
+async def send_notifications(websocket: WebSocket, connection: NotificationConnection):
+    """Send queued notifications, and a ping whenever the queue stays idle."""
+    while True:
+        try:
+            message = await asyncio.wait_for(
+                connection.queue.get(), timeout=NOTIFICATION_HEARTBEAT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            message = {"type": "ping"}
+        try:
+            await websocket.send_json(message)
+        except (WebSocketDisconnect, RuntimeError):
+            return
+
+
+async def receive_until_disconnect(websocket: WebSocket):
+    """Drain client messages (such as pongs) until the client disconnects."""
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+
+
+@router.websocket("/ws")
+async def notifications(
+    websocket: WebSocket, db: MongoClient = Depends(get_db_connection)
+):
+    """
+    Push notifications about the user's quests over a WebSocket
+
+    Authenticated with the auth_token cookie. Sends "application" messages to
+    quest creators, "quest_closed" messages to applicants and a "ping" after
+    every idle heartbeat interval.
+    """
+    try:
+        user = get_user_from_cookie(websocket, db)
+    except HTTPException:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    user_id = str(user["_id"])
+    connection = NotificationConnection(
+        asyncio.get_running_loop(), NOTIFICATION_QUEUE_SIZE
+    )
+    notification_hub.register(user_id, connection)
+
+    sender = asyncio.create_task(send_notifications(websocket, connection))
+    receiver = asyncio.create_task(receive_until_disconnect(websocket))
+    try:
+        await asyncio.wait([sender, receiver], return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        notification_hub.unregister(user_id, connection)
+        for task in (sender, receiver):
+            task.cancel()
+        logger.debug("Notification connection closed for user %s", user_id)
@@ -0,0 +1,104 @@
+import asyncio
+import json
+from typing import List
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from db.database import get_db_connection
+from db.events import quest_events, quest_matches_filter
+from db.topic_cache import topic_cache
+from pymongo import MongoClient
+
+HEARTBEAT_INTERVAL_SECONDS = 15
+
+router = APIRouter()
+
+
+def format_sse(event: dict) -> str:
+    """Format a quest event as a Server-Sent Events message."""
+    data = json.dumps({"type": event["type"], "quest": event["quest"]})
+    return f"id: {event['id']}\nevent: {event['type']}\ndata: {data}\n\n"
+
+
+async def quest_event_stream(
+    request: Request,
+    last_event_id: str | None = None,
+    topic_ids: set[str] | None = None,
+    bbox: list[float] | None = None,
+    heartbeat_interval: float = HEARTBEAT_INTERVAL_SECONDS,
+):
+    """
+    Yield Server-Sent Events for quest changes until the client disconnects
+
+    The subscription to the event bus is taken when the stream starts and
+    dropped when it ends, so a client disconnecting before the response
+    started leaves no subscription behind.
+
+    Args:
+        request (Request): Request object, used to detect disconnects
+        last_event_id (str, optional): Replay the events published after it
+        topic_ids (set[str], optional): Only send quests with one of these topics
+        bbox (list[float], optional): Only send quests inside this bounding box
+        heartbeat_interval (float): Seconds between keep-alive comments
+    """
+    subscription, missed_events = quest_events.subscribe(
+        asyncio.get_running_loop(), last_event_id
+    )
+    try:
+        yield f"retry: {HEARTBEAT_INTERVAL_SECONDS * 1000}\n\n"
+        for event in missed_events:
+            if quest_matches_filter(event["quest"], topic_ids, bbox):
+                yield format_sse(event)
+
+        while not await request.is_disconnected():
+            try:
+                event = await asyncio.wait_for(
+                    subscription.queue.get(), timeout=heartbeat_interval
+                )
+            except asyncio.TimeoutError:
+                yield ": keep-alive\n\n"
+                continue
+            if quest_matches_filter(event["quest"], topic_ids, bbox):
+                yield format_sse(event)
+    finally:
+        quest_events.unsubscribe(subscription)
+
+
+@router.get("/stream")
+async def stream_quests(
+    request: Request,
+    topics: List[str] = Query(None, alias="topics"),
+    bbox: List[float] = Query(None, alias="bbox"),
+    last_event_id: str | None = Header(None),
+    resume_after: str | None = Query(None),
+    db: MongoClient = Depends(get_db_connection),
+):
+    """
+    Stream quest changes as Server-Sent Events
+
+    Args:
+        topics (List[str], optional): Only stream quests with one of these topics
+        bbox (List[float], optional): min_lon, min_lat, max_lon, max_lat
+        last_event_id (str, optional): Resume after this event (set by browsers
+            on reconnect), resume_after can be used instead as a query parameter
+
+    Returns:
+        StreamingResponse: text/event-stream of create, update, apply, close,
+        delete and archive events
+    """
+    if bbox and len(bbox) != 4:
+        raise HTTPException(
+            status_code=400,
+            detail="Bounding box must be min_lon, min_lat, max_lon, max_lat",
+        )
+
+    topic_ids = None
+    if topics:
+        topic_ids = {
+            str(topic_id) for topic_id in topic_cache.ids_by_name(db, topics).values()
+        }
+
+    return StreamingResponse(
+        quest_event_stream(request, last_event_id or resume_after, topic_ids, bbox),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,56 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Body, Query
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Request, Body, Query, Header
 from db.database import get_db_connection
+from db.errors import DbError
 from pymongo import MongoClient
 from db.crud import crud_quests
 from db.crud.crud_quests import Quest
+from db.quest_cache import filter_key, quest_cache
 from typing import List
+from .etags import (
+    conditional_response,
+    etag_matches,
+    parse_if_match,
+    quest_etag,
+    quests_etag,
+    representation_etag,
+)
+from .idempotency import run_idempotent
+from .negotiation import ApiResponse
 
 
 router = APIRouter()
 
 
 @router.get("")
-async def get_all_quests(db: MongoClient = Depends(get_db_connection)):
+async def get_all_quests(
+    if_none_match: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
+):
     """
     Get all quests
 
+    Clients polling with the ETag of their last response get an empty 304
+    while no quest changed.
+
     Returns:
-        JSONResponse: List of quests
+        ApiResponse: List of quests
     """
-    quests = crud_quests.get_quests_db(db)
+    quests, etag = await quest_cache.get_list(
+        "all", (), lambda: crud_quests.get_quests_db(db), quests_etag
+    )
     if not quests:
-        return JSONResponse(
-            status_code=200, content={"quests": [], "message": "No quests found"}
-        )
-    return JSONResponse(status_code=200, content={"quests": quests})
+        content = {"quests": [], "message": "No quests found"}
+    else:
+        content = {"quests": quests}
+    return conditional_response(content, etag, if_none_match)
 
 
 @router.post("")
 async def create_quest(
     request: Request,
     user_quest: Quest = Body(...),
+    idempotency_key: str | None = Header(None),
     db: MongoClient = Depends(get_db_connection),
 ):
     """
     Create a new quest
 
+    Retries sending the same Idempotency-Key header get the original response
+    instead of creating a duplicate quest.
+
     Args:
         user_quest (Quest): Quest data
 
     Returns:
-        JSONResponse: Created quest
+        ApiResponse: Created quest
     """
-    quest = crud_quests.create_quest_db(db=db, user_quest=user_quest, request=request)
-    if not quest:
-        raise HTTPException(status_code=400, detail="Failed to create quest")
-    return JSONResponse(status_code=201, content={"quest": quest})
+
+    def create():
+        quest = crud_quests.create_quest_db(
+            db=db, user_quest=user_quest, request=request
+        )
+        if not quest:
+            raise HTTPException(status_code=400, detail="Failed to create quest")
+        return 201, {"quest": quest}
+
+    return run_idempotent(
+        request, db, idempotency_key, user_quest.model_dump(mode="json"), create
+    )
 
 
 @router.get("/filter")
 async def filter_quests(
     topics: List[str] = Query(None, alias="topics"),
     prices: List[float] = Query(None, alias="prices"),
+    if_none_match: str | None = Header(None),
     db: MongoClient = Depends(get_db_connection),
 ):
     if not topics and not prices:
@@ -63,18 +95,36 @@ async def filter_quests(
             status_code=400, detail="Prices must be a list of two values"
         )
 
-    filtered_quests = crud_quests.filter_quests_db(db=db, topics=topics, prices=prices)
+    filtered_quests, etag = await quest_cache.get_list(
+        "filter",
+        filter_key(topics, prices),
+        lambda: crud_quests.filter_quests_db(db=db, topics=topics, prices=prices),
+        quests_etag,
+    )
     if not filtered_quests:
         raise HTTPException(status_code=404, detail="No quests found")
-    return JSONResponse(status_code=200, content={"quests": filtered_quests})
+    return conditional_response({"quests": filtered_quests}, etag, if_none_match)
 
 
 @router.get("/{quest_id}")
-async def get_quest(quest_id: str, db: MongoClient = Depends(get_db_connection)):
-    quest = crud_quests.get_quest_by_id_db(db=db, quest_id=quest_id)
+async def get_quest(
+    quest_id: str,
+    if_none_match: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
+):
+    if if_none_match is not None:
+        # Only the version is read, the quest itself when it changed
+        version = crud_quests.get_quest_version_db(db=db, quest_id=quest_id)
+        etag = quest_etag({"version": version})
+        if version is not None and etag_matches(if_none_match, etag):
+            return conditional_response({}, etag, if_none_match)
+
+    quest = await quest_cache.get_quest(
+        quest_id, lambda: crud_quests.get_quest_by_id_db(db=db, quest_id=quest_id)
+    )
     if not quest:
         raise HTTPException(status_code=404, detail="Quest not found")
-    return JSONResponse(status_code=200, content={"quest": quest})
+    return conditional_response({"quest": quest}, quest_etag(quest), if_none_match)
 
 
 @router.put("/{quest_id}")
@@ -82,14 +132,33 @@ async def update_quest(
     quest_id: str,
     request: Request,
     user_quest: Quest = Body(...),
+    if_match: str | None = Header(None),
     db: MongoClient = Depends(get_db_connection),
 ):
+    """
+    Update a quest
+
+    When an If-Match header is sent, the update only applies if the quest is
+    still at one of the given versions, otherwise 412 is returned.
+    """
     quest, err = crud_quests.put_quest_by_id_db(
-        db=db, quest_id=quest_id, user_quest=user_quest, request=request
+        db=db,
+        quest_id=quest_id,
+        user_quest=user_quest,
+        request=request,
+        expected_versions=parse_if_match(if_match),
     )
     if not quest:
+        if err == DbError.QUEST_VERSION_MISMATCH_ERROR.value:
+            raise HTTPException(status_code=412, detail=err)
+        if err == DbError.QUEST_ARCHIVED_ERROR.value:
+            raise HTTPException(status_code=409, detail=err)
         raise HTTPException(status_code=404, detail=err)
-    return JSONResponse(status_code=200, content={"quest": quest})
+    return ApiResponse(
+        status_code=200,
+        content={"quest": quest},
+        headers={"ETag": representation_etag(quest_etag(quest))},
+    )
 
 
 @router.delete("/{quest_id}")
@@ -99,21 +168,25 @@ async def delete_quest(quest_id: str, db: MongoClient = Depends(get_db_connectio
         raise HTTPException(
             status_code=404, detail="Quest not found or already deleted"
         )
-    return JSONResponse(status_code=200, content={"message": "Quest deleted"})
+    return ApiResponse(status_code=200, content={"message": "Quest deleted"})
 
 
 @router.post("/{quest_id}/apply")
 async def apply_to_quest(
-    quest_id: str, request: Request, db: MongoClient = Depends(get_db_connection)
+    quest_id: str,
+    request: Request,
+    idempotency_key: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
 ):
-    quest, err = crud_quests.add_applicant_to_quest_db(
-        db=db, quest_id=quest_id, request=request
-    )
-    if not quest:
-        raise HTTPException(status_code=404, detail=str(err))
-    return JSONResponse(
-        status_code=200, content={"message": "Applied to quest", "data": quest}
-    )
+    def apply():
+        quest, err = crud_quests.add_applicant_to_quest_db(
+            db=db, quest_id=quest_id, request=request
+        )
+        if not quest:
+            raise HTTPException(status_code=404, detail=str(err))
+        return 200, {"message": "Applied to quest", "data": quest}
+
+    return run_idempotent(request, db, idempotency_key, {"quest_id": quest_id}, apply)
 
 
 @router.post("/{quest_id}/close")
@@ -123,6 +196,6 @@ async def close_quest(
     quest, err = crud_quests.close_quest_db(db=db, quest_id=quest_id, request=request)
     if not quest:
         raise HTTPException(status_code=404, detail=str(err))
-    return JSONResponse(
+    return ApiResponse(
         status_code=200, content={"message": "Quest closed", "data": quest}
     )
@@ -1,22 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header
 from db.database import get_db_connection
+from db.topic_cache import topic_cache
 from pymongo import MongoClient
+from .etags import conditional_response, content_etag
 
 router = APIRouter()
 
 
 @router.get("")
-async def get_topics(db: MongoClient = Depends(get_db_connection)):
+async def get_topics(
+    if_none_match: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
+):
     """
     Get all topics
 
     Returns:
-            JSONResponse: List of topics
+            ApiResponse: List of topics, or 304 when unchanged
     """
-
-    topics_collection = db["topics"]
-    topics = topics_collection.find()
-    if not topics:
-        raise HTTPException(status_code=404, detail="Topics not found")
-    return JSONResponse(content={"topics": [topic["name"] for topic in topics]})
+    content = {"topics": topic_cache.names(db)}
+    return conditional_response(content, content_etag(content), if_none_match)
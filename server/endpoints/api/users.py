@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
 from db.database import get_db_connection
 from db.crud import crud_users
 from pymongo import MongoClient
+from .etags import conditional_response, content_etag
+from .negotiation import ApiResponse
 
 router = APIRouter()
 
@@ -11,18 +12,23 @@ router = APIRouter()
 async def get_users(db: MongoClient = Depends(get_db_connection)):
     users = crud_users.get_users_db(db)
     if not users:
-        return JSONResponse(
+        return ApiResponse(
             status_code=404, content={"users": [], "message": "No users found"}
         )
-    return JSONResponse(status_code=200, content={"users": users})
+    return ApiResponse(status_code=200, content={"users": users})
 
 
 @router.get("/{user_id}")
-async def get_user(user_id: str, db: MongoClient = Depends(get_db_connection)):
+async def get_user(
+    user_id: str,
+    if_none_match: str | None = Header(None),
+    db: MongoClient = Depends(get_db_connection),
+):
     user = crud_users.get_user_by_id_db(db=db, user_id=user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return JSONResponse(status_code=200, content={"user": user})
+    content = {"user": user}
+    return conditional_response(content, content_etag(content), if_none_match)
 
 
 @router.delete("/{user_id}")
@@ -32,4 +38,4 @@ async def delete_user(
     success = crud_users.delete_user_by_id_db(db=db, user_id=user_id, request=request)
     if not success:
         raise HTTPException(status_code=404, detail="User not found or already deleted")
-    return JSONResponse(status_code=200, content={"message": "User deleted"})
+    return ApiResponse(status_code=200, content={"message": "User deleted"})
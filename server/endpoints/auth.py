@@ -162,7 +162,6 @@ async def get_me(request: Request, db: MongoClient = Depends(get_db_connection))
     users_collection = db["users"]
 
     auth_token = request.cookies.get("auth_token")
-    print(auth_token)
     if not auth_token:
         raise HTTPException(status_code=401, detail="No authentication token found")
 
@@ -175,7 +174,6 @@ async def get_me(request: Request, db: MongoClient = Depends(get_db_connection))
     db_cookie = cookies_collection.find_one(
         {"username": username, "cookie": auth_token}
     )
-    print(db_cookie)
     if not db_cookie:
         raise HTTPException(
             status_code=401, detail="Invalid or expired authentication token"
@@ -0,0 +1,45 @@
+import asyncio
+import os
+from fastapi import APIRouter, Request
+from fastapi.responses import JSONResponse
+from db.database import get_db_connection
+from warmup import warmup_state
+
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", 2))
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+async def healthz():
+    """
+    Liveness probe
+
+    Unauthenticated and without database access: it only shows that the
+    worker's event loop answers.
+    """
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+async def readyz(request: Request):
+    """
+    Readiness probe
+
+    Unauthenticated. Ready once the warm-up finished and while the database
+    answers a ping within READINESS_TIMEOUT_SECONDS.
+
+    Returns:
+            JSONResponse: 200 when ready, 503 with the failing check otherwise
+    """
+    if not warmup_state["complete"]:
+        return JSONResponse({"status": "warming up"}, status_code=503)
+
+    db = getattr(request.app.state, "db", None) or get_db_connection()
+    try:
+        await asyncio.wait_for(
+            asyncio.to_thread(db.command, "ping"), READINESS_TIMEOUT_SECONDS
+        )
+    except Exception:
+        return JSONResponse({"status": "database unreachable"}, status_code=503)
+    return {"status": "ready", "warmup_seconds": warmup_state["seconds"]}
@@ -0,0 +1,66 @@
+"""
+Gunicorn configuration for production: several Uvicorn workers behind one
+master process.
+
+Usage (from the server directory):
+
+    gunicorn -c gunicorn.conf.py server:app
+
+The master applies the pending migrations once before the workers are
+forked. The background migrations are left to the workers, where one of them
+applies them after startup.
+"""
+
+import multiprocessing
+import os
+from uvicorn_worker import UvicornWorker
+
+bind = f"{os.getenv('SERVER_HOST', '0.0.0.0')}:{os.getenv('SERVER_PORT', 8000)}"
+workers = int(os.getenv("SERVER_WORKERS") or multiprocessing.cpu_count())
+# Pending connections the kernel queues before refusing new ones
+backlog = int(os.getenv("SERVER_BACKLOG", 2048))
+keepalive = int(os.getenv("SERVER_KEEPALIVE_SECONDS", 5))
+# Restart a worker after this many requests (0 disables), the jitter keeps the
+# workers from restarting all at once
+max_requests = int(os.getenv("SERVER_MAX_REQUESTS", 10_000))
+max_requests_jitter = int(os.getenv("SERVER_MAX_REQUESTS_JITTER", 1000))
+# Time a stopping worker gets to finish its requests before it is killed
+graceful_timeout = int(os.getenv("SERVER_GRACEFUL_TIMEOUT_SECONDS", 30))
+# A worker not notifying the master for this long is restarted
+timeout = int(os.getenv("SERVER_WORKER_TIMEOUT_SECONDS", 60))
+
+SERVER_LOOP = os.getenv("SERVER_LOOP", "auto")
+SERVER_HTTP = os.getenv("SERVER_HTTP", "auto")
+SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() == "true"
+
+# Leave logging to setup_logging; requests are logged by timing_middleware
+accesslog = None
+
+
+class ServerWorker(UvicornWorker):
+    """
+    Uvicorn worker with the event loop and HTTP parser chosen by SERVER_LOOP
+    ("auto", "asyncio" or "uvloop") and SERVER_HTTP ("auto", "h11" or
+    "httptools"). "auto" picks uvloop and httptools when they are installed.
+    """
+
+    CONFIG_KWARGS = {
+        "loop": SERVER_LOOP,
+        "http": SERVER_HTTP,
+        "timeout_graceful_shutdown": graceful_timeout,
+    }
+
+
+worker_class = ServerWorker
+
+
+def on_starting(server):
+    """Apply the pending migrations once, before any worker starts."""
+    if not SCHEMA_BOOTSTRAP:
+        return
+    from db.database import close_client, get_db_connection
+    from db.migrations import apply_migrations
+
+    apply_migrations(get_db_connection(), include_background=False)
+    # MongoClient is not fork-safe, each worker opens its own
+    close_client()
@@ -0,0 +1,140 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+# Per-module levels, e.g. "db.monitoring=WARNING,endpoints.api=DEBUG"
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json").lower()
+# Fraction of successful requests getting a request log line
+REQUEST_LOG_SAMPLE_RATE = float(os.getenv("REQUEST_LOG_SAMPLE_RATE", 0.1))
+# Requests slower than this are always logged
+REQUEST_LOG_SLOW_MS = float(os.getenv("REQUEST_LOG_SLOW_MS", 1000))
+
+# Attributes every LogRecord has, everything else was passed with extra=
+RESERVED_ATTRIBUTES = frozenset(
+    vars(logging.LogRecord("", 0, "", 0, "", None, None)).keys()
+) | {"message", "asctime", "taskName"}
+
+_listener: QueueListener | None = None
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Format records as one JSON object per line
+
+    Fields passed with extra= are added to the object, so request logs can be
+    queried by field instead of parsing messages.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in RESERVED_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    Queue handler that leaves formatting to the writer thread
+
+    The standard QueueHandler fully formats the record in the logging thread.
+    Here only the message is merged with its arguments, so arguments mutated
+    by the caller afterwards are not rendered, and the traceback is rendered
+    because its frames do not outlive the exception handler. Building the JSON
+    line is left to the listener, off the event loop.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+
+def parse_log_levels(levels: str) -> dict[str, str]:
+    """
+    Parse LOG_LEVELS into {logger name: level}
+
+    Args:
+            levels (str): Comma separated "logger=LEVEL" pairs
+
+    Returns:
+            dict[str, str]: Level of every listed logger
+    """
+    parsed = {}
+    for pair in levels.split(","):
+        name, _, level = pair.partition("=")
+        if name.strip() and level.strip():
+            parsed[name.strip()] = level.strip().upper()
+    return parsed
+
+
+def setup_logging():
+    """
+    Route all logging through a queue drained by a background writer thread
+
+    Logging calls only enqueue the record, so writing to stdout never blocks
+    request handling. Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    if LOG_FORMAT == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(
+            logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+        )
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DeferredQueueHandler(log_queue))
+    root.setLevel(LOG_LEVEL)
+    for name, level in parse_log_levels(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging():
+    """Flush the queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def should_log_request(status_code: int, total_ms: float) -> bool:
+    """
+    Decide whether a request gets a request log line
+
+    Server errors and slow requests are always logged, other requests are
+    sampled at REQUEST_LOG_SAMPLE_RATE.
+    """
+    if status_code >= 500 or total_ms >= REQUEST_LOG_SLOW_MS:
+        return True
+    return random.random() < REQUEST_LOG_SAMPLE_RATE
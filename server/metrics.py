@@ -0,0 +1,414 @@
+import functools
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+def format_labels(labelnames: tuple, labelvalues: tuple, extra: str = "") -> str:
+    """Format label pairs in the Prometheus text exposition format."""
+    pairs = [
+        f'{name}="{escape_label_value(value)}"'
+        for name, value in zip(labelnames, labelvalues)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape_label_value(value) -> str:
+    return str(value).replace("\\", r"\\").replace("\n", r"\n").replace('"', r"\"")
+
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class Metric:
+    """
+    Base class of labelled metrics
+
+    Children are created once per label combination and can be kept by callers
+    so recording a value on the hot path is a lock and an addition.
+    """
+
+    metric_type = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: dict[tuple, object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    def labels(self, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _samples(self, extra: str):
+        raise NotImplementedError
+
+    def render(self, extra: str = "") -> list[str]:
+        """
+        Render the metric in the Prometheus text exposition format
+
+        Args:
+                extra (str): Formatted label pair added to every sample
+
+        Returns:
+                list[str]: Lines of the metric
+        """
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.metric_type}",
+        ]
+        lines.extend(self._samples(extra))
+        return lines
+
+
+class CounterChild:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self.value += amount
+
+    def set_total(self, value: float):
+        """Mirror a cumulative count kept elsewhere, such as gc.get_stats()."""
+        with self._lock:
+            self.value = max(self.value, value)
+
+
+class Counter(Metric):
+    metric_type = "counter"
+
+    def _new_child(self):
+        return CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def _samples(self, extra: str):
+        return [
+            f"{self.name}{format_labels(self.labelnames, key, extra)} "
+            f"{format_value(child.value)}"
+            for key, child in list(self._children.items())
+        ]
+
+
+class GaugeChild(CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Gauge(Counter):
+    metric_type = "gauge"
+
+    def _new_child(self):
+        return GaugeChild()
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+
+class HistogramChild:
+    __slots__ = ("_lock", "buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple):
+        self._lock = threading.Lock()
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.counts):
+                self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def time(self):
+        return HistogramTimer(self)
+
+
+class HistogramTimer:
+    __slots__ = ("child", "started")
+
+    def __init__(self, child: HistogramChild):
+        self.child = child
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.child.observe(time.perf_counter() - self.started)
+
+
+class Histogram(Metric):
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple = (),
+        buckets: tuple = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def _samples(self, extra: str):
+        lines = []
+        for key, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = ",".join(filter(None, (f'le="{bound}"', extra)))
+                labels = format_labels(self.labelnames, key, le)
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            le = ",".join(filter(None, ('le="+Inf"', extra)))
+            labels = format_labels(self.labelnames, key, le)
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            labels = format_labels(self.labelnames, key, extra)
+            lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format
+
+        Every worker process keeps its own registry, and a scrape reaches any
+        one of them. Samples are labelled with the worker's pid, so each
+        worker's series stays monotonic. Aggregate with sum without (pid).
+        """
+        extra = f'pid="{os.getpid()}"'
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.extend(metric.render(extra))
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+http_requests_total = registry.register(
+    Counter(
+        "http_requests_total",
+        "HTTP requests handled, by route template and status",
+        ("method", "route", "status"),
+    )
+)
+http_requests_in_flight = registry.register(
+    Gauge("http_requests_in_flight", "HTTP requests currently being handled")
+)
+http_request_duration_seconds = registry.register(
+    Histogram(
+        "http_request_duration_seconds",
+        "HTTP request latency, by route template",
+        ("method", "route"),
+    )
+)
+db_function_duration_seconds = registry.register(
+    Histogram(
+        "db_function_duration_seconds",
+        "Latency of CRUD functions, including all their MongoDB operations",
+        ("function",),
+    )
+)
+cache_requests_total = registry.register(
+    Counter(
+        "cache_requests_total",
+        "Cache lookups, by cache and result (hit or miss)",
+        ("cache", "result"),
+    )
+)
+compressed_response_bytes_total = registry.register(
+    Counter(
+        "compressed_response_bytes_total",
+        "Size of compressed responses, by encoding and body (original or compressed)",
+        ("encoding", "body"),
+    )
+)
+single_flight_requests_total = registry.register(
+    Counter(
+        "single_flight_requests_total",
+        "Coalesced reads, by flight and role: leader (ran the read), follower "
+        "(joined a leader's read) or timeout (follower that stopped waiting)",
+        ("flight", "role"),
+    )
+)
+mongodb_command_duration_seconds = registry.register(
+    Histogram(
+        "mongodb_command_duration_seconds",
+        "MongoDB command latency, by command and collection",
+        ("command", "collection"),
+    )
+)
+mongodb_pool_events_total = registry.register(
+    Counter(
+        "mongodb_pool_events_total",
+        "MongoDB connection pool events",
+        ("event",),
+    )
+)
+mongodb_pool_connections = registry.register(
+    Gauge("mongodb_pool_connections", "Open MongoDB connections in the pool")
+)
+mongodb_pool_checked_out = registry.register(
+    Gauge(
+        "mongodb_pool_checked_out_connections",
+        "MongoDB connections currently checked out of the pool",
+    )
+)
+scheduler_job_runs_total = registry.register(
+    Counter("scheduler_job_runs_total", "Background job runs", ("job",))
+)
+scheduler_job_duration_seconds = registry.register(
+    Histogram(
+        "scheduler_job_duration_seconds",
+        "Background job run duration",
+        ("job",),
+        buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0),
+    )
+)
+scheduler_job_result = registry.register(
+    Gauge(
+        "scheduler_job_result",
+        "Values reported by the last run of a background job, such as the "
+        "batch size, lag behind deadlines and collection sizes",
+        ("job", "field"),
+    )
+)
+
+profiles_total = registry.register(
+    Counter(
+        "profiles_total",
+        "Requests profiled on demand, by result (written or rate_limited)",
+        ("result",),
+    )
+)
+
+process_resident_memory_bytes = registry.register(
+    Gauge("process_resident_memory_bytes", "Resident set size of the worker")
+)
+process_peak_resident_memory_bytes = registry.register(
+    Gauge("process_peak_resident_memory_bytes", "Peak resident set size of the worker")
+)
+python_gc_allocations_since_collection = registry.register(
+    Gauge(
+        "python_gc_allocations_since_collection",
+        "Garbage collector counts since the generation's last collection: net "
+        "allocations for generation 0, younger collections for the others",
+        ("generation",),
+    )
+)
+python_gc_collections_total = registry.register(
+    Counter(
+        "python_gc_collections_total",
+        "Garbage collections run since start, by generation",
+        ("generation",),
+    )
+)
+python_gc_objects_collected_total = registry.register(
+    Counter(
+        "python_gc_objects_collected_total",
+        "Objects collected by the garbage collector since start, by generation",
+        ("generation",),
+    )
+)
+python_gc_objects_uncollectable_total = registry.register(
+    Counter(
+        "python_gc_objects_uncollectable_total",
+        "Uncollectable objects found since start, by generation",
+        ("generation",),
+    )
+)
+tracemalloc_traced_memory_bytes = registry.register(
+    Gauge(
+        "tracemalloc_traced_memory_bytes",
+        "Memory allocated by Python and traced by tracemalloc, 0 when not tracing",
+    )
+)
+
+
+def record_cache_lookup(cache: str, hit: bool):
+    """Count a cache hit or miss."""
+    cache_requests_total.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+def track_db_function(func):
+    """
+    Decorator observing the duration of a CRUD function in
+    db_function_duration_seconds
+    """
+    child = db_function_duration_seconds.labels(function=func.__name__)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            child.observe(time.perf_counter() - started)
+
+    return wrapper
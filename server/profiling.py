@@ -0,0 +1,354 @@
+import asyncio
+import gc
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, OrderedDict, deque
+from datetime import datetime, timezone
+from metrics import (
+    process_peak_resident_memory_bytes,
+    process_resident_memory_bytes,
+    python_gc_allocations_since_collection,
+    python_gc_collections_total,
+    python_gc_objects_collected_total,
+    python_gc_objects_uncollectable_total,
+    tracemalloc_traced_memory_bytes,
+)
+
+try:
+    import resource
+except ImportError:
+    # Unix only, the peak RSS is then not sampled
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", 5))
+PROFILE_MAX_PER_MINUTE = int(os.getenv("PROFILE_MAX_PER_MINUTE", 6))
+# Samples cover the whole event loop thread, so overlapping profiles would
+# count each other's requests
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", 1))
+MEMORY_SNAPSHOTS_MAX = int(os.getenv("MEMORY_SNAPSHOTS_MAX", 5))
+MEMORY_SAMPLE_INTERVAL_SECONDS = float(os.getenv("MEMORY_SAMPLE_INTERVAL_SECONDS", 15))
+
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return (
+        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    )
+
+
+def collapse_stack(frame) -> str:
+    """
+    Collapse a stack into "outermost;...;innermost" frame labels
+
+    Args:
+            frame (FrameType): Innermost frame of the stack
+
+    Returns:
+            str: Stack in the collapsed format read by flame graph tools
+    """
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+
+class StackSampler:
+    """
+    Sampling profiler for one thread
+
+    A background thread records the stack of the profiled thread every
+    interval. The profiled code is not instrumented, so its overhead does not
+    depend on how many functions it calls.
+    """
+
+    def __init__(self, thread_id: int, interval_seconds: float):
+        self.thread_id = thread_id
+        self.interval_seconds = interval_seconds
+        self.stacks: Counter[str] = Counter()
+        self.samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="request-profiler", daemon=True
+        )
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_seconds):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            self.stacks[collapse_stack(frame)] += 1
+            self.samples += 1
+            del frame
+
+    def collapsed(self) -> str:
+        """Profile as "stack count" lines, the input format of flamegraph.pl."""
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.items())
+
+
+class ProfileRateLimiter:
+    """
+    Limit the number of profiles per minute and running at the same time
+    """
+
+    def __init__(self, max_per_minute: int, max_concurrent: int):
+        self.max_per_minute = max_per_minute
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._started: deque[float] = deque()
+        self._running = 0
+
+    def try_acquire(self) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            while self._started and now - self._started[0] >= 60:
+                self._started.popleft()
+            if len(self._started) >= self.max_per_minute:
+                return False
+            if self._running >= self.max_concurrent:
+                return False
+            self._started.append(now)
+            self._running += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self._running -= 1
+
+
+profile_rate_limiter = ProfileRateLimiter(
+    PROFILE_MAX_PER_MINUTE, PROFILE_MAX_CONCURRENT
+)
+
+
+def start_profile() -> StackSampler:
+    """Start sampling the calling thread."""
+    sampler = StackSampler(threading.get_ident(), PROFILE_INTERVAL_MS / 1000)
+    sampler.start()
+    return sampler
+
+
+def write_profile(sampler: StackSampler, method: str, path: str) -> str:
+    """
+    Write a finished profile to PROFILE_DIR
+
+    Args:
+            sampler (StackSampler): Stopped sampler
+            method (str): Method of the profiled request
+            path (str): Path of the profiled request
+
+    Returns:
+            str: Name of the written file
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    timestamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    slug = re.sub(r"[^A-Za-z0-9]+", "_", path).strip("_") or "root"
+    filename = f"{timestamp}-{method}-{slug}.collapsed"
+    with open(os.path.join(PROFILE_DIR, filename), "w") as file:
+        file.write(sampler.collapsed())
+    return filename
+
+
+class MemoryProfiler:
+    """
+    Tracemalloc control with a bounded set of numbered snapshots
+
+    Tracing slows allocations down and uses memory of its own, so it only runs
+    between start() and stop(). The oldest snapshots are dropped beyond
+    max_snapshots.
+    """
+
+    # Allocations of the profiler itself
+    IGNORED_FILES = (tracemalloc.__file__, "<frozen importlib._bootstrap>")
+
+    def __init__(self, max_snapshots: int):
+        self.max_snapshots = max_snapshots
+        self._lock = threading.Lock()
+        self._snapshots: OrderedDict[int, tuple[str, tracemalloc.Snapshot]] = (
+            OrderedDict()
+        )
+        self._next_id = 1
+
+    def start(self, frames: int):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+
+    def stop(self):
+        tracemalloc.stop()
+        with self._lock:
+            self._snapshots.clear()
+
+    def status(self) -> dict:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [
+                {"id": snapshot_id, "taken_at": taken_at}
+                for snapshot_id, (taken_at, _) in self._snapshots.items()
+            ]
+        return {
+            "tracing": tracing,
+            "frames": tracemalloc.get_traceback_limit() if tracing else 0,
+            "traced_bytes": current,
+            "traced_peak_bytes": peak,
+            "snapshots": snapshots,
+        }
+
+    def take_snapshot(self) -> int:
+        """
+        Take a snapshot of the traced allocations
+
+        Returns:
+                int: Snapshot id
+
+        Raises:
+                RuntimeError: Tracemalloc is not tracing
+        """
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("tracemalloc is not tracing")
+        snapshot = tracemalloc.take_snapshot().filter_traces(
+            [tracemalloc.Filter(False, filename) for filename in self.IGNORED_FILES]
+        )
+        taken_at = datetime.now(timezone.utc).isoformat()
+        with self._lock:
+            snapshot_id = self._next_id
+            self._next_id += 1
+            self._snapshots[snapshot_id] = (taken_at, snapshot)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popitem(last=False)
+        return snapshot_id
+
+    def _snapshot(self, snapshot_id: int) -> tracemalloc.Snapshot:
+        with self._lock:
+            return self._snapshots[snapshot_id][1]
+
+    def top(self, snapshot_id: int, limit: int, group_by: str) -> list[dict]:
+        """
+        Largest allocation sites of a snapshot
+
+        Args:
+                snapshot_id (int): Snapshot id
+                limit (int): Number of sites to return
+                group_by (str): "lineno", "filename" or "traceback"
+
+        Returns:
+                list[dict]: Sites with their size and number of blocks
+
+        Raises:
+                KeyError: Unknown snapshot id
+        """
+        statistics = self._snapshot(snapshot_id).statistics(group_by)
+        return [format_statistic(statistic) for statistic in statistics[:limit]]
+
+    def diff(
+        self, snapshot_id: int, base_id: int, limit: int, group_by: str
+    ) -> list[dict]:
+        """
+        Allocation sites that grew the most between two snapshots
+
+        Args:
+                snapshot_id (int): Newer snapshot id
+                base_id (int): Older snapshot id
+
+        Returns:
+                list[dict]: Sites with their size, blocks and growth since base
+
+        Raises:
+                KeyError: Unknown snapshot id
+        """
+        statistics = self._snapshot(snapshot_id).compare_to(
+            self._snapshot(base_id), group_by
+        )
+        return [
+            {
+                **format_statistic(statistic),
+                "size_diff_bytes": statistic.size_diff,
+                "count_diff": statistic.count_diff,
+            }
+            for statistic in statistics[:limit]
+        ]
+
+
+def format_statistic(statistic) -> dict:
+    return {
+        "location": [
+            f"{frame.filename}:{frame.lineno}" for frame in statistic.traceback
+        ],
+        "size_bytes": statistic.size,
+        "count": statistic.count,
+    }
+
+
+memory_profiler = MemoryProfiler(MEMORY_SNAPSHOTS_MAX)
+
+
+def resident_memory_bytes() -> int | None:
+    """Current resident set size, None where /proc is not available."""
+    try:
+        with open("/proc/self/statm") as statm:
+            resident_pages = int(statm.read().split()[1])
+    except (OSError, IndexError, ValueError):
+        return None
+    return resident_pages * os.sysconf("SC_PAGE_SIZE")
+
+
+def sample_memory_stats():
+    """Record the worker's RSS, garbage collector and tracemalloc stats."""
+    resident = resident_memory_bytes()
+    if resident is not None:
+        process_resident_memory_bytes.set(resident)
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        process_peak_resident_memory_bytes.set(
+            peak if sys.platform == "darwin" else peak * 1024
+        )
+
+    for generation, (count, stats) in enumerate(zip(gc.get_count(), gc.get_stats())):
+        labels = {"generation": generation}
+        python_gc_allocations_since_collection.labels(**labels).set(count)
+        python_gc_collections_total.labels(**labels).set_total(stats["collections"])
+        python_gc_objects_collected_total.labels(**labels).set_total(stats["collected"])
+        python_gc_objects_uncollectable_total.labels(**labels).set_total(
+            stats["uncollectable"]
+        )
+    tracemalloc_traced_memory_bytes.set(
+        tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else 0
+    )
+
+
+async def run_memory_sampler(interval: float):
+    """Sample the memory stats every interval seconds until cancelled."""
+    while True:
+        try:
+            sample_memory_stats()
+        except Exception:
+            logger.exception("Sampling memory stats failed")
+        await asyncio.sleep(interval)
+
+
+def start_memory_sampler() -> asyncio.Task | None:
+    """
+    Start the memory stats sampler
+
+    Returns:
+            asyncio.Task | None: Task to cancel on shutdown, None when disabled
+    """
+    if MEMORY_SAMPLE_INTERVAL_SECONDS <= 0:
+        return None
+    return asyncio.create_task(run_memory_sampler(MEMORY_SAMPLE_INTERVAL_SECONDS))
@@ -1,24 +1,86 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from db.database import get_db_connection
 import uvicorn
 from endpoints.auth import router as auth_router
 from endpoints.api import router as api_router
-from db.database import create_tables
+from endpoints.metrics import router as metrics_router
+from endpoints.admin import router as admin_router
+from endpoints.health import router as health_router
+from db.migrations import start_migrations
+from db.events import quest_events, start_change_stream
+from db.quest_cache import quest_cache
+from db.scheduler import start_scheduler
+from db.instrumentation import RequestStats, request_stats
+from metrics import (
+    http_request_duration_seconds,
+    http_requests_in_flight,
+    http_requests_total,
+    profiles_total,
+)
+from logging_config import setup_logging, should_log_request
+from endpoints.admin import is_admin_token
+from profiling import (
+    profile_rate_limiter,
+    start_memory_sampler,
+    start_profile,
+    write_profile,
+)
+from warmup import warm_up
+from endpoints.api.compression import (
+    COMPRESSION_MIN_BYTES,
+    choose_encoding,
+    compress_body,
+    encoded_etag,
+    is_compressible,
+)
+from db.read_routing import (
+    READ_AFTER_COOKIE,
+    READ_YOUR_WRITES_SECONDS,
+    end_causal_session,
+    format_read_after,
+    parse_read_after,
+    read_after,
+    start_causal_session,
+)
 from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
 import time
 
-logging.basicConfig(level=logging.INFO)
+setup_logging()
 logger = logging.getLogger(__name__)
 
+# Off when the migrations are applied separately, with python -m db.migrations
+SCHEMA_BOOTSTRAP = os.getenv("SCHEMA_BOOTSTRAP", "true").lower() == "true"
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    create_tables()
+    db = get_db_connection()
+    migrations = start_migrations(db) if SCHEMA_BOOTSTRAP else None
+    change_stream = start_change_stream(db)
+    if change_stream:
+        # The change stream also sees the quest writes of other workers
+        quest_events.add_listener(quest_cache.on_quest_event)
+    scheduled_jobs = start_scheduler(db)
+    memory_sampler = start_memory_sampler()
+    # Workers only accept connections once the lifespan started, so this
+    # keeps cold workers out of rotation
+    await warm_up(app, db)
     yield
     logger.info("Shutting down application.")
+    for job in scheduled_jobs:
+        job.cancel()
+    if memory_sampler:
+        memory_sampler.cancel()
+    if migrations:
+        migrations.cancel()
+    if change_stream:
+        change_stream.set()
+        quest_events.remove_listener(quest_cache.on_quest_event)
 
 
 app = FastAPI(lifespan=lifespan)
@@ -45,25 +107,112 @@ def authenticate_user(db, auth_token: str) -> str | None:
         str | None: Username if authenticated, None otherwise
     """
     cookies_collection = db["cookies"]
-    logger.info(f"Authenticating user with token: {auth_token}")
-    time.sleep(0.1)
     db_cookie = cookies_collection.find_one({"cookie": auth_token})
-    logger.info(f"Found cookie: {db_cookie}")
     return db_cookie["username"] if db_cookie else None
 
 
+@app.middleware("http")
+async def compression_middleware(request: Request, call_next):
+    """
+    Middleware compressing the quest and user responses with brotli or gzip.
+
+    Only bodies of at least COMPRESSION_MIN_BYTES are compressed, and their
+    ETag gets the encoding as suffix. Compressed bodies are cached by the
+    digest of the uncompressed body, so a response served many times is
+    compressed once. Registered first, so it wraps the endpoints only.
+    """
+    response = await call_next(request)
+    if not is_compressible(request.url.path, response.headers.get("content-type")):
+        return response
+    response.headers.append("Vary", "Accept-Encoding")
+    encoding = choose_encoding(request.headers.get("accept-encoding"))
+    if encoding is None or "content-encoding" in response.headers:
+        return response
+    etag = response.headers.get("etag")
+    # 304 Not Modified has no body, it confirms the ETag the client sent
+    if response.status_code == 304:
+        if_none_match = request.headers.get("if-none-match", "")
+        if etag and encoded_etag(etag, encoding) in if_none_match:
+            response.headers["ETag"] = encoded_etag(etag, encoding)
+        return response
+
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    if len(body) >= COMPRESSION_MIN_BYTES:
+        body = compress_body(body, encoding)
+        response.headers["Content-Encoding"] = encoding
+        if etag:
+            response.headers["ETag"] = encoded_etag(etag, encoding)
+    response.headers["Content-Length"] = str(len(body))
+    compressed_response = Response(
+        body, status_code=response.status_code, background=response.background
+    )
+    # Raw headers keep repeated ones, such as several Set-Cookie
+    compressed_response.raw_headers = response.raw_headers
+    return compressed_response
+
+
+WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
+
+
+@app.middleware("http")
+async def read_your_writes_middleware(request: Request, call_next):
+    """
+    Middleware letting users read their own writes despite secondary reads.
+
+    Writes run in a causally consistent session, and the response sets a
+    read_after cookie holding the operation time of the write. Requests with
+    that cookie read from the primary, in a session that waits for that
+    operation time. Registered before authenticate_middleware, so it only
+    runs for authenticated requests.
+    """
+    operation_time = parse_read_after(request.cookies.get(READ_AFTER_COOKIE))
+    is_write = request.method in WRITE_METHODS
+    if not is_write and operation_time is None:
+        return await call_next(request)
+
+    token = read_after.set(operation_time)
+    db = getattr(request.app.state, "db", None) or get_db_connection()
+    session = start_causal_session(db.client, operation_time)
+    try:
+        response = await call_next(request)
+    finally:
+        read_after.reset(token)
+        write_time = end_causal_session(session) if session else None
+
+    if is_write and write_time is not None and response.status_code < 400:
+        response.set_cookie(
+            READ_AFTER_COOKIE,
+            format_read_after(write_time),
+            max_age=READ_YOUR_WRITES_SECONDS,
+            httponly=True,
+            samesite="lax",
+        )
+    return response
+
+
 @app.middleware("http")
 async def authenticate_middleware(request: Request, call_next):
     """
     Middleware to authenticate users based on an auth token in cookies.
     """
-    allowed_unauthenticated_paths = ["/auth", "/docs", "redoc", "/openapi.json"]
+    allowed_unauthenticated_paths = [
+        "/auth",
+        "/docs",
+        "redoc",
+        "/openapi.json",
+        "/metrics",
+        "/healthz",
+        "/readyz",
+    ]
     if request.url.path in allowed_unauthenticated_paths:
         return await call_next(request)
+    # Admin routes are authenticated with their own token
+    if request.url.path.startswith("/admin/"):
+        return await call_next(request)
 
     auth_token = request.cookies.get("auth_token")
     if not auth_token:
-        logger.error("No authentication token found")
+        logger.debug("No authentication token found")
         return JSONResponse({"error": "No authentication token found"}, status_code=401)
 
     try:
@@ -72,10 +221,14 @@ async def authenticate_middleware(request: Request, call_next):
             if hasattr(request.app.state, "db")
             else get_db_connection()
         )
-        username = authenticate_user(db, auth_token)
-        logger.info(f"Authenticated user: {username}")
+        auth_started = time.perf_counter()
+        # Off the event loop, so other requests progress during the lookup
+        username = await asyncio.to_thread(authenticate_user, db, auth_token)
+        stats = request_stats.get()
+        if stats is not None:
+            stats.auth_seconds += time.perf_counter() - auth_started
         if not username:
-            logger.error("Invalid authentication token")
+            logger.debug("Invalid authentication token")
             return JSONResponse(
                 {"error": "Invalid authentication token"}, status_code=401
             )
@@ -86,9 +239,113 @@ async def authenticate_middleware(request: Request, call_next):
     return await call_next(request)
 
 
+@app.middleware("http")
+async def timing_middleware(request: Request, call_next):
+    """
+    Middleware measuring where the time of each request goes.
+
+    Registered after authenticate_middleware so it wraps it and includes the
+    authentication time. Emits a Server-Timing header and, for a sample of
+    requests, a structured log line with the total, auth, MongoDB and
+    serialization times and the number of MongoDB operations.
+    """
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    http_requests_in_flight.inc()
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    finally:
+        request_stats.reset(token)
+        http_requests_in_flight.dec()
+    total_seconds = time.perf_counter() - started
+
+    response.headers["Server-Timing"] = stats.server_timing(total_seconds)
+    route = request.scope.get("route")
+    # Label by route template, not by path, to keep the number of series bounded
+    route_label = route.path if route else "unmatched"
+    http_requests_total.labels(
+        method=request.method, route=route_label, status=response.status_code
+    ).inc()
+    http_request_duration_seconds.labels(
+        method=request.method, route=route_label
+    ).observe(total_seconds)
+    total_ms = total_seconds * 1000
+    if logger.isEnabledFor(logging.INFO) and should_log_request(
+        response.status_code, total_ms
+    ):
+        logger.info(
+            "%s %s %s",
+            request.method,
+            request.url.path,
+            response.status_code,
+            extra={
+                "route": route.path if route else None,
+                "status": response.status_code,
+                "total_ms": round(total_ms, 2),
+                "auth_ms": round(stats.auth_seconds * 1000, 2),
+                "db_ms": round(stats.db_seconds * 1000, 2),
+                "db_ops": stats.db_operations,
+                "serialize_ms": round(stats.serialize_seconds * 1000, 2),
+            },
+        )
+    return response
+
+
+@app.middleware("http")
+async def profiling_middleware(request: Request, call_next):
+    """
+    Middleware profiling single requests on demand.
+
+    Requests sending a valid X-Admin-Token along with an "X-Profile: 1" header
+    or a "profile=1" query parameter run under a sampling profiler. The profile
+    is written to PROFILE_DIR in the collapsed stack format of flame graph
+    tools and its file name returned in the X-Profile header. Registered last
+    so the profile covers every other middleware.
+    """
+    wants_profile = "1" in (
+        request.headers.get("x-profile"),
+        request.query_params.get("profile"),
+    )
+    if not wants_profile or not is_admin_token(request.headers.get("x-admin-token")):
+        return await call_next(request)
+    if not profile_rate_limiter.try_acquire():
+        profiles_total.labels(result="rate_limited").inc()
+        response = await call_next(request)
+        response.headers["X-Profile"] = "rate-limited"
+        return response
+
+    try:
+        sampler = start_profile()
+        try:
+            response = await call_next(request)
+        finally:
+            sampler.stop()
+        filename = await asyncio.to_thread(
+            write_profile, sampler, request.method, request.url.path
+        )
+    finally:
+        profile_rate_limiter.release()
+    profiles_total.labels(result="written").inc()
+    logger.info("Profile written to %s (%d samples)", filename, sampler.samples)
+    response.headers["X-Profile"] = filename
+    return response
+
+
 # Include API routes
 app.include_router(auth_router, prefix="/auth")
 app.include_router(api_router, prefix="/api")
+app.include_router(metrics_router, prefix="/metrics")
+app.include_router(admin_router, prefix="/admin")
+app.include_router(health_router)
 
 if __name__ == "__main__":
-    uvicorn.run("server:app", host="0.0.0.0", port=8000, reload=True)
+    # Leave logging to setup_logging; requests are logged by timing_middleware
+    uvicorn.run(
+        "server:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=True,
+        log_config=None,
+        access_log=False,
+    )
@@ -1,8 +1,36 @@
+import re
 import pytest
 import mongomock
 from fastapi.testclient import TestClient
 from server import app
 from db.database import get_db_connection
+from db.instrumentation import InstrumentedDatabase
+from db.quest_cache import quest_cache
+from db.topic_cache import topic_cache
+from endpoints.api.compression import compressed_body_cache
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "query_budget(max_operations): most database operations a single request "
+        "made through the client fixture may issue",
+    )
+
+
+def db_operations(response) -> int:
+    """Number of database operations a request issued, from its Server-Timing."""
+    match = re.search(r'db;[^,]*desc="(\d+) ops"', response.headers["server-timing"])
+    return int(match.group(1))
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    """Every test gets its own database, so nothing cached may outlive it."""
+    yield
+    topic_cache.clear()
+    quest_cache.clear()
+    compressed_body_cache.clear()
 
 
 @pytest.fixture(scope="function")
@@ -14,7 +42,36 @@ def test_db():
 
 
 @pytest.fixture(scope="function")
-def client(test_db):
-    app.dependency_overrides[get_db_connection] = lambda: test_db
-    app.state.db = test_db
-    return TestClient(app)
+def client(test_db, request):
+    """
+    Test client counting the database operations of every request
+
+    Tests making requests must declare @pytest.mark.query_budget(n) and fail
+    when one of their requests issues more than n operations, so N+1 query
+    regressions show up in CI.
+    """
+    instrumented_db = InstrumentedDatabase(test_db)
+    app.dependency_overrides[get_db_connection] = lambda: instrumented_db
+    app.state.db = instrumented_db
+    test_client = TestClient(app)
+
+    operations = []
+
+    def record_operations(response):
+        endpoint = f"{response.request.method} {response.request.url.path}"
+        operations.append((endpoint, db_operations(response)))
+
+    test_client.event_hooks["response"].append(record_operations)
+    yield test_client
+
+    if not operations:
+        return
+    marker = request.node.get_closest_marker("query_budget")
+    if marker is None:
+        pytest.fail("Tests making requests need a @pytest.mark.query_budget(n)")
+    budget = marker.args[0]
+    over_budget = [
+        (endpoint, count) for endpoint, count in operations if count > budget
+    ]
+    if over_budget:
+        pytest.fail(f"Query budget of {budget} exceeded: {over_budget}")
@@ -0,0 +1,115 @@
+import asyncio
+from db.locks import acquire_lock
+from db.migrations import (
+    MIGRATION_LOCK,
+    apply_migrations,
+    create_collections,
+    get_schema_version,
+    index_quest_expiry,
+    require_quest_version,
+    schema_status,
+    start_migrations,
+)
+
+
+def make_migrations(calls):
+    def migration(name):
+        return lambda db: calls.append(name)
+
+    return [
+        (1, "first", migration("first"), False),
+        (2, "second", migration("second"), False),
+        (3, "slow_index", migration("slow_index"), True),
+    ]
+
+
+def test_apply_migrations_in_order(test_db):
+    calls = []
+
+    assert apply_migrations(test_db, make_migrations(calls)) == [1, 2, 3]
+    assert calls == ["first", "second", "slow_index"]
+    assert get_schema_version(test_db) == 3
+    applied = test_db["schema_migrations"].find_one()["applied"]
+    assert [migration["name"] for migration in applied] == calls
+
+    # Applied migrations are not applied again
+    assert apply_migrations(test_db, make_migrations(calls)) == []
+    assert len(calls) == 3
+
+
+def test_apply_migrations_stops_at_background(test_db):
+    calls = []
+
+    applied = apply_migrations(
+        test_db, make_migrations(calls), include_background=False
+    )
+
+    assert applied == [1, 2]
+    assert schema_status(test_db, make_migrations(calls)) == {
+        "version": 2,
+        "latest": 3,
+        "pending": ["slow_index"],
+    }
+
+
+def test_apply_migrations_locked(test_db):
+    calls = []
+    acquire_lock(test_db, MIGRATION_LOCK, 60, owner="other-worker")
+
+    assert apply_migrations(test_db, make_migrations(calls)) is None
+    assert calls == []
+
+
+def test_start_migrations(test_db):
+    calls = []
+
+    async def start():
+        task = start_migrations(test_db, make_migrations(calls))
+        # The blocking migrations are applied before start_migrations returns
+        assert calls == ["first", "second"]
+        await task
+
+    asyncio.run(start())
+    assert calls == ["first", "second", "slow_index"]
+    assert start_migrations(test_db, make_migrations(calls)) is None
+
+
+def test_require_quest_version_backfill(test_db):
+    test_db["quests"].insert_many([{"title": "Old"}, {"title": "New", "version": 4}])
+
+    # mongomock has no collMod, only check the backfill
+    test_db.command = lambda *args, **kwargs: None
+    require_quest_version(test_db)
+
+    versions = {quest["title"]: quest["version"] for quest in test_db["quests"].find()}
+    assert versions == {"Old": 0, "New": 4}
+
+
+def test_create_collections_keeps_existing(test_db):
+    test_db.create_collection("quests")
+    # mongomock has no validators, create the collections without them
+    create_collection = test_db.create_collection
+    test_db.create_collection = lambda name, **options: create_collection(name)
+
+    create_collections(test_db)
+
+    assert set(test_db.list_collection_names()) >= {
+        "users",
+        "cookies",
+        "topics",
+        "quests",
+        "quests_archive",
+        "idempotency_keys",
+    }
+    assert test_db["topics"].count_documents({}) == 10
+    # Existing collections are left to later migrations
+    assert list(test_db["quests"].index_information()) == ["_id_"]
+
+
+def test_index_quest_expiry(test_db):
+    test_db.create_collection("quests")
+
+    index_quest_expiry(test_db)
+
+    keys = [index["key"] for index in test_db["quests"].index_information().values()]
+    assert [("status", 1), ("deadline", 1)] in keys
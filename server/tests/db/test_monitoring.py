@@ -0,0 +1,72 @@
+from types import SimpleNamespace
+from db.monitoring import QueryMonitor, query_shape
+
+
+def command_events(request_id, command_name, command, duration_ms):
+    """
+    Build a started and a succeeded command event as pymongo would emit them
+    """
+    started = SimpleNamespace(
+        command_name=command_name,
+        command=command,
+        database_name="local_quest",
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+    )
+    succeeded = SimpleNamespace(
+        command_name=command_name,
+        duration_micros=duration_ms * 1000,
+        connection_id=("localhost", 27017),
+        request_id=request_id,
+    )
+    return started, succeeded
+
+
+def test_query_shape():
+    """
+    Test values are replaced while operators and nested queries are kept
+    """
+    shape = query_shape({"$or": [{"a": 1}, {"b": {"$in": [1, 2]}}], "status": "open"})
+
+    assert shape == {"$or": [{"a": "?"}, {"b": {"$in": "?"}}], "status": "?"}
+
+
+def test_query_monitor_groups_by_shape():
+    """
+    Test commands with different values are aggregated under one shape
+    """
+    monitor = QueryMonitor(slow_query_ms=50, explain=False)
+    for request_id, (cookie, duration) in enumerate([("a", 10), ("b", 100)]):
+        started, succeeded = command_events(
+            request_id,
+            "find",
+            {"find": "cookies", "filter": {"cookie": cookie}, "$db": "local_quest"},
+            duration,
+        )
+        monitor.started(started)
+        monitor.succeeded(succeeded)
+
+    started, succeeded = command_events(3, "find", {"find": "quests", "filter": {}}, 5)
+    monitor.started(started)
+    monitor.succeeded(succeeded)
+
+    top = monitor.top_shapes()
+
+    assert len(top) == 2
+    assert top[0]["shape"] == 'local_quest.cookies find {"cookie": "?"}'
+    assert top[0]["count"] == 2
+    assert top[0]["total_ms"] == 110
+    assert top[0]["avg_ms"] == 55
+    assert top[0]["slow_count"] == 1
+
+
+def test_query_monitor_ignores_housekeeping():
+    """
+    Test driver housekeeping commands are not recorded
+    """
+    monitor = QueryMonitor()
+    started, succeeded = command_events(1, "hello", {"hello": 1}, 1)
+    monitor.started(started)
+    monitor.succeeded(succeeded)
+
+    assert monitor.top_shapes() == []
@@ -0,0 +1,141 @@
+import asyncio
+from bson import ObjectId
+from bson.timestamp import Timestamp
+from db.quest_cache import QuestCache, filter_key
+from db.read_routing import read_after
+
+
+def get(method, *args):
+    return asyncio.run(method(*args))
+
+
+def get_list(cache, loader):
+    quests, _ = get(cache.get_list, "all", (), loader, len)
+    return quests
+
+
+class Loader:
+    def __init__(self, result):
+        self.result = result
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.result
+
+
+def test_cached_until_invalidated():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+    quest_id = ObjectId()
+    quests = Loader([{"_id": str(quest_id)}])
+    quest = Loader({"_id": str(quest_id)})
+    other_quest = Loader({"_id": "other"})
+
+    for _ in range(2):
+        assert get_list(cache, quests) == quests.result
+        assert get(cache.get_quest, str(quest_id), quest) == quest.result
+        get(cache.get_quest, "other", other_quest)
+    assert (quests.calls, quest.calls, other_quest.calls) == (1, 1, 1)
+
+    cache.invalidate_quest(quest_id)
+    get_list(cache, quests)
+    get(cache.get_quest, str(quest_id), quest)
+    get(cache.get_quest, "other", other_quest)
+
+    assert (quests.calls, quest.calls, other_quest.calls) == (2, 2, 1)
+
+
+def test_list_etag_cached_with_list():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+    etags = Loader('"etag"')
+
+    def etag(quests):
+        return etags()
+
+    for _ in range(2):
+        assert get(cache.get_list, "all", (), Loader([]), etag) == ([], '"etag"')
+    assert etags.calls == 1
+
+    cache.invalidate_lists()
+    get(cache.get_list, "all", (), Loader([]), etag)
+
+    assert etags.calls == 2
+
+
+def test_invalidate_lists_keeps_quests():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+    quests = Loader([])
+    quest = Loader({"_id": "a"})
+    get_list(cache, quests)
+    get(cache.get_quest, "a", quest)
+
+    cache.invalidate_lists()
+    get_list(cache, quests)
+    get(cache.get_quest, "a", quest)
+
+    assert (quests.calls, quest.calls) == (2, 1)
+
+
+def test_archive_event_drops_lists_only():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+    quests = Loader([{"_id": "a"}])
+    quest = Loader({"_id": "a"})
+    get_list(cache, quests)
+    get(cache.get_quest, "a", quest)
+
+    cache.on_quest_event({"type": "archive", "quest": {"_id": "a"}})
+    get_list(cache, quests)
+    get(cache.get_quest, "a", quest)
+
+    assert (quests.calls, quest.calls) == (2, 1)
+
+
+def test_write_during_load_is_not_cached():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+
+    def load_then_write():
+        cache.invalidate_quest("a")
+        return {"_id": "a", "version": 1}
+
+    get(cache.get_quest, "a", load_then_write)
+    fresh = Loader({"_id": "a", "version": 2})
+
+    assert get(cache.get_quest, "a", fresh)["version"] == 2
+
+
+def test_expiry_and_bounds():
+    cache = QuestCache(ttl_seconds=0, max_entries=10, max_quests=100)
+    quests = Loader([])
+    get_list(cache, quests)
+    get_list(cache, quests)
+    assert quests.calls == 2
+
+    cache = QuestCache(ttl_seconds=60, max_entries=2, max_quests=3)
+    for name in ("a", "b", "c"):
+        get(cache.get_quest, name, Loader({"_id": name}))
+    big = Loader([{}, {}, {}, {}])
+    get_list(cache, big)
+    get_list(cache, big)
+    first = Loader({"_id": "a"})
+    get(cache.get_quest, "a", first)
+
+    # Least recently used evicted, lists above max_quests never cached
+    assert (big.calls, first.calls) == (2, 1)
+    assert get(cache.get_quest, "c", Loader(None)) == {"_id": "c"}
+
+
+def test_bypassed_after_own_write():
+    cache = QuestCache(ttl_seconds=60, max_entries=10, max_quests=100)
+    get_list(cache, Loader(["stale"]))
+
+    token = read_after.set(Timestamp(1700000000, 1))
+    try:
+        assert get_list(cache, Loader(["fresh"])) == ["fresh"]
+    finally:
+        read_after.reset(token)
+
+
+def test_filter_key():
+    assert filter_key(["b", "a", "b"], None) == filter_key(["a", "b"], [])
+    assert filter_key(None, [10, 20]) == ((), (10.0, 20.0))
+    assert filter_key(None, [20, 10]) != filter_key(None, [10, 20])
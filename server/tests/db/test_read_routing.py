@@ -0,0 +1,90 @@
+import mongomock
+import pytest
+from bson.timestamp import Timestamp
+from pymongo.read_preferences import SecondaryPreferred
+import server
+from db import pwd_hashing
+from db.instrumentation import InstrumentedCollection, db_session
+from db.read_routing import (
+    format_read_after,
+    parse_read_after,
+    read_after,
+    staleness_tolerant,
+)
+
+
+def test_staleness_tolerant_reads_from_secondaries():
+    collection = InstrumentedCollection(mongomock.MongoClient()["db"]["quests"])
+
+    routed = staleness_tolerant(collection)
+
+    assert isinstance(routed, InstrumentedCollection)
+    assert routed.read_preference == SecondaryPreferred(max_staleness=90)
+
+
+def test_staleness_tolerant_after_own_write():
+    collection = mongomock.MongoClient()["db"]["quests"]
+    token = read_after.set(Timestamp(1700000000, 1))
+    try:
+        assert staleness_tolerant(collection) is collection
+    finally:
+        read_after.reset(token)
+
+
+def test_read_after_cookie():
+    operation_time = Timestamp(1700000000, 7)
+
+    assert format_read_after(operation_time) == "1700000000.7"
+    assert parse_read_after("1700000000.7") == operation_time
+    assert parse_read_after(None) is None
+    assert parse_read_after("not-a-timestamp") is None
+
+
+def test_operations_run_in_request_session():
+    calls = []
+
+    class Collection:
+        def find_one(self, *args, **kwargs):
+            calls.append(kwargs)
+
+    session = object()
+    token = db_session.set(session)
+    try:
+        InstrumentedCollection(Collection()).find_one({})
+    finally:
+        db_session.reset(token)
+    InstrumentedCollection(Collection()).find_one({})
+
+    assert calls == [{"session": session}, {}]
+
+
+@pytest.mark.query_budget(3)
+def test_write_sets_read_after_cookie(client, test_db, monkeypatch):
+    """
+    Test a successful write returns the operation time its reads must follow
+    """
+    sessions = []
+
+    def start_causal_session(client, operation_time):
+        sessions.append(operation_time)
+        return "session"
+
+    monkeypatch.setattr(server, "start_causal_session", start_causal_session)
+    monkeypatch.setattr(
+        server, "end_causal_session", lambda session: Timestamp(1700000000, 2)
+    )
+    test_db["users"].insert_one(
+        {
+            "username": "writer",
+            "password": pwd_hashing.hash_password("securepassword"),
+            "email": "writer@example.com",
+        }
+    )
+
+    response = client.post(
+        "/auth", json={"username": "writer", "password": "securepassword"}
+    )
+
+    assert response.status_code == 200
+    assert response.cookies["read_after"] == "1700000000.2"
+    assert sessions == [None]
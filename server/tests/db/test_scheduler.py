@@ -0,0 +1,160 @@
+from datetime import timedelta
+from bson import ObjectId
+from db.events import quest_events
+from db.locks import acquire_lock, release_lock, utcnow
+from db.scheduler import (
+    archive_closed_quests,
+    close_expired_quests,
+    job_stats,
+    run_job_once,
+)
+
+
+def insert_quest(test_db, deadline, status="open"):
+    quest_id = ObjectId()
+    test_db["quests"].insert_one(
+        {
+            "_id": quest_id,
+            "title": "Test Quest",
+            "description": "Test description",
+            "topics": [],
+            "longitude": 10.0,
+            "latitude": 20.0,
+            "deadline": deadline,
+            "created_by": ObjectId(),
+            "applicants": [],
+            "status": status,
+            "version": 1,
+        }
+    )
+    return quest_id
+
+
+def test_close_expired_quests(test_db):
+    """
+    Test only open quests past their deadline are closed
+    """
+    now = utcnow()
+    expired_id = insert_quest(test_db, now - timedelta(hours=2))
+    future_id = insert_quest(test_db, now + timedelta(hours=2))
+
+    result = close_expired_quests(test_db)
+
+    assert result["closed"] == 1
+    assert result["lag_seconds"] >= 2 * 60 * 60
+    expired = test_db["quests"].find_one({"_id": expired_id})
+    assert expired["status"] == "closed"
+    assert expired["version"] == 2
+    assert test_db["quests"].find_one({"_id": future_id})["status"] == "open"
+
+
+def test_close_expired_quests_events(test_db):
+    """
+    Test close events carry the whole closed quest
+    """
+    events = []
+    quest_events.add_listener(events.append)
+    try:
+        expired_id = insert_quest(test_db, utcnow() - timedelta(hours=2))
+        close_expired_quests(test_db)
+    finally:
+        quest_events.remove_listener(events.append)
+
+    assert [event["type"] for event in events] == ["close"]
+    quest = events[0]["quest"]
+    assert quest["_id"] == str(expired_id)
+    assert quest["status"] == "closed"
+    assert quest["version"] == 2
+    assert quest["description"] == "Test description"
+
+
+def test_close_expired_quests_nothing_expired(test_db):
+    """
+    Test a run without expired quests reports an empty batch
+    """
+    insert_quest(test_db, utcnow() + timedelta(hours=2))
+
+    assert close_expired_quests(test_db) == {"closed": 0, "lag_seconds": 0.0}
+
+
+def test_lock_single_leader(test_db):
+    """
+    Test a lock held by one worker cannot be taken by another until it expires
+    """
+    assert acquire_lock(test_db, "job", 60, owner="worker-1")
+    assert acquire_lock(test_db, "job", 60, owner="worker-1")
+    assert not acquire_lock(test_db, "job", 60, owner="worker-2")
+
+    release_lock(test_db, "job", owner="worker-1")
+    assert acquire_lock(test_db, "job", 60, owner="worker-2")
+
+
+def test_run_job_once_skips_without_lock(test_db):
+    """
+    Test jobs only run on the worker holding the leader lock
+    """
+    insert_quest(test_db, utcnow() - timedelta(hours=1))
+    acquire_lock(test_db, "job:expire", 60, owner="other-worker")
+
+    assert run_job_once(test_db, "expire", close_expired_quests, 60) is None
+    assert test_db["quests"].count_documents({"status": "open"}) == 1
+
+    release_lock(test_db, "job:expire", owner="other-worker")
+    assert run_job_once(test_db, "expire", close_expired_quests, 60)["closed"] == 1
+    assert job_stats["expire"]["last_result"]["closed"] == 1
+
+
+def test_archive_closed_quests(test_db):
+    """
+    Test quests closed before the cutoff move to the archive collection
+    """
+    old_id = insert_quest(test_db, utcnow() - timedelta(days=60), status="closed")
+    test_db["quests"].update_one(
+        {"_id": old_id}, {"$set": {"closed_at": utcnow() - timedelta(days=45)}}
+    )
+    recent_id = insert_quest(test_db, utcnow() - timedelta(days=60), status="closed")
+    test_db["quests"].update_one(
+        {"_id": recent_id}, {"$set": {"closed_at": utcnow() - timedelta(days=1)}}
+    )
+    legacy_id = insert_quest(test_db, utcnow() - timedelta(days=60), status="closed")
+    open_id = insert_quest(test_db, utcnow() - timedelta(days=60))
+
+    result = archive_closed_quests(test_db)
+
+    assert result["archived"] == 2
+    assert result["hot_quests"] == 2
+    assert result["archived_quests"] == 2
+    archived_ids = {quest["_id"] for quest in test_db["quests_archive"].find()}
+    assert archived_ids == {old_id, legacy_id}
+    hot_ids = {quest["_id"] for quest in test_db["quests"].find()}
+    assert hot_ids == {recent_id, open_id}
+
+
+def test_archive_skips_quests_edited_mid_move(test_db, monkeypatch):
+    """
+    Test a quest edited while being archived stays hot without an archive copy
+    """
+    edited_id = insert_quest(test_db, utcnow() - timedelta(days=60), status="closed")
+    moved_id = insert_quest(test_db, utcnow() - timedelta(days=60), status="closed")
+    archive = test_db["quests_archive"]
+    insert_many = archive.insert_many
+
+    def insert_then_edit(*args, **kwargs):
+        result = insert_many(*args, **kwargs)
+        test_db["quests"].update_one({"_id": edited_id}, {"$inc": {"version": 1}})
+        return result
+
+    monkeypatch.setattr(archive, "insert_many", insert_then_edit)
+    events = []
+    quest_events.add_listener(events.append)
+    try:
+        result = archive_closed_quests(test_db)
+    finally:
+        quest_events.remove_listener(events.append)
+
+    assert result["archived"] == 1
+    assert [quest["_id"] for quest in archive.find()] == [moved_id]
+    assert [(event["type"], event["quest"]["_id"]) for event in events] == [
+        ("archive", str(moved_id))
+    ]
+    assert test_db["quests"].find_one({"_id": edited_id})["version"] == 2
@@ -0,0 +1,80 @@
+from datetime import datetime
+import mongomock
+from db.seed import LATITUDE_RANGE, LONGITUDE_RANGE, password_for, seed_database
+
+REFERENCE = datetime(2025, 3, 1)
+
+
+def seeded_db(seed=0, sessions=0):
+    db = mongomock.MongoClient()["seed_db"]
+    db["topics"].insert_many([{"name": name} for name in ("Cooking", "Gardening")])
+    result = seed_database(
+        db,
+        users=20,
+        quests=50,
+        sessions=sessions,
+        seed=seed,
+        reference=REFERENCE,
+        batch_size=7,
+        password_hashes=["hash-a", "hash-b"],
+    )
+    return db, result
+
+
+def test_seed_database_counts():
+    db, result = seeded_db(sessions=3)
+
+    assert result["counts"] == {"users": 20, "quests": 50, "cookies": 3}
+    assert db["users"].count_documents({}) == 20
+    assert db["quests"].count_documents({}) == 50
+    assert db["cookies"].count_documents({}) == 3
+    assert result["topics"] == ["Cooking", "Gardening"]
+
+
+def test_seed_database_is_deterministic():
+    first, _ = seeded_db(seed=1)
+    second, _ = seeded_db(seed=1)
+    other, _ = seeded_db(seed=2)
+
+    def quests(db):
+        return list(db["quests"].find({}, {"topics": 0}).sort("_id", 1))
+
+    assert quests(first) == quests(second)
+    assert quests(first) != quests(other)
+
+
+def test_seed_database_quests():
+    db, result = seeded_db()
+    user_ids = set(result["user_ids"])
+
+    for quest in db["quests"].find():
+        assert LATITUDE_RANGE[0] <= quest["latitude"] <= LATITUDE_RANGE[1]
+        assert LONGITUDE_RANGE[0] <= quest["longitude"] <= LONGITUDE_RANGE[1]
+        assert 1 <= len(quest["topics"]) <= 2
+        assert quest["created_by"] in user_ids
+        assert quest["created_by"] not in quest["applicants"]
+        assert set(quest["applicants"]) <= user_ids
+        if quest["status"] == "closed":
+            assert quest["deadline"] < REFERENCE
+        else:
+            assert quest["deadline"] > REFERENCE
+
+
+def test_seed_database_sessions():
+    from endpoints.auth import decrypt_cookie
+
+    db, result = seeded_db(sessions=2)
+
+    assert [session["username"] for session in result["sessions"]] == [
+        "user0000000",
+        "user0000001",
+    ]
+    for session in result["sessions"]:
+        username = decrypt_cookie(session["cookie"]).split(":")[0]
+        assert username == session["username"]
+        stored = db["cookies"].find_one({"cookie": session["cookie"]})
+        assert stored["expiration_at"] > REFERENCE
+
+
+def test_password_pool():
+    assert password_for(9) == "password0000001"
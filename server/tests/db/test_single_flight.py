@@ -0,0 +1,90 @@
+import asyncio
+import threading
+import pytest
+from db.single_flight import SingleFlight
+
+
+def test_concurrent_reads_share_one_load():
+    flight = SingleFlight("test")
+    release = threading.Event()
+    calls = []
+
+    def load():
+        calls.append(1)
+        release.wait(5)
+        return ["quest"]
+
+    async def main():
+        readers = [asyncio.create_task(flight.run("key", load)) for _ in range(5)]
+        other = asyncio.create_task(flight.run("other", lambda: ["other"]))
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*readers), await other
+
+    results, other = asyncio.run(main())
+
+    assert len(calls) == 1
+    assert results == [["quest"]] * 5
+    assert other == ["other"]
+    assert flight.in_flight() == 0
+
+
+def test_errors_reach_every_waiter():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        raise ValueError("database down")
+
+    async def main():
+        readers = [asyncio.create_task(flight.run("key", load)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        release.set()
+        return await asyncio.gather(*readers, return_exceptions=True)
+
+    errors = asyncio.run(main())
+
+    assert [str(error) for error in errors] == ["database down"] * 3
+    # Failed reads are not shared with later requests
+    assert asyncio.run(flight.run("key", lambda: "retried")) == "retried"
+
+
+def test_followers_stop_waiting():
+    flight = SingleFlight("test", wait_seconds=0.05)
+    release = threading.Event()
+
+    def slow_load():
+        release.wait(5)
+        return "slow"
+
+    async def main():
+        leader = asyncio.create_task(flight.run("key", slow_load))
+        await asyncio.sleep(0.01)
+        follower = await flight.run("key", lambda: "own")
+        release.set()
+        return await leader, follower
+
+    assert asyncio.run(main()) == ("slow", "own")
+
+
+def test_leader_cancelled_read_continues():
+    flight = SingleFlight("test")
+    release = threading.Event()
+
+    def load():
+        release.wait(5)
+        return "shared"
+
+    async def main():
+        leader = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0.01)
+        follower = asyncio.create_task(flight.run("key", load))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "shared"
@@ -0,0 +1,88 @@
+import pytest
+from profiling import memory_profiler
+
+
+@pytest.fixture
+def admin_token(monkeypatch):
+    monkeypatch.setattr("endpoints.admin.ADMIN_TOKEN", "admin-secret")
+    return "admin-secret"
+
+
+@pytest.mark.query_budget(0)
+def test_admin_disabled_without_token(client):
+    """
+    Test admin routes do not exist unless an admin token is configured
+    """
+    response = client.get("/admin/query-shapes", headers={"X-Admin-Token": "anything"})
+    assert response.status_code == 404
+
+
+@pytest.mark.query_budget(0)
+def test_admin_invalid_token(client, admin_token):
+    """
+    Test admin routes reject a wrong token
+    """
+    response = client.get("/admin/query-shapes", headers={"X-Admin-Token": "wrong"})
+    assert response.status_code == 403
+
+
+@pytest.mark.query_budget(0)
+def test_get_query_shapes(client, admin_token):
+    """
+    Test listing query shapes with the admin token and no session cookie
+    """
+    response = client.get("/admin/query-shapes", headers={"X-Admin-Token": admin_token})
+    assert response.status_code == 200
+    assert "shapes" in response.json()
+
+
+@pytest.fixture
+def memory_tracing():
+    yield
+    memory_profiler.stop()
+
+
+@pytest.mark.query_budget(0)
+def test_memory_snapshot_diff(client, admin_token, memory_tracing):
+    """
+    Test snapshots report allocation sites and the growth between snapshots
+    """
+    headers = {"X-Admin-Token": admin_token}
+    response = client.post("/admin/memory/start", headers=headers)
+    assert response.status_code == 200
+    assert response.json()["tracing"] is True
+
+    base = client.post("/admin/memory/snapshots", headers=headers).json()
+    allocated = [bytearray(1000) for _ in range(1000)]  # noqa: F841
+    response = client.post("/admin/memory/snapshots?limit=5", headers=headers)
+    assert response.status_code == 200
+    snapshot = response.json()
+    assert len(snapshot["top"]) <= 5
+
+    response = client.get(
+        f"/admin/memory/snapshots/{snapshot['id']}?base={base['id']}&limit=1",
+        headers=headers,
+    )
+    assert response.status_code == 200
+    [largest_growth] = response.json()["top"]
+    assert "test_admin.py" in largest_growth["location"][0]
+    assert largest_growth["size_diff_bytes"] >= 1000 * 1000
+
+    status = client.get("/admin/memory", headers=headers).json()
+    assert [entry["id"] for entry in status["snapshots"]] == [
+        base["id"],
+        snapshot["id"],
+    ]
+
+
+@pytest.mark.query_budget(0)
+def test_memory_snapshot_requires_tracing(client, admin_token, memory_tracing):
+    """
+    Test snapshots cannot be taken before tracing starts, nor read once dropped
+    """
+    headers = {"X-Admin-Token": admin_token}
+    response = client.post("/admin/memory/snapshots", headers=headers)
+    assert response.status_code == 409
+
+    response = client.get("/admin/memory/snapshots/1", headers=headers)
+    assert response.status_code == 404
@@ -1,6 +1,8 @@
+import pytest
 from .gen_auth_user_for_tests import generate_cookies_from_user
 
 
+@pytest.mark.query_budget(4)
 def test_create_user(client):
     """
     Test user registration.
@@ -19,6 +21,7 @@ def test_create_user(client):
     assert response.json()["email"] == email
 
 
+@pytest.mark.query_budget(2)
 def test_login_existing_user(client, test_db):
     """
     Test login for an existing user.
@@ -44,6 +47,7 @@ def test_login_existing_user(client, test_db):
     assert response.json()["username"] == username
 
 
+@pytest.mark.query_budget(1)
 def test_login_with_wrong_password(client, test_db):
     """
     Test login with incorrect password.
@@ -70,6 +74,7 @@ def test_login_with_wrong_password(client, test_db):
     assert response.json()["detail"] == "Incorrect password"
 
 
+@pytest.mark.query_budget(3)
 def test_auth_me_success(client, test_db):
     """
     Test authenticated user retrieval (/me).
@@ -86,6 +91,7 @@ def test_auth_me_success(client, test_db):
     assert response.json()["username"] == username
 
 
+@pytest.mark.query_budget(0)
 def test_auth_me_fail_no_cookie(client):
     """
     Test authentication failure when no cookie is provided.
@@ -96,6 +102,7 @@ def test_auth_me_fail_no_cookie(client):
     assert response.json()["detail"] == "No authentication token found"
 
 
+@pytest.mark.query_budget(1)
 def test_auth_me_invalid_token(client):
     """
     Test authentication failure with an invalid token.
@@ -109,6 +116,7 @@ def test_auth_me_invalid_token(client):
     assert response.json()["detail"] == "Invalid authentication token"
 
 
+@pytest.mark.query_budget(3)
 def test_logout(client, test_db):
     """
     Test logout.
@@ -129,6 +137,7 @@ def test_logout(client, test_db):
     )
 
 
+@pytest.mark.query_budget(0)
 def test_logout_no_cookie(client):
     """
     Test logout when no cookie is provided.
@@ -139,6 +148,7 @@ def test_logout_no_cookie(client):
     assert response.json()["detail"] == "No authentication token found"
 
 
+@pytest.mark.query_budget(1)
 def test_logout_invalid_token(client):
     """
     Test logout with an invalid token.
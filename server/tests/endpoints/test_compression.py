@@ -0,0 +1,114 @@
+from datetime import datetime
+import pytest
+from bson import ObjectId
+from endpoints.api import compression
+from endpoints.api.compression import choose_encoding
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+def insert_quests(test_db, count):
+    test_db["quests"].insert_many(
+        [
+            {
+                "title": f"Quest number {index}",
+                "description": "A repetitive quest description",
+                "topics": [],
+                "created_by": ObjectId(),
+                "longitude": 3.2,
+                "latitude": 51.2,
+                "price": 10.0,
+                "deadline": datetime(2030, 1, 1),
+                "applicants": [],
+                "status": "open",
+                "version": 1,
+            }
+            for index in range(count)
+        ]
+    )
+
+
+def test_choose_encoding():
+    assert choose_encoding("gzip, deflate, br") == "br"
+    assert choose_encoding("gzip;q=0.5, br;q=0") == "gzip"
+    assert choose_encoding("*") == "br"
+    assert choose_encoding("identity") is None
+    assert choose_encoding("gzip;q=0") is None
+    assert choose_encoding(None) is None
+
+
+@pytest.mark.query_budget(2)
+def test_quests_compressed(client, test_db):
+    """
+    Test large quest lists are compressed with the encoding the client prefers
+    """
+    generate_cookies_from_user(client, test_db)
+    insert_quests(test_db, 50)
+
+    plain = client.get("/api/quests", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/api/quests", headers={"Accept-Encoding": "gzip"})
+    brotlied = client.get("/api/quests", headers={"Accept-Encoding": "br"})
+
+    assert "content-encoding" not in plain.headers
+    assert gzipped.headers["content-encoding"] == "gzip"
+    assert brotlied.headers["content-encoding"] == "br"
+    for response in (plain, gzipped, brotlied):
+        assert response.headers["vary"] == "Accept, Accept-Encoding"
+        # The test client decodes the body
+        assert response.json() == plain.json()
+    assert int(gzipped.headers["content-length"]) < len(plain.content) / 5
+
+
+@pytest.mark.query_budget(3)
+def test_compressed_etag(client, test_db):
+    """
+    Test compressed bodies get an ETag of their own, still matching the quests
+    """
+    generate_cookies_from_user(client, test_db)
+    insert_quests(test_db, 50)
+
+    plain = client.get("/api/quests", headers={"Accept-Encoding": "identity"})
+    gzipped = client.get("/api/quests", headers={"Accept-Encoding": "gzip"})
+    polled = client.get(
+        "/api/quests",
+        headers={"Accept-Encoding": "gzip", "If-None-Match": gzipped.headers["etag"]},
+    )
+
+    assert gzipped.headers["etag"] == plain.headers["etag"][:-1] + '-gzip"'
+    assert polled.status_code == 304
+    assert polled.headers["etag"] == gzipped.headers["etag"]
+
+
+@pytest.mark.query_budget(2)
+def test_small_response_not_compressed(client, test_db):
+    """
+    Test bodies below COMPRESSION_MIN_BYTES are sent as they are
+    """
+    generate_cookies_from_user(client, test_db)
+
+    response = client.get("/api/quests", headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept, Accept-Encoding"
+
+
+@pytest.mark.query_budget(2)
+def test_identical_bodies_compressed_once(client, test_db, monkeypatch):
+    """
+    Test a body served repeatedly is compressed once
+    """
+    calls = []
+    compress = compression.COMPRESSORS["gzip"]
+    monkeypatch.setitem(
+        compression.COMPRESSORS,
+        "gzip",
+        lambda body: calls.append(len(body)) or compress(body),
+    )
+    generate_cookies_from_user(client, test_db)
+    insert_quests(test_db, 50)
+
+    first = client.get("/api/quests", headers={"Accept-Encoding": "gzip"})
+    second = client.get("/api/quests", headers={"Accept-Encoding": "gzip"})
+
+    assert len(calls) == 1
+    assert first.content == second.content
@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from server import app
+from warmup import warm_up, warmup_state
+from db.quest_cache import quest_cache
+from db.topic_cache import topic_cache
+
+
+@pytest.fixture
+def cold_worker(monkeypatch):
+    monkeypatch.setitem(warmup_state, "complete", False)
+    monkeypatch.setitem(warmup_state, "seconds", None)
+
+
+@pytest.mark.query_budget(0)
+def test_healthz_no_auth(client):
+    """
+    Test the liveness probe needs neither authentication nor the database
+    """
+    response = client.get("/healthz")
+
+    assert response.status_code == 200
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.mark.query_budget(0)
+def test_readyz_before_warmup(client, cold_worker):
+    """
+    Test the readiness probe fails until the warm-up finished
+    """
+    response = client.get("/readyz")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "warming up"}
+
+
+@pytest.mark.query_budget(0)
+def test_readyz_after_warmup(client, test_db, cold_worker):
+    """
+    Test the warm-up loads the caches and makes the worker ready
+    """
+    test_db["topics"].insert_one({"name": "Gardening"})
+
+    asyncio.run(warm_up(app, test_db))
+    response = client.get("/readyz")
+
+    assert warmup_state["complete"]
+    assert topic_cache.names(test_db) == ["Gardening"]
+
+    def not_cached():
+        raise AssertionError("quest list not cached")
+
+    quests, _ = asyncio.run(quest_cache.get_list("all", (), not_cached, len))
+    assert quests == []
+    assert response.status_code == 200
+    assert response.json()["status"] == "ready"
+
+
+@pytest.mark.query_budget(0)
+def test_readyz_database_unreachable(client, test_db, cold_worker, monkeypatch):
+    """
+    Test the readiness probe fails when the database does not answer
+    """
+    warmup_state["complete"] = True
+
+    def unreachable(*args, **kwargs):
+        raise ConnectionError("no primary")
+
+    monkeypatch.setattr(test_db, "command", unreachable)
+    response = client.get("/readyz")
+
+    assert response.status_code == 503
+    assert response.json() == {"status": "database unreachable"}
@@ -1,6 +1,8 @@
+import pytest
 from .gen_auth_user_for_tests import generate_cookies_from_user
 
 
+@pytest.mark.query_budget(0)
 def test_me_no_auth(client):
     """
     Test me without authentication
@@ -9,6 +11,7 @@ def test_me_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(3)
 def test_me(client, test_db):
     """
     Test me with authentication
@@ -0,0 +1,81 @@
+import os
+import pytest
+from bson import ObjectId
+from metrics import Histogram
+from profiling import sample_memory_stats
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+@pytest.mark.query_budget(0)
+def test_metrics_no_auth(client):
+    """
+    Test the metrics endpoint does not require authentication
+    """
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE http_requests_total counter" in response.text
+
+
+@pytest.mark.query_budget(3)
+def test_metrics_per_route_template(client, test_db):
+    """
+    Test requests are labelled with their route template and CRUD functions timed
+    """
+    generate_cookies_from_user(client, test_db)
+    client.get(f"/api/quests/{ObjectId()}")
+
+    response = client.get("/metrics")
+
+    pid = f'pid="{os.getpid()}"'
+    route = 'method="GET",route="/api/quests/{quest_id}"'
+    assert "http_requests_total{" + route + f',status="404",{pid}}}' in response.text
+    assert f"http_request_duration_seconds_count{{{route},{pid}}}" in response.text
+    assert (
+        f'db_function_duration_seconds_count{{function="get_quest_by_id_db",{pid}}}'
+        in response.text
+    )
+
+
+def test_histogram_render():
+    """
+    Test histograms render cumulative buckets, sum and count
+    """
+    histogram = Histogram("latency_seconds", "Latency", ("route",), buckets=(0.1, 1))
+    histogram.labels(route="/a").observe(0.05)
+    histogram.labels(route="/a").observe(0.5)
+    histogram.labels(route="/a").observe(5)
+
+    lines = histogram.render()
+
+    assert 'latency_seconds_bucket{route="/a",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{route="/a",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{route="/a",le="+Inf"} 3' in lines
+    assert 'latency_seconds_sum{route="/a"} 5.55' in lines
+    assert 'latency_seconds_count{route="/a"} 3' in lines
+
+
+@pytest.mark.query_budget(0)
+def test_memory_metrics(client):
+    """
+    Test the memory sampler exposes RSS and garbage collector stats
+    """
+    sample_memory_stats()
+
+    response = client.get("/metrics")
+
+    pid = f'pid="{os.getpid()}"'
+    assert f"process_resident_memory_bytes{{{pid}}} " in response.text
+    assert "# TYPE python_gc_collections_total counter" in response.text
+    assert f'python_gc_collections_total{{generation="0",{pid}}}' in response.text
+    assert f"tracemalloc_traced_memory_bytes{{{pid}}} 0.0" in response.text
+
+
+def test_memory_metrics_without_resource(monkeypatch):
+    """
+    Test the memory sampler skips the peak RSS where resource is unavailable
+    """
+    monkeypatch.setattr("profiling.resource", None)
+
+    sample_memory_stats()
@@ -0,0 +1,112 @@
+from datetime import datetime, timedelta, timezone
+import msgpack
+import pytest
+from bson import ObjectId
+from db.crud.serialize import SerializedDatetime, serialize_objectid
+from endpoints.api.negotiation import (
+    accepts_msgpack,
+    decode_ext,
+    pack_stored,
+    packb,
+    unpack_stored,
+)
+from .gen_auth_user_for_tests import generate_cookies_from_user
+from .test_compression import insert_quests
+
+
+def unpackb(body: bytes):
+    return msgpack.unpackb(body, ext_hook=decode_ext, timestamp=3)
+
+
+def test_accepts_msgpack():
+    assert accepts_msgpack("application/msgpack")
+    assert accepts_msgpack("application/x-msgpack, application/json;q=0.5")
+    assert accepts_msgpack("application/msgpack, application/json")
+    assert not accepts_msgpack("application/json, application/msgpack;q=0.5")
+    assert not accepts_msgpack("application/msgpack;q=0")
+    assert not accepts_msgpack("*/*")
+    assert not accepts_msgpack(None)
+
+
+def test_packb_compacts_ids_and_datetimes():
+    quest_id = ObjectId()
+    deadline = datetime(2030, 1, 1, 12, 30)
+    content = serialize_objectid(
+        {"quest": {"_id": quest_id, "deadline": deadline, "topics": ("Cooking",)}}
+    )
+
+    body = packb(content)
+
+    assert unpackb(body) == {
+        "quest": {
+            "_id": quest_id,
+            "deadline": deadline.replace(tzinfo=timezone.utc),
+            "topics": ["Cooking"],
+        }
+    }
+    # 12 byte ids and 8 byte timestamps instead of 24 and 19 characters
+    assert len(body) < len(str(content)) - 20
+
+
+def test_stored_content_keeps_serialized_types():
+    offset = timezone(timedelta(hours=2))
+    content = serialize_objectid(
+        {
+            "quest": {
+                "_id": ObjectId(),
+                "deadline": datetime(2030, 1, 1, 12, 30, tzinfo=offset),
+                "price": 10.0,
+            }
+        }
+    )
+
+    stored = unpack_stored(pack_stored(content))
+
+    assert stored == content
+    assert type(stored["quest"]["deadline"]) is SerializedDatetime
+    assert packb(stored) == packb(content)
+
+
+@pytest.mark.query_budget(2)
+def test_quests_msgpack(client, test_db):
+    """
+    Test quests are sent as MessagePack to clients accepting it
+    """
+    generate_cookies_from_user(client, test_db)
+    insert_quests(test_db, 3)
+
+    json_response = client.get("/api/quests")
+    response = client.get("/api/quests", headers={"Accept": "application/msgpack"})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert json_response.headers["content-type"] == "application/json"
+    assert "Accept" in response.headers["vary"]
+    quests = unpackb(response.content)["quests"]
+    assert [str(quest["_id"]) for quest in quests] == [
+        quest["_id"] for quest in json_response.json()["quests"]
+    ]
+    assert quests[0]["deadline"] == datetime(2030, 1, 1, tzinfo=timezone.utc)
+    assert len(response.content) < len(json_response.content)
+
+
+@pytest.mark.query_budget(2)
+def test_topics_msgpack(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "Cooking"})
+
+    response = client.get("/api/topics", headers={"Accept": "application/msgpack"})
+
+    assert unpackb(response.content) == {"topics": ["Cooking"]}
+
+
+@pytest.mark.query_budget(3)
+def test_errors_stay_json(client, test_db):
+    generate_cookies_from_user(client, test_db)
+
+    response = client.get(
+        f"/api/quests/{ObjectId()}", headers={"Accept": "application/msgpack"}
+    )
+
+    assert response.status_code == 404
+    assert response.headers["content-type"] == "application/json"
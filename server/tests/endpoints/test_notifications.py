@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+import pytest
+from bson import ObjectId
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+from server import app
+from endpoints.api.notifications import notification_hub
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+def insert_quest(test_db, creator_id, applicants=None):
+    quest_id = ObjectId()
+    test_db["quests"].insert_one(
+        {
+            "_id": quest_id,
+            "title": "Test Quest",
+            "description": "Test description",
+            "topics": [],
+            "longitude": 10.0,
+            "latitude": 20.0,
+            "deadline": datetime.now() + timedelta(days=30),
+            "created_by": creator_id,
+            "applicants": applicants or [],
+            "status": "open",
+        }
+    )
+    return quest_id
+
+
+def test_notifications_no_auth(client):
+    """
+    Test the notification socket is closed without authentication
+    """
+    with pytest.raises(WebSocketDisconnect):
+        with client.websocket_connect("/api/notifications/ws"):
+            pass
+
+
+def test_creator_notified_of_application(client, test_db):
+    """
+    Test the quest creator is notified when someone applies
+    """
+    generate_cookies_from_user(client, test_db)
+    creator_id = test_db["users"].find_one({"username": "authuser"})["_id"]
+    quest_id = insert_quest(test_db, creator_id)
+
+    applicant = TestClient(app)
+    generate_cookies_from_user(
+        applicant, test_db, username="applicant", email="applicant@gmail.com"
+    )
+
+    with client.websocket_connect("/api/notifications/ws") as websocket:
+        response = applicant.post(f"/api/quests/{quest_id}/apply")
+        message = websocket.receive_json()
+
+    assert response.status_code == 200
+    assert message["type"] == "application"
+    assert message["quest_id"] == str(quest_id)
+    assert message["applicant_id"] == str(
+        test_db["users"].find_one({"username": "applicant"})["_id"]
+    )
+    assert notification_hub.connection_count() == 0
+
+
+def test_applicants_notified_of_close(client, test_db):
+    """
+    Test applicants are notified when the creator closes the quest
+    """
+    generate_cookies_from_user(client, test_db)
+    applicant_id = test_db["users"].find_one({"username": "authuser"})["_id"]
+
+    creator = TestClient(app)
+    generate_cookies_from_user(
+        creator, test_db, username="creator", email="creator@gmail.com"
+    )
+    creator_id = test_db["users"].find_one({"username": "creator"})["_id"]
+    quest_id = insert_quest(test_db, creator_id, applicants=[applicant_id])
+
+    with client.websocket_connect("/api/notifications/ws") as websocket:
+        response = creator.post(f"/api/quests/{quest_id}/close")
+        message = websocket.receive_json()
+
+    assert response.status_code == 200
+    assert message == {
+        "type": "quest_closed",
+        "quest_id": str(quest_id),
+        "title": "Test Quest",
+    }
@@ -0,0 +1,76 @@
+import time
+import pytest
+from db.topic_cache import topic_cache
+from profiling import ProfileRateLimiter
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+@pytest.fixture
+def profiling(monkeypatch, tmp_path):
+    monkeypatch.setattr("endpoints.admin.ADMIN_TOKEN", "admin-secret")
+    monkeypatch.setattr("profiling.PROFILE_DIR", str(tmp_path))
+    monkeypatch.setattr("server.profile_rate_limiter", ProfileRateLimiter(1, 1))
+    return tmp_path
+
+
+@pytest.mark.query_budget(2)
+def test_profile_request(client, test_db, profiling, monkeypatch):
+    """
+    Test a request with the profile flag writes a collapsed stack profile
+    """
+    generate_cookies_from_user(client, test_db)
+    names = topic_cache.names
+
+    def slow_topic_names(db):
+        time.sleep(0.1)
+        return names(db)
+
+    monkeypatch.setattr(topic_cache, "names", slow_topic_names)
+
+    response = client.get(
+        "/api/topics?profile=1", headers={"X-Admin-Token": "admin-secret"}
+    )
+
+    assert response.status_code == 200
+    filename = response.headers["x-profile"]
+    assert filename.endswith("-GET-api_topics.collapsed")
+    lines = (profiling / filename).read_text().splitlines()
+    assert lines
+    for line in lines:
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+    # The handler sleeps on the event loop, so it shows up in the samples
+    assert any("slow_topic_names (test_profiling.py" in line for line in lines)
+
+
+@pytest.mark.query_budget(2)
+def test_profile_requires_admin_token(client, test_db, profiling):
+    """
+    Test the profile flag is ignored without a valid admin token
+    """
+    generate_cookies_from_user(client, test_db)
+
+    response = client.get(
+        "/api/topics", headers={"X-Profile": "1", "X-Admin-Token": "wrong"}
+    )
+
+    assert response.status_code == 200
+    assert "x-profile" not in response.headers
+    assert list(profiling.iterdir()) == []
+
+
+@pytest.mark.query_budget(2)
+def test_profile_rate_limited(client, test_db, profiling):
+    """
+    Test requests beyond the profile rate limit run unprofiled
+    """
+    generate_cookies_from_user(client, test_db)
+    headers = {"X-Profile": "1", "X-Admin-Token": "admin-secret"}
+
+    first = client.get("/api/topics", headers=headers)
+    second = client.get("/api/topics", headers=headers)
+
+    assert first.headers["x-profile"].endswith(".collapsed")
+    assert second.status_code == 200
+    assert second.headers["x-profile"] == "rate-limited"
+    assert len(list(profiling.iterdir())) == 1
@@ -0,0 +1,165 @@
+import pytest
+import asyncio
+from datetime import datetime, timedelta
+from bson import ObjectId
+from db.events import quest_change_event, quest_events, quest_matches_filter
+from endpoints.api.quest_stream import quest_event_stream
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+class DisconnectingRequest:
+    """
+    Stub request that reports a disconnect after a number of checks
+    """
+
+    def __init__(self, checks_before_disconnect):
+        self.checks_before_disconnect = checks_before_disconnect
+
+    async def is_disconnected(self):
+        self.checks_before_disconnect -= 1
+        return self.checks_before_disconnect < 0
+
+
+async def collect(stream):
+    return [message async for message in stream]
+
+
+@pytest.mark.query_budget(0)
+def test_stream_quests_no_auth(client):
+    """
+    Test quest stream without authentication
+    """
+    response = client.get("/api/quests/stream")
+    assert response.status_code == 401
+
+
+@pytest.mark.query_budget(1)
+def test_stream_quests_invalid_bbox(client, test_db):
+    """
+    Test quest stream with a malformed bounding box
+    """
+    generate_cookies_from_user(client, test_db)
+    response = client.get("/api/quests/stream?bbox=1&bbox=2")
+    assert response.status_code == 400
+
+
+@pytest.mark.query_budget(5)
+def test_create_quest_publishes_event(client, test_db):
+    """
+    Test creating a quest publishes a create event to subscribers
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    loop = asyncio.new_event_loop()
+    subscription, _ = quest_events.subscribe(loop)
+
+    try:
+        client.post(
+            "/api/quests",
+            json={
+                "title": "New Quest",
+                "description": "Test description",
+                "topics": ["test"],
+                "longitude": 10.0,
+                "latitude": 20.0,
+                "price": 10.0,
+                "deadline": (datetime.now() + timedelta(days=30)).isoformat(),
+            },
+        )
+        event = loop.run_until_complete(
+            asyncio.wait_for(subscription.queue.get(), timeout=1)
+        )
+    finally:
+        quest_events.unsubscribe(subscription)
+        loop.close()
+
+    assert event["type"] == "create"
+    assert event["quest"]["title"] == "New Quest"
+
+
+def test_resume_replays_missed_events():
+    """
+    Test subscribing with a resume token returns the events published after it
+    """
+    first = quest_events.publish("create", {"_id": "1"})
+    second = quest_events.publish("close", {"_id": "1"})
+    loop = asyncio.new_event_loop()
+
+    subscription, missed = quest_events.subscribe(loop, first["id"])
+    quest_events.unsubscribe(subscription)
+    loop.close()
+
+    assert missed == [second]
+
+
+def test_stream_filters_events():
+    """
+    Test the event stream only sends events matching its filters
+    """
+    loop = asyncio.new_event_loop()
+    resume = quest_events.publish("create", {"topics": [], "_id": "0"})
+    matching = quest_events.publish("create", {"topics": ["a"], "_id": "1"})
+    quest_events.publish("create", {"topics": ["b"], "_id": "2"})
+
+    messages = loop.run_until_complete(
+        collect(
+            quest_event_stream(
+                DisconnectingRequest(1),
+                resume["id"],
+                topic_ids={"a"},
+                heartbeat_interval=0.01,
+            )
+        )
+    )
+    loop.close()
+
+    assert messages[0].startswith("retry:")
+    assert messages[1].startswith(f"id: {matching['id']}\nevent: create\n")
+    assert messages[2] == ": keep-alive\n\n"
+    assert len(messages) == 3
+    assert quest_events.subscription_count() == 0
+
+
+def test_stream_subscribes_when_started():
+    """
+    Test a stream that never started, such as for a client gone before the
+    response, holds no subscription
+    """
+    loop = asyncio.new_event_loop()
+
+    stream = quest_event_stream(DisconnectingRequest(0))
+    assert quest_events.subscription_count() == 0
+    loop.run_until_complete(stream.aclose())
+    loop.close()
+
+    assert quest_events.subscription_count() == 0
+
+
+def test_quest_matches_bbox():
+    """
+    Test the bounding box filter
+    """
+    bbox = [0.0, 0.0, 10.0, 10.0]
+    assert quest_matches_filter({"longitude": 5.0, "latitude": 5.0}, bbox=bbox)
+    assert not quest_matches_filter({"longitude": 15.0, "latitude": 5.0}, bbox=bbox)
+    assert quest_matches_filter({"_id": "deleted"}, bbox=bbox)
+
+
+def test_change_stream_archive_deletes(test_db):
+    """
+    Test change stream deletes of archived quests are archive events
+    """
+    archived_id, deleted_id = ObjectId(), ObjectId()
+    test_db["quests_archive"].insert_one({"_id": archived_id, "status": "closed"})
+
+    def delete(quest_id):
+        return {"operationType": "delete", "documentKey": {"_id": quest_id}}
+
+    assert quest_change_event(test_db, delete(archived_id)) == (
+        "archive",
+        {"_id": archived_id, "status": "closed"},
+    )
+    assert quest_change_event(test_db, delete(deleted_id)) == (
+        "delete",
+        {"_id": deleted_id},
+    )
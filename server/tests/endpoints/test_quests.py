@@ -1,8 +1,11 @@
+import pytest
 from datetime import datetime, timedelta
 from bson import ObjectId
+from db.migrations import require_quest_version
 from .gen_auth_user_for_tests import generate_cookies_from_user
 
 
+@pytest.mark.query_budget(0)
 def test_get_all_quests_no_auth(client):
     """
     Test get all quests without authentication
@@ -11,6 +14,7 @@ def test_get_all_quests_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(2)
 def test_get_empty_quests(client, test_db):
     """
     Test get empty quests, with an empty database
@@ -23,6 +27,7 @@ def test_get_empty_quests(client, test_db):
     assert response.json()["message"] == "No quests found"
 
 
+@pytest.mark.query_budget(2)
 def test_get_all_quests(client, test_db):
     """
     Test get all quests with data in database
@@ -70,6 +75,7 @@ def test_get_all_quests(client, test_db):
     assert "message" not in response.json()
 
 
+@pytest.mark.query_budget(0)
 def test_create_quest_no_auth(client):
     """
     Test create quest without authentication
@@ -88,6 +94,7 @@ def test_create_quest_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(5)
 def test_create_quest(client, test_db):
     """
     Test create quest with valid data
@@ -126,6 +133,7 @@ def test_create_quest(client, test_db):
     assert isinstance(db_quest["topics"][0], ObjectId)
 
 
+@pytest.mark.query_budget(4)
 def test_create_quest_invalid_topic(client, test_db):
     """
     Test create quest with non-existent topic
@@ -147,6 +155,7 @@ def test_create_quest_invalid_topic(client, test_db):
     assert response.json()["detail"] == "Failed to create quest"
 
 
+@pytest.mark.query_budget(1)
 def test_create_quest_invalid_data(client, test_db):
     """
     Test create quest with invalid data
@@ -160,6 +169,7 @@ def test_create_quest_invalid_data(client, test_db):
     assert response.status_code == 422  # Validation error
 
 
+@pytest.mark.query_budget(0)
 def test_get_quest_by_id_no_auth(client):
     """
     Test get quest by ID without authentication
@@ -168,6 +178,7 @@ def test_get_quest_by_id_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(3)
 def test_get_quest_by_id_not_found(client, test_db):
     """
     Test get quest by ID with non-existent ID
@@ -180,6 +191,7 @@ def test_get_quest_by_id_not_found(client, test_db):
     assert response.json()["detail"] == "Quest not found"
 
 
+@pytest.mark.query_budget(2)
 def test_get_quest_by_id(client, test_db):
     """
     Test get quest by ID with valid ID
@@ -215,6 +227,36 @@ def test_get_quest_by_id(client, test_db):
     assert response.json()["quest"]["_id"] == str(quest_id)
 
 
+@pytest.mark.query_budget(3)
+def test_get_archived_quest_by_id(client, test_db):
+    """
+    Test get quest by ID reads through to archived quests
+    """
+    generate_cookies_from_user(client, test_db)
+
+    quest_id = ObjectId()
+    test_db["quests_archive"].insert_one(
+        {
+            "_id": quest_id,
+            "title": "Archived Quest",
+            "description": "Test description",
+            "topics": [],
+            "longitude": 10.0,
+            "latitude": 20.0,
+            "deadline": datetime.now() - timedelta(days=60),
+            "price": 10.0,
+            "applicants": [],
+            "status": "closed",
+        }
+    )
+
+    response = client.get(f"/api/quests/{quest_id}")
+
+    assert response.status_code == 200
+    assert response.json()["quest"]["title"] == "Archived Quest"
+
+
+@pytest.mark.query_budget(0)
 def test_update_quest_no_auth(client):
     """
     Test update quest without authentication
@@ -234,6 +276,7 @@ def test_update_quest_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(6)
 def test_update_quest_not_found(client, test_db):
     """
     Test update quest with non-existent ID
@@ -256,6 +299,7 @@ def test_update_quest_not_found(client, test_db):
     assert response.json()["detail"] == "Quest not found"
 
 
+@pytest.mark.query_budget(6)
 def test_update_quest_not_creator(client, test_db):
     """
     Test update quest when user is not the creator
@@ -306,6 +350,7 @@ def test_update_quest_not_creator(client, test_db):
     assert "User is not the creator of this quest" in response.json()["detail"]
 
 
+@pytest.mark.query_budget(5)
 def test_update_quest(client, test_db):
     """
     Test update quest with valid ID and data
@@ -371,6 +416,7 @@ def test_update_quest(client, test_db):
     assert db_quest["topics"][0] == new_topic_id
 
 
+@pytest.mark.query_budget(0)
 def test_delete_quest_no_auth(client):
     """
     Test delete quest without authentication
@@ -380,6 +426,7 @@ def test_delete_quest_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(3)
 def test_delete_quest_not_found(client, test_db):
     """
     Test delete quest with non-existent ID
@@ -392,6 +439,7 @@ def test_delete_quest_not_found(client, test_db):
     assert response.json()["detail"] == "Quest not found or already deleted"
 
 
+@pytest.mark.query_budget(3)
 def test_delete_quest(client, test_db):
     """
     Test delete quest with valid ID
@@ -431,6 +479,25 @@ def test_delete_quest(client, test_db):
     assert db_quest is None
 
 
+@pytest.mark.query_budget(3)
+def test_delete_quest_removes_archive_copy(client, test_db):
+    """
+    Test a quest in both the hot and the archived quests is deleted from both
+    """
+    generate_cookies_from_user(client, test_db)
+    quest_id = ObjectId()
+    quest = {"_id": quest_id, "title": "Test Quest", "status": "closed"}
+    test_db["quests"].insert_one(quest)
+    test_db["quests_archive"].insert_one(quest)
+
+    response = client.delete(f"/api/quests/{quest_id}")
+
+    assert response.status_code == 200
+    assert client.get(f"/api/quests/{quest_id}").status_code == 404
+    assert test_db["quests_archive"].find_one({"_id": quest_id}) is None
+
+
+@pytest.mark.query_budget(0)
 def test_filter_quests_no_auth(client):
     """
     Test filter quests without authentication
@@ -439,6 +506,7 @@ def test_filter_quests_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(3)
 def test_filter_quests_no_results(client, test_db):
     """
     Test filter quests with no matching results
@@ -487,6 +555,7 @@ def test_filter_quests_no_results(client, test_db):
     assert response.json()["detail"] == "No quests found"
 
 
+@pytest.mark.query_budget(3)
 def test_filter_quests(client, test_db):
     """
     Test filter quests with matching results
@@ -572,6 +641,7 @@ def test_filter_quests(client, test_db):
     assert len(response.json()["quests"]) == 2
 
 
+@pytest.mark.query_budget(0)
 def test_apply_to_quest_no_auth(client):
     """
     Test apply to quest without authentication
@@ -581,6 +651,7 @@ def test_apply_to_quest_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(4)
 def test_apply_to_quest_not_found(client, test_db):
     """
     Test apply to quest with non-existent ID
@@ -593,6 +664,7 @@ def test_apply_to_quest_not_found(client, test_db):
     assert "detail" in response.json()
 
 
+@pytest.mark.query_budget(4)
 def test_apply_to_quest_creator(client, test_db):
     """
     Test apply to quest when user is the creator
@@ -630,6 +702,7 @@ def test_apply_to_quest_creator(client, test_db):
     assert "User is the creator" in response.json()["detail"]
 
 
+@pytest.mark.query_budget(6)
 def test_apply_to_quest(client, test_db):
     """
     Test apply to quest with valid ID
@@ -673,6 +746,7 @@ def test_apply_to_quest(client, test_db):
     assert user_id in db_quest["applicants"]
 
 
+@pytest.mark.query_budget(4)
 def test_apply_to_quest_already_applied(client, test_db):
     """
     Test apply to quest when user has already applied
@@ -713,6 +787,7 @@ def test_apply_to_quest_already_applied(client, test_db):
     assert "already an applicant" in response.json()["detail"]
 
 
+@pytest.mark.query_budget(0)
 def test_close_quest_no_auth(client, test_db):
     """
     Test close quest without authentication
@@ -722,6 +797,7 @@ def test_close_quest_no_auth(client, test_db):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(2)
 def test_close_quest_not_found(client, test_db):
     """
     Test close quest with non-existent ID
@@ -734,6 +810,7 @@ def test_close_quest_not_found(client, test_db):
     assert response.json()["detail"] == "Quest not found"
 
 
+@pytest.mark.query_budget(4)
 def test_close_quest_not_creator(client, test_db):
     """
     Test close quest when user is not the creator
@@ -772,6 +849,7 @@ def test_close_quest_not_creator(client, test_db):
     assert "User is not the creator of this quest" in response.json()["detail"]
 
 
+@pytest.mark.query_budget(6)
 def test_close_quest(client, test_db):
     """
     Test close quest with valid ID
@@ -810,3 +888,459 @@ def test_close_quest(client, test_db):
     # Verify quest status was updated in database
     db_quest = test_db["quests"].find_one({"_id": quest_id})
     assert db_quest["status"] == "closed"
+
+
+def insert_owned_quest(client, test_db, version=None):
+    """
+    Helper to insert a quest created by the authenticated user
+    """
+    generate_cookies_from_user(client, test_db)
+    user_id = ObjectId(client.get("/api/me").json()["user"]["_id"])
+    test_db["topics"].insert_one({"name": "test"})
+
+    quest = {
+        "_id": ObjectId(),
+        "title": "Original Quest",
+        "description": "Original description",
+        "topics": [],
+        "longitude": 10.0,
+        "latitude": 20.0,
+        "deadline": datetime.now() + timedelta(days=30),
+        "created_by": user_id,
+        "price": 10.0,
+        "applicants": [],
+        "status": "open",
+    }
+    if version is not None:
+        quest["version"] = version
+    test_db["quests"].insert_one(quest)
+    return quest["_id"]
+
+
+def quest_update_data(title="Updated Quest"):
+    return {
+        "title": title,
+        "description": "Updated description",
+        "topics": ["test"],
+        "longitude": 15.0,
+        "latitude": 25.0,
+        "price": 15.0,
+        "deadline": (datetime.now() + timedelta(days=60)).isoformat(),
+    }
+
+
+@pytest.mark.query_budget(3)
+def test_get_quest_etag(client, test_db):
+    """
+    Test get quest returns the quest version as ETag
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+
+    response = client.get(f"/api/quests/{quest_id}")
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"3"'
+
+
+@pytest.mark.query_budget(3)
+def test_get_quest_if_none_match(client, test_db):
+    """
+    Test get quest answers 304 while the client's ETag is current
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+
+    unchanged = client.get(f"/api/quests/{quest_id}", headers={"If-None-Match": '"3"'})
+    test_db["quests"].update_one({"_id": quest_id}, {"$set": {"version": 4}})
+    changed = client.get(f"/api/quests/{quest_id}", headers={"If-None-Match": '"3"'})
+
+    assert unchanged.status_code == 304
+    assert unchanged.content == b""
+    assert unchanged.headers["etag"] == '"3"'
+    assert changed.status_code == 200
+    assert changed.headers["etag"] == '"4"'
+
+
+@pytest.mark.query_budget(3)
+def test_get_quest_msgpack_etag(client, test_db):
+    """
+    Test MessagePack bodies have their own ETag, not matching the JSON one
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+    msgpack = {"Accept": "application/msgpack"}
+
+    json_etag = client.get(
+        f"/api/quests/{quest_id}", headers={"If-None-Match": '"3-msgpack"'}
+    )
+    full = client.get(
+        f"/api/quests/{quest_id}", headers={**msgpack, "If-None-Match": '"3"'}
+    )
+    unchanged = client.get(
+        f"/api/quests/{quest_id}", headers={**msgpack, "If-None-Match": '"3-msgpack"'}
+    )
+
+    assert json_etag.status_code == 200
+    assert json_etag.headers["etag"] == '"3"'
+    assert full.status_code == 200
+    assert full.headers["etag"] == '"3-msgpack"'
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == '"3-msgpack"'
+
+
+@pytest.mark.query_budget(6)
+def test_get_quests_if_none_match(client, test_db):
+    """
+    Test polling the quest list returns 304 until a quest changes
+    """
+    quest_id = insert_owned_quest(client, test_db, version=1)
+
+    first = client.get("/api/quests")
+    polled = client.get("/api/quests", headers={"If-None-Match": first.headers["etag"]})
+    client.post(f"/api/quests/{quest_id}/close")
+    changed = client.get(
+        "/api/quests", headers={"If-None-Match": f'W/{first.headers["etag"]}'}
+    )
+
+    assert polled.status_code == 304
+    assert polled.content == b""
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+    assert changed.json()["quests"][0]["status"] == "closed"
+
+
+@pytest.mark.query_budget(6)
+def test_update_quest_if_match_msgpack(client, test_db):
+    """
+    Test If-Match compares with the ETag of the negotiated representation
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+    msgpack = {"Accept": "application/msgpack"}
+
+    json_etag = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data(),
+        headers={**msgpack, "If-Match": '"3"'},
+    )
+    response = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data(),
+        headers={**msgpack, "If-Match": '"3-msgpack"'},
+    )
+
+    assert json_etag.status_code == 412
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"4-msgpack"'
+
+
+@pytest.mark.query_budget(5)
+def test_update_quest_if_match(client, test_db):
+    """
+    Test update quest with a matching If-Match header bumps the version
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+
+    response = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data(),
+        headers={"If-Match": '"3"'},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"4"'
+    assert test_db["quests"].find_one({"_id": quest_id})["version"] == 4
+
+
+@pytest.mark.query_budget(5)
+def test_update_quest_if_match_unversioned(client, test_db):
+    """
+    Test quests without a version field are treated as version 0
+    """
+    quest_id = insert_owned_quest(client, test_db)
+
+    response = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data(),
+        headers={"If-Match": '"0"'},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+
+
+@pytest.mark.query_budget(5)
+def test_update_quest_if_match_backfilled(client, test_db, monkeypatch):
+    """
+    Test the "0" ETag of an unversioned quest still matches once the
+    require_quest_version migration backfilled it
+    """
+    quest_id = insert_owned_quest(client, test_db)
+    # mongomock has no collMod, only the backfill runs
+    monkeypatch.setattr(test_db, "command", lambda *args, **kwargs: None)
+    require_quest_version(test_db)
+
+    response = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data(),
+        headers={"If-Match": '"0"'},
+    )
+
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"1"'
+
+
+@pytest.mark.query_budget(7)
+def test_update_archived_quest(client, test_db):
+    """
+    Test updating an archived quest reports it archived rather than missing
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+    quest = test_db["quests"].find_one_and_delete({"_id": quest_id})
+    test_db["quests_archive"].insert_one({**quest, "status": "closed"})
+
+    response = client.put(f"/api/quests/{quest_id}", json=quest_update_data())
+
+    assert response.status_code == 409
+    assert response.json()["detail"] == "Quest is closed and archived"
+
+
+@pytest.mark.query_budget(6)
+def test_update_quest_version_mismatch(client, test_db):
+    """
+    Test a stale If-Match header fails with 412 and leaves the quest untouched
+    """
+    quest_id = insert_owned_quest(client, test_db, version=3)
+
+    first = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data("First Update"),
+        headers={"If-Match": '"3"'},
+    )
+    second = client.put(
+        f"/api/quests/{quest_id}",
+        json=quest_update_data("Second Update"),
+        headers={"If-Match": '"3"'},
+    )
+
+    assert first.status_code == 200
+    assert second.status_code == 412
+    assert test_db["quests"].find_one({"_id": quest_id})["title"] == "First Update"
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key(client, test_db):
+    """
+    Test retrying a create with the same Idempotency-Key replays the response
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_data = quest_update_data("Idempotent Quest")
+    headers = {"Idempotency-Key": "create-1"}
+
+    first = client.post("/api/quests", json=quest_data, headers=headers)
+    second = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert first.status_code == 201
+    assert second.status_code == 201
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.json() == first.json()
+    assert test_db["quests"].count_documents({"title": "Idempotent Quest"}) == 1
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key_msgpack_replay(client, test_db):
+    """
+    Test a MessagePack response is replayed byte for byte
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_data = quest_update_data("Idempotent Quest")
+    headers = {"Idempotency-Key": "create-1", "Accept": "application/msgpack"}
+
+    first = client.post("/api/quests", json=quest_data, headers=headers)
+    second = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert second.status_code == 201
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.headers["content-type"] == "application/msgpack"
+    assert second.content == first.content
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key_replay_negotiated(client, test_db):
+    """
+    Test a replay is rendered in the format the retry asks for
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_data = quest_update_data("Idempotent Quest")
+    headers = {"Idempotency-Key": "create-1"}
+
+    first = client.post("/api/quests", json=quest_data, headers=headers)
+    second = client.post(
+        "/api/quests",
+        json=quest_data,
+        headers={**headers, "Accept": "application/msgpack"},
+    )
+    third = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert second.headers["idempotent-replayed"] == "true"
+    assert second.headers["content-type"] == "application/msgpack"
+    assert third.headers["content-type"] == "application/json"
+    assert third.content == first.content
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key_reused(client, test_db):
+    """
+    Test reusing an Idempotency-Key with a different body is rejected
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    headers = {"Idempotency-Key": "create-1"}
+
+    client.post("/api/quests", json=quest_update_data("First Quest"), headers=headers)
+    response = client.post(
+        "/api/quests", json=quest_update_data("Other Quest"), headers=headers
+    )
+
+    assert response.status_code == 422
+    assert test_db["quests"].count_documents({}) == 1
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key_failure_not_stored(client, test_db):
+    """
+    Test a failed request does not consume its Idempotency-Key
+    """
+    generate_cookies_from_user(client, test_db)
+    quest_data = quest_update_data("Retried Quest")
+    headers = {"Idempotency-Key": "create-1"}
+
+    failed = client.post("/api/quests", json=quest_data, headers=headers)
+    test_db["topics"].insert_one({"name": "test"})
+    retried = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert failed.status_code == 400
+    assert retried.status_code == 201
+    assert "idempotent-replayed" not in retried.headers
+
+
+@pytest.mark.query_budget(7)
+def test_create_quest_idempotency_key_in_progress(client, test_db):
+    """
+    Test a retry is rejected while the first request holds the key
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_data = quest_update_data("Pending Quest")
+    headers = {"Idempotency-Key": "create-1"}
+
+    client.post("/api/quests", json=quest_data, headers=headers)
+    test_db["idempotency_keys"].update_many({}, {"$set": {"completed": False}})
+    response = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert response.status_code == 409
+    assert test_db["quests"].count_documents({}) == 1
+
+
+@pytest.mark.query_budget(8)
+def test_create_quest_idempotency_key_stale_reservation(client, test_db):
+    """
+    Test a retry takes over the key of a request that crashed
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_data = quest_update_data("Crashed Quest")
+    headers = {"Idempotency-Key": "create-1"}
+
+    client.post("/api/quests", json=quest_data, headers=headers)
+    test_db["idempotency_keys"].update_many(
+        {},
+        {
+            "$set": {"completed": False},
+            "$unset": {"body": "", "media_type": "", "status_code": ""},
+            "$currentDate": {"locked_until": True},
+        },
+    )
+    response = client.post("/api/quests", json=quest_data, headers=headers)
+    replayed = client.post("/api/quests", json=quest_data, headers=headers)
+
+    assert response.status_code == 201
+    assert "idempotent-replayed" not in response.headers
+    assert replayed.headers["idempotent-replayed"] == "true"
+    assert replayed.json() == response.json()
+
+
+@pytest.mark.query_budget(8)
+def test_apply_to_quest_idempotency_key(client, test_db):
+    """
+    Test retrying an application with the same Idempotency-Key succeeds
+    """
+    generate_cookies_from_user(client, test_db)
+    quest_id = ObjectId()
+    test_db["quests"].insert_one(
+        {
+            "_id": quest_id,
+            "title": "Test Quest",
+            "description": "Test description",
+            "topics": [],
+            "longitude": 10.0,
+            "latitude": 20.0,
+            "deadline": datetime.now() + timedelta(days=30),
+            "created_by": ObjectId(),
+            "applicants": [],
+            "status": "open",
+        }
+    )
+    headers = {"Idempotency-Key": "apply-1"}
+
+    first = client.post(f"/api/quests/{quest_id}/apply", headers=headers)
+    second = client.post(f"/api/quests/{quest_id}/apply", headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(test_db["quests"].find_one({"_id": quest_id})["applicants"]) == 1
+
+
+@pytest.mark.query_budget(6)
+def test_quest_reads_cached_until_write(client, test_db):
+    """
+    Test quest lists and details are served from the cache until a quest is
+    written through the API
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "test"})
+    quest_id = (
+        test_db["quests"]
+        .insert_one(
+            {
+                "title": "Cached Quest",
+                "description": "Test description",
+                "topics": [],
+                "created_by": ObjectId(),
+                "longitude": 10.0,
+                "latitude": 20.0,
+                "price": 10.0,
+                "deadline": datetime.now() + timedelta(days=30),
+                "applicants": [],
+                "status": "open",
+                "version": 1,
+            }
+        )
+        .inserted_id
+    )
+
+    assert len(client.get("/api/quests").json()["quests"]) == 1
+    client.get(f"/api/quests/{quest_id}")
+    # Written around the API, so the cached results are served
+    test_db["quests"].update_one({"_id": quest_id}, {"$set": {"title": "Changed"}})
+    assert client.get(f"/api/quests/{quest_id}").json()["quest"]["title"] == (
+        "Cached Quest"
+    )
+
+    client.post(f"/api/quests/{quest_id}/apply")
+
+    assert len(client.get("/api/quests").json()["quests"]) == 1
+    quest = client.get(f"/api/quests/{quest_id}").json()["quest"]
+    assert quest["title"] == "Changed"
+    assert len(quest["applicants"]) == 1
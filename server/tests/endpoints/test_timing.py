@@ -0,0 +1,47 @@
+import pytest
+import re
+from .gen_auth_user_for_tests import generate_cookies_from_user
+
+
+def server_timing(response) -> dict:
+    """
+    Parse a Server-Timing header into {metric: (duration, description)}
+    """
+    metrics = {}
+    for entry in response.headers["server-timing"].split(", "):
+        name, *params = entry.split(";")
+        duration = float(re.search(r"dur=([\d.]+)", entry).group(1))
+        description = next(
+            (param[6:-1] for param in params if param.startswith("desc=")), None
+        )
+        metrics[name] = (duration, description)
+    return metrics
+
+
+@pytest.mark.query_budget(2)
+def test_server_timing_header(client, test_db):
+    """
+    Test responses report auth, db and total time and the number of db operations
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_many([{"name": "topic1"}, {"name": "topic2"}])
+
+    response = client.get("/api/topics")
+
+    assert response.status_code == 200
+    metrics = server_timing(response)
+    assert set(metrics) == {"total", "auth", "db", "serialize", "app"}
+    # One lookup for the auth cookie, one for the topics
+    assert metrics["db"][1] == "2 ops"
+    assert metrics["total"][0] >= metrics["auth"][0] + metrics["db"][0] - 0.1
+
+
+@pytest.mark.query_budget(0)
+def test_server_timing_unauthenticated(client):
+    """
+    Test rejected requests are timed as well
+    """
+    response = client.get("/api/topics")
+
+    assert response.status_code == 401
+    assert "total;dur=" in response.headers["server-timing"]
@@ -1,6 +1,8 @@
+import pytest
 from .gen_auth_user_for_tests import generate_cookies_from_user
 
 
+@pytest.mark.query_budget(0)
 def test_get_topics_no_auth(client):
     """
     Test get topics without authentication
@@ -13,6 +15,7 @@ def test_get_topics_no_auth(client):
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(2)
 def test_get_empty_topics(client, test_db):
     """
     Test get empty topics, with an empty database
@@ -26,6 +29,7 @@ def test_get_empty_topics(client, test_db):
     assert response.json()["topics"] == []
 
 
+@pytest.mark.query_budget(2)
 def test_get_topics(client, test_db):
     """
     Test get (self inserted) topics
@@ -38,3 +42,18 @@ def test_get_topics(client, test_db):
 
     assert response.status_code == 200
     assert response.json()["topics"] == ["testtopic"]
+
+
+@pytest.mark.query_budget(2)
+def test_get_topics_if_none_match(client, test_db):
+    """
+    Test get topics answers 304 while the topics are unchanged
+    """
+    generate_cookies_from_user(client, test_db)
+    test_db["topics"].insert_one({"name": "testtopic"})
+
+    first = client.get("/api/topics")
+    polled = client.get("/api/topics", headers={"If-None-Match": first.headers["etag"]})
+
+    assert polled.status_code == 304
+    assert polled.headers["etag"] == first.headers["etag"]
@@ -1,3 +1,4 @@
+import pytest
 from bson import ObjectId
 from datetime import datetime, timedelta
 from .gen_auth_user_for_tests import generate_cookies_from_user
@@ -60,11 +61,13 @@ def create_quests(test_db, creator_id=None, applicants=None):
     return quests[0]["_id"], quests[1]["_id"]
 
 
+@pytest.mark.query_budget(0)
 def test_get_users_unauthenticated(client):
     response = client.get("/api/users")
     assert response.status_code == 401
 
 
+@pytest.mark.query_budget(2)
 def test_get_users(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -81,6 +84,7 @@ def test_get_users(client, test_db):
     assert len(response.json()["users"]) == 3  # Includes authenticated user
 
 
+@pytest.mark.query_budget(4)
 def test_get_user_by_username(client, test_db):
     generate_cookies_from_user(client, test_db)
     user_data = client.get("/api/me").json()
@@ -91,6 +95,7 @@ def test_get_user_by_username(client, test_db):
     assert response.json()["user"]["_id"] == str(auth_user_id)
 
 
+@pytest.mark.query_budget(4)
 def test_get_user(client, test_db):
     generate_cookies_from_user(client, test_db)
     user_data = client.get("/api/me")
@@ -102,6 +107,74 @@ def test_get_user(client, test_db):
     assert response.json()["user"]["email"] == "auth@gmail.com"
 
 
+@pytest.mark.query_budget(4)
+def test_get_user_includes_archived_quests(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    user_id = ObjectId(client.get("/api/me").json()["user"]["_id"])
+    quest1_id, quest2_id = create_quests(test_db, creator_id=user_id)
+    archived_quest = test_db["quests"].find_one_and_delete({"_id": quest2_id})
+    test_db["quests_archive"].insert_one(archived_quest)
+
+    response = client.get(f"/api/users/{user_id}")
+    assert response.status_code == 200
+    created_ids = {quest["_id"] for quest in response.json()["user"]["created_quests"]}
+    assert created_ids == {str(quest1_id), str(quest2_id)}
+
+
+@pytest.mark.query_budget(4)
+def test_get_user_quest_in_both_collections_listed_once(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    user_id = ObjectId(client.get("/api/me").json()["user"]["_id"])
+    quest1_id, quest2_id = create_quests(test_db, creator_id=user_id)
+    test_db["quests_archive"].insert_one(test_db["quests"].find_one({"_id": quest2_id}))
+
+    response = client.get(f"/api/users/{user_id}")
+    created_ids = [quest["_id"] for quest in response.json()["user"]["created_quests"]]
+    assert sorted(created_ids) == sorted([str(quest1_id), str(quest2_id)])
+
+
+@pytest.mark.query_budget(4)
+def test_get_user_quest_without_applicants_field(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    user_id = ObjectId(client.get("/api/me").json()["user"]["_id"])
+    quest1_id, _ = create_quests(test_db, creator_id=user_id)
+    test_db["quests"].update_one({"_id": quest1_id}, {"$unset": {"applicants": ""}})
+
+    response = client.get(f"/api/users/{user_id}")
+    assert response.status_code == 200
+    created = response.json()["user"]["created_quests"]
+    quest1 = next(quest for quest in created if quest["_id"] == str(quest1_id))
+    assert quest1["applicants"] == []
+
+
+@pytest.mark.query_budget(4)
+def test_get_user_query_count_independent_of_quests(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    user_id = ObjectId(client.get("/api/me").json()["user"]["_id"])
+    applicant_ids = [ObjectId(), ObjectId()]
+    test_db["users"].insert_many(
+        [
+            {"_id": applicant_id, "username": "applicant"}
+            for applicant_id in applicant_ids
+        ]
+    )
+    for _ in range(10):
+        create_quests(test_db, creator_id=user_id, applicants=applicant_ids)
+        create_quests(test_db, applicants=[user_id])
+
+    response = client.get(f"/api/users/{user_id}")
+    assert response.status_code == 200
+    user = response.json()["user"]
+    assert len(user["created_quests"]) == 20
+    assert len(user["applied_quests"]) == 20
+    assert user["created_quests"][0]["topics"] == ["topic1"]
+    assert user["created_quests"][0]["applicants"] == [
+        {"_id": str(applicant_id), "username": "applicant"}
+        for applicant_id in applicant_ids
+    ]
+
+
+@pytest.mark.query_budget(2)
 def test_get_user_not_found(client, test_db):
     generate_cookies_from_user(client, test_db)
     non_existent_user = str(ObjectId())
@@ -111,6 +184,7 @@ def test_get_user_not_found(client, test_db):
     assert response.json()["detail"] == "User not found"
 
 
+@pytest.mark.query_budget(3)
 def test_delete_user_not_found(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -119,6 +193,7 @@ def test_delete_user_not_found(client, test_db):
     assert response.json()["detail"] == "User not found or already deleted"
 
 
+@pytest.mark.query_budget(8)
 def test_delete_user(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -134,6 +209,7 @@ def test_delete_user(client, test_db):
     assert response.status_code == 404
 
 
+@pytest.mark.query_budget(8)
 def test_delete_user_removes_created_quests(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -148,6 +224,7 @@ def test_delete_user_removes_created_quests(client, test_db):
     assert test_db["quests"].find_one({"_id": quest2_id}) is None
 
 
+@pytest.mark.query_budget(8)
 def test_delete_user_removes_applicant_from_quests(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -174,6 +251,7 @@ def test_delete_user_removes_applicant_from_quests(client, test_db):
     assert auth_user_id not in quest2["applicants"]
 
 
+@pytest.mark.query_budget(3)
 def test_delete_user_unauthorized(client, test_db):
     generate_cookies_from_user(client, test_db)
 
@@ -194,3 +272,21 @@ def test_delete_user_unauthorized(client, test_db):
 
     assert auth_user_id != user_id
     assert response.status_code == 404
+
+
+@pytest.mark.query_budget(4)
+def test_get_user_if_none_match(client, test_db):
+    generate_cookies_from_user(client, test_db)
+    user_id = client.get("/api/me").json()["user"]["_id"]
+
+    first = client.get(f"/api/users/{user_id}")
+    polled = client.get(
+        f"/api/users/{user_id}", headers={"If-None-Match": first.headers["etag"]}
+    )
+    test_db["users"].update_one({"_id": ObjectId(user_id)}, {"$set": {"name": "New"}})
+    changed = client.get(
+        f"/api/users/{user_id}", headers={"If-None-Match": first.headers["etag"]}
+    )
+
+    assert polled.status_code == 304
+    assert changed.status_code == 200
@@ -0,0 +1,111 @@
+import asyncio
+import httpx
+import pytest
+from benchmarks.load import parse_mix, run_load
+from benchmarks.run import BENCHMARKS, find_regressions, run_benchmarks
+from benchmarks.stats import percentile
+from server import app
+
+
+def test_run_benchmarks():
+    names = list(BENCHMARKS)
+
+    results = run_benchmarks(
+        backend="mongomock",
+        sizes=[20],
+        names=names,
+        iterations=3,
+        warmup=0,
+        max_seconds=5,
+    )
+
+    assert [result["benchmark"] for result in results] == names
+    for result in results:
+        assert result["size"] == 20
+        assert result["iterations"] == 3
+        assert 0 < result["p50_ms"] <= result["p95_ms"] <= result["max_ms"]
+    payloads = {result["benchmark"]: result.get("payload_bytes") for result in results}
+    assert 0 < payloads["encode_msgpack_quests"] < payloads["encode_json_quests"]
+
+
+def test_find_regressions():
+    baseline = [
+        {
+            "benchmark": "get_quests_db",
+            "backend": "mongomock",
+            "size": 1000,
+            "p50_ms": 10,
+        },
+        {
+            "benchmark": "filter_quests_db",
+            "backend": "mongomock",
+            "size": 1000,
+            "p50_ms": 10,
+        },
+    ]
+    results = [
+        {
+            "benchmark": "get_quests_db",
+            "backend": "mongomock",
+            "size": 1000,
+            "p50_ms": 11,
+        },
+        {
+            "benchmark": "filter_quests_db",
+            "backend": "mongomock",
+            "size": 1000,
+            "p50_ms": 13,
+        },
+        {
+            "benchmark": "filter_quests_db",
+            "backend": "mongomock",
+            "size": 10,
+            "p50_ms": 99,
+        },
+    ]
+
+    regressions = find_regressions(results, baseline, "p50_ms", threshold=0.2)
+
+    assert [(r["benchmark"], r["size"]) for r in regressions] == [
+        ("filter_quests_db", 1000)
+    ]
+    assert regressions[0]["change"] == 0.3
+
+
+def test_load_generator(client, test_db):
+    """
+    Test simulated users exercise every operation of the mix
+    """
+    test_db["topics"].insert_many([{"name": "Gardening"}, {"name": "Cooking"}])
+
+    result = asyncio.run(
+        run_load(
+            base_url="http://testserver",
+            users=2,
+            duration=1.5,
+            weights=parse_mix("list=1,filter=1,detail=1,create=3,apply=1,close=1"),
+            think_time=0,
+            transport=httpx.ASGITransport(app=app),
+        )
+    )
+
+    endpoints = {row["endpoint"]: row for row in result["endpoints"]}
+    assert endpoints["POST /auth"]["statuses"] == {"200": 2}
+    assert endpoints["POST /api/quests"]["statuses"]["201"] > 0
+    for row in endpoints.values():
+        assert row["errors"] == 0
+        assert row["p50_ms"] <= row["p99_ms"]
+
+
+def test_percentile_nearest_rank():
+    assert percentile([1, 2, 3, 4, 5], 0.5) == 3
+    assert percentile(list(range(1, 11)), 0.25) == 3
+    assert percentile(list(range(1, 11)), 0.5) == 5
+    assert percentile([1, 2, 3, 4, 5], 0.99) == 5
+    assert percentile([7], 0.0) == 7
+
+
+def test_parse_mix():
+    assert parse_mix("list=3, detail=1") == {"list": 3.0, "detail": 1.0}
+    with pytest.raises(ValueError):
+        parse_mix("list=1,delete=1")
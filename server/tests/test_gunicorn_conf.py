@@ -0,0 +1,54 @@
+import os
+import runpy
+from unittest.mock import patch
+
+CONFIG_PATH = os.path.join(os.path.dirname(__file__), "..", "gunicorn.conf.py")
+
+
+def load_config(monkeypatch, **env):
+    for name, value in env.items():
+        monkeypatch.setenv(name, value)
+    return runpy.run_path(CONFIG_PATH)
+
+
+def test_config_from_env(monkeypatch):
+    config = load_config(
+        monkeypatch,
+        SERVER_PORT="9000",
+        SERVER_WORKERS="3",
+        SERVER_LOOP="uvloop",
+        SERVER_HTTP="httptools",
+        SERVER_MAX_REQUESTS="500",
+        SERVER_GRACEFUL_TIMEOUT_SECONDS="12",
+    )
+
+    assert config["bind"] == "0.0.0.0:9000"
+    assert config["workers"] == 3
+    assert config["max_requests"] == 500
+    assert config["graceful_timeout"] == 12
+    assert config["worker_class"].CONFIG_KWARGS == {
+        "loop": "uvloop",
+        "http": "httptools",
+        "timeout_graceful_shutdown": 12,
+    }
+
+
+def test_schema_bootstrap_once(monkeypatch):
+    config = load_config(monkeypatch)
+
+    with (
+        patch("db.database.get_db_connection") as get_db_connection,
+        patch("db.migrations.apply_migrations") as apply_migrations,
+    ):
+        config["on_starting"](None)
+    apply_migrations.assert_called_once_with(
+        get_db_connection.return_value, include_background=False
+    )
+
+
+def test_schema_bootstrap_disabled(monkeypatch):
+    config = load_config(monkeypatch, SCHEMA_BOOTSTRAP="false")
+
+    with patch("db.migrations.apply_migrations") as apply_migrations:
+        config["on_starting"](None)
+    apply_migrations.assert_not_called()
@@ -0,0 +1,66 @@
+import json
+import logging
+import sys
+import logging_config
+from logging_config import (
+    DeferredQueueHandler,
+    JsonFormatter,
+    parse_log_levels,
+    should_log_request,
+)
+
+
+def make_record(msg, *args, exc_info=None, **extra):
+    record = logging.LogRecord(
+        "endpoints.api", logging.INFO, __file__, 1, msg, args, exc_info
+    )
+    record.__dict__.update(extra)
+    return record
+
+
+def test_parse_log_levels():
+    assert parse_log_levels("db.monitoring=warning, endpoints.api=DEBUG,,bad") == {
+        "db.monitoring": "WARNING",
+        "endpoints.api": "DEBUG",
+    }
+    assert parse_log_levels("") == {}
+
+
+def test_json_formatter_includes_extra_fields():
+    record = make_record("%s %s", "GET", "/api/quests", status=200, db_ops=2)
+
+    entry = json.loads(JsonFormatter().format(record))
+
+    assert entry["message"] == "GET /api/quests"
+    assert entry["level"] == "INFO"
+    assert entry["logger"] == "endpoints.api"
+    assert entry["status"] == 200
+    assert entry["db_ops"] == 2
+    assert "args" not in entry
+
+
+def test_deferred_queue_handler_merges_arguments():
+    job = ["job"]
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("Failed %s", job, exc_info=sys.exc_info())
+
+    prepared = DeferredQueueHandler(None).prepare(record)
+    job.append("changed later")
+
+    assert prepared.msg == "Failed ['job']"
+    assert prepared.args is None
+    assert prepared.exc_info is None
+    entry = json.loads(JsonFormatter().format(prepared))
+    assert "ValueError: boom" in entry["exception"]
+
+
+def test_should_log_request(monkeypatch):
+    monkeypatch.setattr(logging_config, "REQUEST_LOG_SAMPLE_RATE", 0.0)
+    assert not should_log_request(200, 5.0)
+    assert should_log_request(500, 5.0)
+    assert should_log_request(200, logging_config.REQUEST_LOG_SLOW_MS)
+
+    monkeypatch.setattr(logging_config, "REQUEST_LOG_SAMPLE_RATE", 1.0)
+    assert should_log_request(404, 5.0)
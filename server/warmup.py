@@ -0,0 +1,82 @@
+import asyncio
+import logging
+import os
+import time
+import httpx
+from db.crud import crud_quests
+from db.quest_cache import quest_cache
+from db.topic_cache import topic_cache
+from endpoints.api.etags import quests_etag
+
+logger = logging.getLogger(__name__)
+
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", 4))
+WARMUP_PATHS = [
+    path.strip()
+    for path in os.getenv("WARMUP_PATHS", "/healthz,/openapi.json").split(",")
+    if path.strip()
+]
+WARMUP_TIMEOUT_SECONDS = float(os.getenv("WARMUP_TIMEOUT_SECONDS", 30))
+
+# Read by /readyz
+warmup_state = {"complete": False, "seconds": None}
+
+
+async def open_pool_connections(db, connections: int):
+    """Ping the database from several threads at once, so each opens a connection."""
+    await asyncio.gather(
+        *(asyncio.to_thread(db.command, "ping") for _ in range(connections))
+    )
+
+
+async def load_caches(db):
+    """
+    Load the topic cache and the quest list entry of the quest cache
+
+    The quest list is loaded the way GET /api/quests loads it, so its first
+    query, serialization and ETag (which import and compile lazily) run here.
+    """
+    await asyncio.to_thread(topic_cache.load, db)
+    await quest_cache.get_list(
+        "all", (), lambda: crud_quests.get_quests_db(db), quests_etag
+    )
+
+
+async def touch_routes(app, paths: list[str]):
+    """
+    Send a request to each path through the whole middleware stack
+
+    The requests carry no auth cookie, so only unauthenticated routes are
+    worth touching. This builds the middleware stack and routes, and
+    /openapi.json caches the OpenAPI schema.
+    """
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://warmup"
+    ) as client:
+        for path in paths:
+            await client.get(path)
+
+
+async def warm_up(app, db):
+    """
+    Open pool connections, load the caches and touch the hot routes
+
+    Failures are logged rather than raised: a cold worker is better than none,
+    and /readyz reports the database separately.
+    """
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(
+            asyncio.gather(
+                open_pool_connections(db, WARMUP_CONNECTIONS),
+                load_caches(db),
+                touch_routes(app, WARMUP_PATHS),
+            ),
+            WARMUP_TIMEOUT_SECONDS,
+        )
+    except Exception:
+        logger.exception("Warm-up failed")
+    warmup_state["seconds"] = time.perf_counter() - started
+    warmup_state["complete"] = True
+    logger.info("Warm-up finished in %.2fs", warmup_state["seconds"])